@@ -9,7 +9,7 @@ A general implementation for molecular and periodic systems.
 # the molsystem package.
 
 from molsystem.systems import Systems  # noqa: F401
-from molsystem.cell import Cell  # noqa: F401
+from molsystem.cell import Cell, CellArray  # noqa: F401
 
 # Handle versioneer
 from ._version import get_versions
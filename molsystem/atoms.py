@@ -15,9 +15,9 @@ import logging
 from typing import Any, Dict, TypeVar
 
 import numpy
-import pandas
 
 from molsystem.column import _Column as Column
+from molsystem.selection import _Selection as Selection
 from molsystem.table import _Table as Table
 
 System_tp = TypeVar("System_tp", "System", None)
@@ -325,7 +325,10 @@ class _Atoms(collections.abc.MutableMapping):
 
         if 'symbol' in kwargs:
             symbols = kwargs.pop('symbol')
-            kwargs['atno'] = self.to_atnos(symbols)
+            atnos = self.to_atnos(symbols)
+            if isinstance(atnos, numpy.ndarray):
+                atnos = atnos.tolist()
+            kwargs['atno'] = atnos
 
         # How many new rows there are
         n_rows, lengths = self._get_n_rows(**kwargs)
@@ -363,7 +366,12 @@ class _Atoms(collections.abc.MutableMapping):
         return ids
 
     def atoms(
-        self, *args, subset=None, configuration=None, template_order=False
+        self,
+        *args,
+        subset=None,
+        configuration=None,
+        template_order=False,
+        selection=None
     ):
         """Return an iterator over the atoms.
 
@@ -375,17 +383,22 @@ class _Atoms(collections.abc.MutableMapping):
             Get the atoms for the subset. Defaults to the 'all/all' subset
             for the configuration given.
         configuration : int = None
-            The configuration of interest. Defaults to the current
-            configuration. Not used if the subset is given.
+            The configuration of interest. Defaults to the configuration of
+            the subset if it is given, otherwise the current configuration.
         template_order : bool = False
             If True, and there are template atoms associated with the atoms,
             return rows in the order of the template.
+        selection : str or _Selection = None
+            A selection in the selection language, e.g. 'resname LIG' or
+            'within 5.0 of resname LIG and not hydrogen'. See
+            molsystem.selection for details.
 
         Returns
         -------
         sqlite3.Cursor
             A cursor that returns sqlite3.Row objects for the atoms.
         """
+        configuration = self._subset_configuration(subset, configuration)
         if subset is None:
             subset = self.system.all_subset(configuration)
 
@@ -417,19 +430,23 @@ class _Atoms(collections.abc.MutableMapping):
             f'SELECT {column_defs}'
             f'  FROM {atom_tbl} as at, {coord_tbl} as co, subset_atom as sa'
             '  WHERE at.id == sa.atom AND sa.subset = ? AND co.atom = at.id'
+            '    AND co.configuration = ?'
         )
 
-        if len(args) == 0:
-            if template_order:
-                sql += " ORDER BY templateatom"
-            return self.db.execute(sql, (subset,))
-
-        parameters = [subset]
+        parameters = [subset, configuration]
         for col, op, value in grouped(args, 3):
             if op == '==':
                 op = '='
             sql += f' AND "{col}" {op} ?'
             parameters.append(value)
+        if selection is not None:
+            if not isinstance(selection, Selection):
+                selection = Selection(selection)
+            condition, values = selection.where(
+                self, subset=subset, configuration=configuration
+            )
+            sql += f' AND {condition}'
+            parameters.extend(values)
         if template_order:
             sql += " ORDER BY templateatom"
 
@@ -565,8 +582,8 @@ class _Atoms(collections.abc.MutableMapping):
             Get the atoms for the subset. Defaults to the 'all/all' subset
             for the configuration given.
         configuration : int = None
-            The configuration of interest. Defaults to the current
-            configuration. Not used if the subset is given.
+            The configuration of interest. Defaults to the configuration of
+            the subset if it is given, otherwise the current configuration.
         template_order : bool = False
             If True, and there are template atoms associated with the atoms,
             return rows in the order of the template.
@@ -585,8 +602,7 @@ class _Atoms(collections.abc.MutableMapping):
         abc : [N][float*3]
             The coordinates, either Cartesian or fractional
         """
-        if configuration is None:
-            configuration = self.current_configuration
+        configuration = self._subset_configuration(subset, configuration)
 
         xyz = []
         for row in self.atoms(
@@ -683,8 +699,8 @@ class _Atoms(collections.abc.MutableMapping):
             Set the atoms for the subset. Defaults to the 'all/all' subset
             for the configuration given.
         configuration : int = None
-            The configuration of interest. Defaults to the current
-            configuration. Not used if the subset is given.
+            The configuration of interest. Defaults to the configuration of
+            the subset if it is given, otherwise the current configuration.
         template_order : bool = False
             If True, and there are template atoms associated with the atoms,
             the coordinates are in the order of the template.
@@ -696,8 +712,7 @@ class _Atoms(collections.abc.MutableMapping):
         -------
         None
         """
-        if configuration is None:
-            configuration = self.current_configuration
+        configuration = self._subset_configuration(subset, configuration)
 
         as_array = isinstance(xyz, numpy.ndarray)
 
@@ -775,8 +790,8 @@ class _Atoms(collections.abc.MutableMapping):
             Get the values for the subset. Defaults to the 'all/all' subset
             for the configuration given.
         configuration : int = None
-            The configuration of interest. Defaults to the current
-            configuration. Not used if the subset is given.
+            The configuration of interest. Defaults to the configuration of
+            the subset if it is given, otherwise the current configuration.
 
         Returns
         -------
@@ -790,23 +805,29 @@ class _Atoms(collections.abc.MutableMapping):
             sql = (
                 f'SELECT at.rowid, at.{key}, sa.templateatom'
                 f'  FROM {self._atom_tablename} as at, subset_atom as sa'
-                f' WHERE at.id = sa.atom AND sa.subset = {subset}'
+                ' WHERE at.id = sa.atom AND sa.subset = ?'
             )
             if template_order:
                 sql += " ORDER BY sa.templateatom"
-            return Column(self._atom_table, key, sql=sql)
+            return Column(self._atom_table, key, sql=sql, parameters=(subset,))
         elif key in self._coordinates_table.attributes:
             sql = (
                 f'SELECT co.rowid, co.{key}, sa.templateatom'
                 f'  FROM {self._atom_tablename} as at,'
                 f'       {self._coordinates_tablename} as co,'
                 '        subset_atom as sa'
-                f' WHERE co.atom = at.id AND at.id = sa.atom'
-                f'   AND sa.subset = {subset}'
+                ' WHERE co.atom = at.id AND at.id = sa.atom'
+                '   AND sa.subset = ? AND co.configuration = ?'
             )
             if template_order:
                 sql += " ORDER BY sa.templateatom"
-            return Column(self._coordinates_table, key, sql=sql)
+            configuration = self._subset_configuration(subset, configuration)
+            return Column(
+                self._coordinates_table,
+                key,
+                sql=sql,
+                parameters=(subset, configuration)
+            )
         else:
             raise KeyError(f"'{key}' not in atoms")
 
@@ -814,6 +835,30 @@ class _Atoms(collections.abc.MutableMapping):
         """Convert element symbols to atomic numbers."""
         return self._system.to_atnos(symbols)
 
+    def _subset_configuration(self, subset, configuration):
+        """The configuration to use for the coordinates of a subset.
+
+        A subset may be part of several configurations, so this is the
+        current configuration if the subset is in it, otherwise the last
+        configuration that the subset is in.
+        """
+        if configuration is not None:
+            return configuration
+        current = self.current_configuration
+        if subset is None:
+            return current
+        if current is not None and subset == self.system.all_subset(current):
+            return current
+        configurations = [
+            x[0] for x in self.db.execute(
+                "SELECT configuration FROM configuration_subset"
+                " WHERE subset = ?", (subset,)
+            )
+        ]
+        if len(configurations) == 0 or current in configurations:
+            return current
+        return max(configurations)
+
     def _get_n_rows(self, **kwargs):
         """Get the total number of rows represented in the arguments."""
         n_rows = None
@@ -925,6 +970,7 @@ class _Atoms(collections.abc.MutableMapping):
             self.db.executemany(
                 "DELETE FROM subset_atom WHERE atom = ?", parameters
             )
+            self.system.mark_changed('atom', cascade=True)
 
             return
         if subset is None:
@@ -950,6 +996,67 @@ class _Atoms(collections.abc.MutableMapping):
 
         # Subset-Atoms
         self.db.execute("DELETE FROM subset_atom WHERE subset = ?", (subset,))
+        self.system.mark_changed('atom', 'subset_atom', cascade=True)
+
+    def select(
+        self,
+        selection,
+        subset=None,
+        configuration=None,
+        as_indices=False,
+        template=None
+    ):
+        """Select atoms using the selection language.
+
+        Parameters
+        ----------
+        selection : str or _Selection
+            The selection, e.g. 'resname LIG' or
+            'within 5.0 of resname LIG and not hydrogen'. See
+            molsystem.selection for details.
+        subset : int = None
+            Select from the atoms in the subset. Defaults to the 'all/all'
+            subset for the configuration given.
+        configuration : int = None
+            The configuration of interest. Defaults to the current
+            configuration.
+        as_indices : bool = False
+            Whether to return 0-based indices in the subset (True) or atom
+            ids (False)
+        template : int = None
+            If given, create a subset of this template containing the
+            selected atoms, and return its id. Cannot be used with
+            as_indices.
+
+        Returns
+        -------
+        numpy.ndarray or int
+            The ids or indices of the selected atoms, in the order of the
+            subset, or the id of the new subset if a template was given.
+        """
+        if as_indices and template is not None:
+            raise ValueError(
+                'select() cannot return indices and create a subset.'
+            )
+
+        if not isinstance(selection, Selection):
+            selection = Selection(selection)
+
+        if as_indices:
+            mask = selection.mask(
+                self, subset=subset, configuration=configuration
+            )
+            return numpy.nonzero(mask)[0]
+
+        ids = selection.atom_ids(
+            self, subset=subset, configuration=configuration
+        )
+        if template is None:
+            return ids
+
+        return self.system.subsets.create(
+            template, configuration=configuration, atoms=ids.tolist()
+        )
 
     def symbols(self, subset=None, configuration: int = None) -> [str]:
         """The element symbols for the atoms in a subset or configuration
@@ -975,6 +1082,8 @@ class _Atoms(collections.abc.MutableMapping):
 
     def to_dataframe(self):
         """Return the contents of the table as a Pandas Dataframe."""
+        import pandas
+
         data = {}
         rows = self.atoms()
         for row in rows:
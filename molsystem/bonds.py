@@ -10,7 +10,6 @@ import sqlite3
 from typing import Any, Dict, TypeVar
 
 import numpy as np
-import pandas
 
 from molsystem.table import _Table as Table
 from molsystem.frozencolumn import _FrozenColumn as FrozenColumn
@@ -106,7 +105,7 @@ class _Bonds(Table):
     @property
     def bond_db(self):
         if self._bond_db is None:
-            self._bond_db = sqlite3.connect(self._system._filename)
+            self._bond_db = sqlite3.connect(self._system._filename, uri=True)
             self._bond_db.row_factory = self._row_factory
             self._bond_db.execute('PRAGMA foreign_keys = ON')
         return self._bond_db
@@ -185,26 +184,16 @@ class _Bonds(Table):
                 f'Should be 1 or the number of values in i, {len_i}.'
             )
         # Ensure that i < j
-
-        if isinstance(i, np.ndarray):
-            i = i.tolist()
-        if isinstance(j, np.ndarray):
-            j = j.tolist()
-
-        i2 = []
-        j2 = []
-        for i_, j_ in zip(i, j):
-            # will need to handle offsets here at some point
-            if not isinstance(i_, int) or not isinstance(j_, int):
-                raise TypeError(
-                    "'i' and 'j', the atom indices, must be integers"
-                )
-            if i_ < j_:
-                i2.append(i_)
-                j2.append(j_)
-            else:
-                i2.append(j_)
-                j2.append(i_)
+        # will need to handle offsets here at some point
+        i = np.asarray(i)
+        j = np.asarray(j)
+        if not (
+            np.issubdtype(i.dtype, np.integer) and
+            np.issubdtype(j.dtype, np.integer)
+        ):
+            raise TypeError("'i' and 'j', the atom indices, must be integers")
+        i2 = np.minimum(i, j).tolist()
+        j2 = np.maximum(i, j).tolist()
 
         # Get the template atoms corresponding to the i and j atoms,
         # adding them if needed.
@@ -213,24 +202,22 @@ class _Bonds(Table):
         subset = self._system.all_subset(configuration)
         template = self._system.all_template(configuration)
 
-        # First get current map of atoms to templateatoms
+        # First get current map of atoms to templateatoms, and the rows in
+        # subset_atom so they can be updated quickly.
         map = {}
-        for row in self.db.execute(
-            "SELECT atom, templateatom FROM subset_atom"
+        rowids = {}
+        for rowid, atom, templateatom in self.db.execute(
+            "SELECT rowid, atom, templateatom FROM subset_atom"
             " WHERE subset = ?", (subset,)
         ):
-            templateatom = row['templateatom']
-            if templateatom is not None:
-                map[row['atom']] = templateatom
-
-        # Use dictionary because there may be duplicates
-        missing = {}
-        for i_ in i2:
-            if i_ not in map:
-                missing[i_] = None
-        for j_ in j2:
-            if j_ not in map:
-                missing[j_] = None
+            if templateatom is None:
+                rowids[atom] = rowid
+            else:
+                map[atom] = templateatom
+
+        # The sorting here is to keep the atoms in the same order,
+        # which is what the user expects.
+        missing = sorted((set(i2) | set(j2)) - map.keys())
 
         if len(missing) > 0:
             # Need to add to the all template.
@@ -238,32 +225,28 @@ class _Bonds(Table):
             templateatoms = table.append(n=len(missing), template=template)
 
             parameters = []
-            # The sorting here is to keep the atoms in the same order,
-            # which is what the user expects.
-            for i_, tatom in zip(sorted(missing), templateatoms):
+            for i_, tatom in zip(missing, templateatoms):
                 map[i_] = tatom
-                parameters.append((tatom, i_, subset))
+                if i_ in rowids:
+                    parameters.append((tatom, rowids[i_]))
             self.cursor.executemany(
-                "UPDATE subset_atom SET templateatom = ?"
-                " WHERE atom = ? AND subset = ?", parameters
+                "UPDATE subset_atom SET templateatom = ? WHERE rowid = ?",
+                parameters
             )
+            self._system.mark_changed('subset_atom')
 
         # get the lists of template atoms for the bonds
-        ti = []
-        tj = []
-        for i_ in i2:
-            ti.append(map[i_])
-        for j_ in j2:
-            tj.append(map[j_])
+        ti = [map[i_] for i_ in i2]
+        tj = [map[j_] for j_ in j2]
 
         # and ... finally ... add the bonds
         if 'bondorder' in kwargs:
             bondorders = kwargs.pop('bondorder')
             self._system['templatebond'].append(
-                i=ti, j=tj, bondorder=bondorders
+                template=template, i=ti, j=tj, bondorder=bondorders
             )
         else:
-            self._system['templatebond'].append(i=ti, j=tj)
+            self._system['templatebond'].append(template=template, i=ti, j=tj)
 
     def bonds(self, subset=None, configuration=None):
         """Returns an iterator over the rows of the bonds.
@@ -294,7 +277,8 @@ class _Bonds(Table):
         column_defs = ', '.join(columns)
         sql = (
             f"SELECT iatom.atom as i, jatom.atom as j, {column_defs}"
-            "   FROM templatebond, subset_atom as iatom, subset_atom as jatom"
+            "   FROM subset_atom as iatom"
+            "  CROSS JOIN templatebond CROSS JOIN subset_atom as jatom"
             "  WHERE templatebond.i = iatom.templateatom"
             "    AND templatebond.j = jatom.templateatom"
             "    AND iatom.subset = ? and jatom.subset = ?"
@@ -302,7 +286,7 @@ class _Bonds(Table):
         return self.db.execute(sql, (subset, subset))
 
     def contains_bond(self, key):
-        if isinstance(key, self.bond_tuple):
+        if hasattr(key, 'i'):
             i = key.i
             j = key.j
         else:
@@ -311,8 +295,8 @@ class _Bonds(Table):
         if i > j:
             j, i = i, j
         sql = (
-            "SELECT COUNT(*) FROM templatebond, subset_atom as iatom,"
-            "              subset_atom as jatom"
+            "SELECT COUNT(*) FROM subset_atom as iatom"
+            "  CROSS JOIN templatebond CROSS JOIN subset_atom as jatom"
             " WHERE iatom.subset = ? AND jatom.subset = ?"
             "   AND templatebond.i = iatom.templateatom"
             "   AND templatebond.j = jatom.templateatom"
@@ -329,7 +313,8 @@ class _Bonds(Table):
             j, i = i, j
         sql = (
             "SELECT templatebond.i as i, templatebond.j as j"
-            "  FROM templatebond, subset_atom as iatom, subset_atom as jatom"
+            "  FROM subset_atom as iatom"
+            " CROSS JOIN templatebond CROSS JOIN subset_atom as jatom"
             " WHERE iatom.subset = ? AND jatom.subset = ?"
             "   AND templatebond.i = iatom.templateatom"
             "   AND templatebond.j = jatom.templateatom"
@@ -341,14 +326,15 @@ class _Bonds(Table):
         if row is not None:
             sql = "DELETE FROM templatebond WHERE i = ? AND j = ?"
             self.cursor.execute(sql, row)
+            self._system.mark_changed('templatebond')
 
     def get_bond(self, i, j):
         # get canonical order
         if i > j:
             j, i = i, j
         sql = (
-            "SELECT templatebond.* FROM templatebond, subset_atom as iatom,"
-            "              subset_atom as jatom"
+            "SELECT templatebond.* FROM subset_atom as iatom"
+            "  CROSS JOIN templatebond CROSS JOIN subset_atom as jatom"
             " WHERE iatom.subset = ? AND jatom.subset = ?"
             "   AND templatebond.i = iatom.templateatom"
             "   AND templatebond.j = jatom.templateatom"
@@ -385,16 +371,18 @@ class _Bonds(Table):
                 col = 'jatom.atom'
             sql = (
                 f"SELECT {col}"
-                "  FROM templatebond,"
-                "       subset_atom as iatom,"
-                "       subset_atom as jatom"
+                "  FROM subset_atom as iatom"
+                " CROSS JOIN templatebond"
+                " CROSS JOIN subset_atom as jatom"
                 " WHERE templatebond.i = iatom.templateatom"
                 "   AND templatebond.j = jatom.templateatom"
-                f"  AND iatom.subset = {all_subset}"
-                f"  AND jatom.subset = {all_subset}"
+                "   AND iatom.subset = ?"
+                "   AND jatom.subset = ?"
             )
             table = Table(self._system, 'atom')
-            return FrozenColumn(table, 'id', sql)
+            return FrozenColumn(
+                table, 'id', sql, parameters=(all_subset, all_subset)
+            )
         else:
             all_template = self._system.all_template(configuration)
             sql = (
@@ -404,11 +392,13 @@ class _Bonds(Table):
                 "       templateatom as jatom"
                 " WHERE templatebond.i = iatom.id"
                 "   AND templatebond.j = jatom.id"
-                f"  AND iatom.template = {all_template}"
-                f"  AND jatom.template = {all_template}"
+                "   AND iatom.template = ?"
+                "   AND jatom.template = ?"
             )
             table = Table(self._system, 'templatebond')
-            return Column(table, key, sql=sql)
+            return Column(
+                table, key, sql=sql, parameters=(all_template, all_template)
+            )
 
     def n_bonds(self, subset: int = None, configuration: int = None) -> int:
         """The number of bonds.
@@ -484,6 +474,7 @@ class _Bonds(Table):
             )
             parameters = [(subset, i) for i in atoms]
             self.db.executemany(sql, parameters)
+            self._system.mark_changed('templateatom', cascade=True)
         else:
             if subset is None:
                 subset = self.system.all_subset(configuration)
@@ -499,9 +490,12 @@ class _Bonds(Table):
                 " )"
             )
             self.db.execute(sql, (subset, subset))
+            self._system.mark_changed('templatebond')
 
     def to_dataframe(self, configuration=None):
         """Return the bonds as a Pandas Dataframe."""
+        import pandas
+
         all_subset = self._system.all_subset(configuration)
         columns = []
         for column in self.attributes:
@@ -513,7 +507,8 @@ class _Bonds(Table):
             "       iatom.atom as i,"
             "       jatom.atom as j,"
             f"      {column_defs}"
-            "  FROM templatebond, subset_atom as iatom, subset_atom as jatom"
+            "  FROM subset_atom as iatom"
+            " CROSS JOIN templatebond CROSS JOIN subset_atom as jatom"
             " WHERE templatebond.i = iatom.templateatom"
             "   AND templatebond.j = jatom.templateatom"
             "   AND iatom.subset = ? and jatom.subset = ?"
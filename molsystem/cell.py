@@ -7,6 +7,10 @@ import numpy
 
 logger = logging.getLogger(__name__)
 
+# The number of pairs handled at a time by the pairwise methods, which
+# bounds the memory used to roughly 100 bytes times this.
+block_elements = 1 << 18
+
 
 def cos(value):
     return math.cos(math.radians(value))
@@ -21,6 +25,10 @@ class Cell(object):
 
     def __init__(self, a, b, c, alpha, beta, gamma):
         self._parameters = [a, b, c, alpha, beta, gamma]
+        # The transformation matrices, computed when first needed. They are
+        # read-only so that copies of the cell can share them.
+        self._to_cartesians = None
+        self._to_fractionals = None
 
     def __getitem__(self, key):
         """Allow [] to access the data!"""
@@ -29,6 +37,7 @@ class Cell(object):
     def __setitem__(self, key, value):
         """Allow x[key] access to the data"""
         self._parameters[key] = value
+        self._reset()
 
     def __iter__(self):
         """Allow iteration over the object"""
@@ -58,6 +67,7 @@ class Cell(object):
     @a.setter
     def a(self, value):
         self._parameters[0] = value
+        self._reset()
 
     @property
     def b(self):
@@ -67,6 +77,7 @@ class Cell(object):
     @b.setter
     def b(self, value):
         self._parameters[1] = value
+        self._reset()
 
     @property
     def c(self):
@@ -76,6 +87,7 @@ class Cell(object):
     @c.setter
     def c(self, value):
         self._parameters[2] = value
+        self._reset()
 
     @property
     def alpha(self):
@@ -85,6 +97,7 @@ class Cell(object):
     @alpha.setter
     def alpha(self, value):
         self._parameters[3] = value
+        self._reset()
 
     @property
     def beta(self):
@@ -94,6 +107,7 @@ class Cell(object):
     @beta.setter
     def beta(self, value):
         self._parameters[4] = value
+        self._reset()
 
     @property
     def gamma(self):
@@ -103,6 +117,7 @@ class Cell(object):
     @gamma.setter
     def gamma(self, value):
         self._parameters[5] = value
+        self._reset()
 
     @property
     def parameters(self):
@@ -114,19 +129,87 @@ class Cell(object):
         if len(value) != 6:
             raise ValueError('parameters must be of length 6')
         self._parameters = list(value)
+        self._reset()
 
     @property
     def volume(self):
         """The volume of the cell."""
         a, b, c, alpha, beta, gamma = self.parameters
+        ca = cos(alpha)
+        cb = cos(beta)
+        cg = cos(gamma)
+        value = 1 - ca**2 - cb**2 - cg**2 + 2 * ca * cb * cg
         # Roundoff errors!
-        value = cos(alpha) * cos(beta) * cos(gamma)
         if value < 0.0 and abs(value) < 1.0e-8:
             value = 0.0
-        return (
-            a * b * c * (1 - cos(alpha)**2 - cos(beta)**2 - cos(gamma)**2) +
-            2 * math.sqrt(value)
-        )
+        return a * b * c * math.sqrt(value)
+
+    @property
+    def is_orthorhombic(self):
+        """Whether all the angles are 90 degrees."""
+        return all(abs(x - 90.0) < 1.0e-08 for x in self._parameters[3:])
+
+    @property
+    def lattice_vectors(self):
+        """The lattice vectors a, b and c as the rows of an array."""
+        return self._transforms()[0].copy()
+
+    @property
+    def widths(self):
+        """The perpendicular distances between opposite faces of the cell."""
+        return 1.0 / numpy.linalg.norm(self._transforms()[1], axis=0)
+
+    def copy(self):
+        """A copy of the cell, sharing the transformation matrices.
+
+        Returns
+        -------
+        Cell
+            The new cell.
+        """
+        result = Cell(*self._parameters)
+        result._to_cartesians = self._to_cartesians
+        result._to_fractionals = self._to_fractionals
+        return result
+
+    def displacements(self, xyz1, xyz2):
+        """The minimum-image displacements from one set of points to another.
+
+        Parameters
+        ----------
+        xyz1 : [N][3*float] or ndarray
+            The Cartesian coordinates of the first points.
+        xyz2 : [N][3*float] or ndarray
+            The Cartesian coordinates of the second points. The arrays are
+            broadcast, so e.g. one point can be given for all of the others.
+
+        Returns
+        -------
+        ndarray
+            The displacements xyz2 - xyz1 of the nearest images.
+        """
+        xyz1 = numpy.asarray(xyz1, dtype=float)
+        delta = numpy.asarray(xyz2, dtype=float) - xyz1
+        return self.minimum_image(delta)
+
+    def distances(self, xyz1, xyz2):
+        """The minimum-image distances between pairs of points.
+
+        Parameters
+        ----------
+        xyz1 : [N][3*float] or ndarray
+            The Cartesian coordinates of the first points.
+        xyz2 : [N][3*float] or ndarray
+            The Cartesian coordinates of the second points. The arrays are
+            broadcast, so e.g. one point can be given for all of the others.
+
+        Returns
+        -------
+        ndarray
+            The distances between the nearest images of the points.
+        """
+        delta = self.displacements(xyz1, xyz2)
+        return numpy.sqrt(numpy.einsum('...i,...i->...', delta, delta))
 
     def equal(self, other, tol=1.0e-6):
         """Check if we are equal to another iterable to within a tolerance.
@@ -152,6 +235,170 @@ class Cell(object):
 
         return True
 
+    def minimum_image(self, dxyz):
+        """Apply the minimum image convention to Cartesian displacements.
+
+        Orthorhombic cells are handled by wrapping each component. For
+        other cells, the displacements are first wrapped in fractional
+        coordinates, which gives the nearest image for any displacement
+        shorter than half the narrowest width of the cell. The rest are
+        checked against the neighboring images, which is exact unless the
+        cell is very skewed, in which case it should be reduced first.
+
+        Parameters
+        ----------
+        dxyz : [3*float], [N][3*float] or ndarray
+            The displacements.
+
+        Returns
+        -------
+        ndarray
+            The displacements to the nearest images, with the same shape.
+        """
+        delta = numpy.array(dxyz, dtype=float)
+        T, Tinv = self._transforms()
+
+        if self.is_orthorhombic:
+            lengths = T.diagonal()
+            delta -= numpy.rint(delta / lengths) * lengths
+            return delta
+
+        shape = delta.shape
+        delta = delta.reshape(-1, 3)
+        duvw = delta @ Tinv
+        delta = (duvw - numpy.rint(duvw)) @ T
+
+        half = 0.5 * self.widths.min()
+        check = numpy.nonzero(
+            numpy.einsum('ij,ij->i', delta, delta) > half * half
+        )[0]
+        if check.size > 0:
+            # |d + o|^2 = |d|^2 + 2 d.o + |o|^2, so only the last two terms
+            # are needed to pick the nearest image.
+            images = self._images()
+            norms = numpy.einsum('ij,ij->i', images, images)
+            step = max(1, block_elements // images.shape[0])
+            for start in range(0, check.size, step):
+                rows = check[start:start + step]
+                r2 = 2 * (delta[rows] @ images.T) + norms
+                delta[rows] += images[numpy.argmin(r2, axis=1)]
+        return delta.reshape(shape)
+
+    def pairs(self, xyz1, cutoff, xyz2=None, block_size=None):
+        """The pairs of points within a cutoff, using minimum images.
+
+        The work is done in blocks of rows so that the memory needed is
+        bounded regardless of the number of points.
+
+        Parameters
+        ----------
+        xyz1 : [N][3*float] or ndarray
+            The Cartesian coordinates of the points.
+        cutoff : float
+            The largest distance for a pair.
+        xyz2 : [M][3*float] or ndarray = None
+            Optionally, a second set of points. If not given, the pairs
+            i < j within the first set are found.
+        block_size : int = None
+            The number of rows in each block. By default enough for about
+            block_elements pairs.
+
+        Returns
+        -------
+        i, j : ndarray
+            The indices of the points in each pair.
+        r : ndarray
+            The distance between the points in each pair.
+        """
+        xyz1 = numpy.asarray(xyz1, dtype=float).reshape(-1, 3)
+        same = xyz2 is None
+        if not same:
+            xyz2 = numpy.asarray(xyz2, dtype=float).reshape(-1, 3)
+        else:
+            xyz2 = xyz1
+        n, m = xyz1.shape[0], xyz2.shape[0]
+        if block_size is None:
+            block_size = max(1, block_elements // max(m, 1))
+
+        # Wrapping in fractional coordinates is exact for distances up to
+        # half the narrowest width of the cell.
+        if self.is_orthorhombic or cutoff <= 0.5 * self.widths.min():
+            T, Tinv = self._transforms()
+            uvw1 = xyz1 @ Tinv
+            uvw2 = xyz2 @ Tinv
+
+            def displacements(rows):
+                duvw = uvw2 - uvw1[rows, numpy.newaxis, :]
+                duvw -= numpy.rint(duvw)
+                return duvw @ T
+        else:
+
+            def displacements(rows):
+                return self.minimum_image(xyz2 - xyz1[rows, numpy.newaxis, :])
+
+        cutoff2 = cutoff * cutoff
+        result_i = []
+        result_j = []
+        result_r2 = []
+        for start in range(0, n, block_size):
+            rows = numpy.arange(start, min(start + block_size, n))
+            delta = displacements(rows)
+            r2 = numpy.einsum('kni,kni->kn', delta, delta)
+            hit = r2 <= cutoff2
+            if same:
+                hit &= rows[:, numpy.newaxis] < numpy.arange(m)
+            i, j = numpy.nonzero(hit)
+            result_i.append(rows[i])
+            result_j.append(j)
+            result_r2.append(r2[i, j])
+
+        if n == 0:
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return empty, empty.copy(), numpy.zeros(0)
+        return (
+            numpy.concatenate(result_i), numpy.concatenate(result_j),
+            numpy.sqrt(numpy.concatenate(result_r2))
+        )
+
+    def pairwise_distances(self, xyz1, xyz2=None, block_size=None):
+        """The matrix of minimum-image distances between points.
+
+        The work is done in blocks of rows so that the temporary memory is
+        bounded. The result itself is N x M.
+
+        Parameters
+        ----------
+        xyz1 : [N][3*float] or ndarray
+            The Cartesian coordinates of the points.
+        xyz2 : [M][3*float] or ndarray = None
+            Optionally, a second set of points. Defaults to the first set.
+        block_size : int = None
+            The number of rows in each block. By default enough for about
+            block_elements pairs.
+
+        Returns
+        -------
+        ndarray
+            The N x M distances.
+        """
+        xyz1 = numpy.asarray(xyz1, dtype=float).reshape(-1, 3)
+        if xyz2 is None:
+            xyz2 = xyz1
+        else:
+            xyz2 = numpy.asarray(xyz2, dtype=float).reshape(-1, 3)
+        n, m = xyz1.shape[0], xyz2.shape[0]
+        if block_size is None:
+            block_size = max(1, block_elements // max(m, 1))
+
+        result = numpy.empty((n, m))
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            delta = self.minimum_image(xyz2 - xyz1[start:stop, numpy.newaxis])
+            result[start:stop] = numpy.sqrt(
+                numpy.einsum('kni,kni->kn', delta, delta)
+            )
+        return result
+
     def to_cartesians(self, uvw, as_array=False):
         """Convert fraction coordinates to Cartesians
 
@@ -173,8 +420,7 @@ class Cell(object):
         else:
             UVW = numpy.array(uvw)
 
-        T = self.to_cartesians_transform(as_array=True)
-        XYZ = UVW @ T
+        XYZ = UVW @ self._transforms()[0]
 
         if as_array:
             return XYZ
@@ -197,40 +443,11 @@ class Cell(object):
         transform : [N][float*3] or ndarray
             The transformation matrix
         """
-        a, b, c, alpha, beta, gamma = self.parameters
-
-        ca = cos(alpha)
-        cb = cos(beta)
-        cg = cos(gamma)
-        sg = sin(gamma)
-
-        V = a * b * c * math.sqrt(1 - ca**2 - cb**2 - cg**2 + 2 * ca * cb * cg)
-        # Transpose of ...
-        # [a, b * cg, c * cb],
-        # [0, b * sg, c * (ca - cb * cg) / sg],
-        # [0, 0, V / (a * b * sg)]
-        T = [
-                [
-                    a,
-                    0,
-                    0
-                ],
-                [
-                    b * cg,
-                    b * sg,
-                    0
-                ],
-                [
-                    c * cb,
-                    c * (ca - cb * cg) / sg,
-                    V / (a * b * sg)
-                ]
-            ]  # yapf: disable
-
+        T = self._transforms()[0]
         if as_array:
-            return numpy.array(T)
+            return T.copy()
         else:
-            return T
+            return T.tolist()
 
     def to_fractionals(self, xyz, as_array=False):
         """Convert Cartesian coordinates to fractional.
@@ -253,8 +470,7 @@ class Cell(object):
         else:
             XYZ = numpy.array(xyz)
 
-        T = self.to_fractionals_transform(as_array=True)
-        UVW = XYZ @ T
+        UVW = XYZ @ self._transforms()[1]
 
         if as_array:
             return UVW
@@ -277,6 +493,27 @@ class Cell(object):
         transform : [N][float*3] or ndarray
             The transformation matrix
         """
+        T = self._transforms()[1]
+        if as_array:
+            return T.copy()
+        else:
+            return T.tolist()
+
+    def _images(self):
+        """The Cartesian offsets to the 27 nearest images, including 0."""
+        offsets = numpy.indices((3, 3, 3)).reshape(3, -1).T - 1.0
+        return offsets @ self._transforms()[0]
+
+    def _reset(self):
+        """Forget the transformation matrices when the parameters change."""
+        self._to_cartesians = None
+        self._to_fractionals = None
+
+    def _transforms(self):
+        """The matrices to and from fractional coordinates, read-only."""
+        if self._to_cartesians is not None:
+            return self._to_cartesians, self._to_fractionals
+
         a, b, c, alpha, beta, gamma = self.parameters
 
         ca = cos(alpha)
@@ -285,11 +522,35 @@ class Cell(object):
         sg = sin(gamma)
 
         V = a * b * c * math.sqrt(1 - ca**2 - cb**2 - cg**2 + 2 * ca * cb * cg)
+        # Transpose of ...
+        # [a, b * cg, c * cb],
+        # [0, b * sg, c * (ca - cb * cg) / sg],
+        # [0, 0, V / (a * b * sg)]
+        to_cartesians = numpy.array(
+            [
+                [
+                    a,
+                    0,
+                    0
+                ],
+                [
+                    b * cg,
+                    b * sg,
+                    0
+                ],
+                [
+                    c * cb,
+                    c * (ca - cb * cg) / sg,
+                    V / (a * b * sg)
+                ]
+            ]
+        )  # yapf: disable
         # Transpose...
         # [1 / a, -cg / (a * sg), b * c * (ca * cg - cb) / (V * sg)],
         # [0, 1 / (b * sg), a * c * (cb * cg - ca) / (V * sg)],
         # [0, 0, a * b * sg / V]
-        T = [
+        to_fractionals = numpy.array(
+            [
                 [
                     1 / a,
                     0,
@@ -305,9 +566,255 @@ class Cell(object):
                     a * c * (cb * cg - ca) / (V * sg),
                     a * b * sg / V
                 ]
-            ]  # yapf: disable
+            ]
+        )  # yapf: disable
+        to_cartesians.flags.writeable = False
+        to_fractionals.flags.writeable = False
+
+        self._to_cartesians = to_cartesians
+        self._to_fractionals = to_fractionals
+        return to_cartesians, to_fractionals
+
+
+class CellArray(object):
+    """The cell parameters of many frames, such as an NPT trajectory.
+
+    This is the vectorized counterpart of Cell. The parameters are held as
+    an (n_frames, 6) array, and coordinates as (n_frames, ..., 3) arrays,
+    typically (n_frames, n_atoms, 3), so that all the frames are handled in
+    one operation.
+
+    Parameters
+    ----------
+    parameters : [n_frames][6*float] or ndarray
+        The cell parameters a, b, c, alpha, beta, gamma of each frame.
+    configurations : [int] = None
+        The configurations that the frames belong to, if known.
+    """
+
+    def __init__(self, parameters, configurations=None):
+        self._parameters = numpy.array(parameters, dtype=float).reshape(-1, 6)
+        self._parameters.flags.writeable = False
+        if configurations is None:
+            self._configurations = None
+        else:
+            self._configurations = numpy.array(
+                configurations, dtype=numpy.int64
+            )
+            if self._configurations.shape != (len(self),):
+                raise ValueError(
+                    'There must be one configuration for each frame.'
+                )
+        self._to_cartesians = None
+        self._to_fractionals = None
 
-        if as_array:
-            return numpy.array(T)
+    def __getitem__(self, key):
+        """A Cell for an integer key, otherwise a CellArray."""
+        if isinstance(key, (int, numpy.integer)):
+            return Cell(*self._parameters[key].tolist())
+        if self._configurations is None:
+            configurations = None
         else:
-            return T
+            configurations = self._configurations[key]
+        return CellArray(self._parameters[key], configurations)
+
+    def __iter__(self):
+        """Iterate over the frames as Cell objects."""
+        for parameters in self._parameters.tolist():
+            yield Cell(*parameters)
+
+    def __len__(self) -> int:
+        """The number of frames."""
+        return self._parameters.shape[0]
+
+    def __repr__(self):
+        """The representation of this object"""
+        return f'CellArray({self._parameters.tolist()!r})'
+
+    @classmethod
+    def from_cells(cls, cells, configurations=None):
+        """Create a CellArray from a sequence of cells.
+
+        Parameters
+        ----------
+        cells : [Cell] or [[6*float]]
+            The cells.
+        configurations : [int] = None
+            The configurations that the frames belong to, if known.
+
+        Returns
+        -------
+        CellArray
+            The new object.
+        """
+        return cls([[*cell] for cell in cells], configurations)
+
+    @property
+    def configurations(self):
+        """The configurations of the frames, or None if not known."""
+        return self._configurations
+
+    @property
+    def lattice_vectors(self):
+        """The lattice vectors of each frame, as the rows of 3x3 arrays."""
+        return self._transforms()[0].copy()
+
+    @property
+    def n_frames(self):
+        """The number of frames."""
+        return len(self)
+
+    @property
+    def parameters(self):
+        """The cell parameters as an (n_frames, 6) array."""
+        return self._parameters.copy()
+
+    @property
+    def volumes(self):
+        """The volume of the cell in each frame."""
+        a, b, c = self._parameters[:, 0:3].T
+        ca, cb, cg = numpy.cos(numpy.radians(self._parameters[:, 3:6])).T
+        value = 1 - ca**2 - cb**2 - cg**2 + 2 * ca * cb * cg
+        # Roundoff errors!
+        value[(value < 0.0) & (value > -1.0e-8)] = 0.0
+        return a * b * c * numpy.sqrt(value)
+
+    @property
+    def widths(self):
+        """The perpendicular widths of the cells, (n_frames, 3)."""
+        return 1.0 / numpy.linalg.norm(self._transforms()[1], axis=1)
+
+    def minimum_image(self, dxyz):
+        """Apply the minimum image convention to Cartesian displacements.
+
+        This works as in Cell.minimum_image, for all the frames at once. The
+        displacements are wrapped in fractional coordinates, and any that
+        are still longer than half the narrowest width of their frame's cell
+        are checked against the neighboring images.
+
+        Parameters
+        ----------
+        dxyz : ndarray
+            The displacements, (n_frames, ..., 3).
+
+        Returns
+        -------
+        ndarray
+            The displacements to the nearest images, with the same shape.
+        """
+        T = self._transforms()[0]
+        duvw = self.to_fractionals(dxyz)
+        duvw -= numpy.rint(duvw)
+        delta = self.to_cartesians(duvw)
+
+        shape = delta.shape
+        delta = delta.reshape(len(self), -1, 3)
+        half = 0.5 * self.widths.min(axis=1)
+        r2 = numpy.einsum('fmi,fmi->fm', delta, delta)
+        frames, rows = numpy.nonzero(r2 > (half * half)[:, numpy.newaxis])
+        if frames.size > 0:
+            # As in Cell.minimum_image, only 2 d.o + |o|^2 is needed to pick
+            # the nearest image, but each frame has its own images.
+            offsets = numpy.indices((3, 3, 3)).reshape(3, -1).T - 1.0
+            images = numpy.einsum('oi,fij->foj', offsets, T)
+            norms = numpy.einsum('foj,foj->fo', images, images)
+            step = max(1, block_elements // offsets.shape[0])
+            for start in range(0, frames.size, step):
+                f = frames[start:start + step]
+                m = rows[start:start + step]
+                d2 = 2 * numpy.einsum('ki,koi->ko', delta[f, m], images[f])
+                nearest = numpy.argmin(d2 + norms[f], axis=1)
+                delta[f, m] += images[f, nearest]
+        return delta.reshape(shape)
+
+    def to_cartesians(self, uvw):
+        """Convert fractional coordinates to Cartesians for all frames.
+
+        Parameters
+        ----------
+        uvw : ndarray
+            The fractional coordinates, (n_frames, ..., 3).
+
+        Returns
+        -------
+        ndarray
+            The Cartesian coordinates, with the same shape.
+        """
+        transforms = self._transforms()[0]
+        return numpy.einsum('f...i,fij->f...j', numpy.asarray(uvw), transforms)
+
+    def to_cartesians_transform(self):
+        """The matrices to convert fractional coordinates to Cartesian.
+
+        Returns
+        -------
+        ndarray
+            The (n_frames, 3, 3) matrices, such that xyz = uvw @ T.
+        """
+        return self._transforms()[0].copy()
+
+    def to_fractionals(self, xyz):
+        """Convert Cartesian coordinates to fractional for all frames.
+
+        Parameters
+        ----------
+        xyz : ndarray
+            The Cartesian coordinates, (n_frames, ..., 3).
+
+        Returns
+        -------
+        ndarray
+            The fractional coordinates, with the same shape.
+        """
+        transforms = self._transforms()[1]
+        return numpy.einsum('f...i,fij->f...j', numpy.asarray(xyz), transforms)
+
+    def to_fractionals_transform(self):
+        """The matrices to convert Cartesian coordinates to fractional.
+
+        Returns
+        -------
+        ndarray
+            The (n_frames, 3, 3) matrices, such that uvw = xyz @ T.
+        """
+        return self._transforms()[1].copy()
+
+    def _transforms(self):
+        """The matrices to and from fractional coordinates, read-only.
+
+        The formulas are the same as for Cell, applied to all the frames.
+        """
+        if self._to_cartesians is not None:
+            return self._to_cartesians, self._to_fractionals
+
+        n = len(self)
+        a, b, c = self._parameters[:, 0:3].T
+        angles = numpy.radians(self._parameters[:, 3:6])
+        ca, cb, cg = numpy.cos(angles).T
+        sg = numpy.sin(angles[:, 2])
+
+        V = a * b * c * numpy.sqrt(
+            1 - ca**2 - cb**2 - cg**2 + 2 * ca * cb * cg
+        )
+
+        T = numpy.zeros((n, 3, 3))
+        T[:, 0, 0] = a
+        T[:, 1, 0] = b * cg
+        T[:, 1, 1] = b * sg
+        T[:, 2, 0] = c * cb
+        T[:, 2, 1] = c * (ca - cb * cg) / sg
+        T[:, 2, 2] = V / (a * b * sg)
+
+        Tinv = numpy.zeros((n, 3, 3))
+        Tinv[:, 0, 0] = 1 / a
+        Tinv[:, 1, 0] = -cg / (a * sg)
+        Tinv[:, 1, 1] = 1 / (b * sg)
+        Tinv[:, 2, 0] = b * c * (ca * cg - cb) / (V * sg)
+        Tinv[:, 2, 1] = a * c * (cb * cg - ca) / (V * sg)
+        Tinv[:, 2, 2] = a * b * sg / V
+
+        T.flags.writeable = False
+        Tinv.flags.writeable = False
+        self._to_cartesians = T
+        self._to_fractionals = Tinv
+        return T, Tinv
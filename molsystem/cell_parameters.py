@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import itertools
+import json
 import logging
 
-from molsystem.cell import Cell
+import numpy
+
+from molsystem.cell import Cell, CellArray
 from molsystem.table import _Table as Table
 
 logger = logging.getLogger(__name__)
@@ -12,6 +16,10 @@ labels = ('a', 'b', 'c', 'alpha', 'beta', 'gamma')
 
 class _CellParameters(Table):
     """The representation of the periodic cell
+
+    The cells are cached, keyed by their id, along with the id of the cell
+    for each configuration, until either the cell or configuration tables
+    change.
     """
 
     def __init__(self, system, table='cell'):
@@ -20,6 +28,10 @@ class _CellParameters(Table):
 
         self._configuration_table = self._system['configuration']
 
+        self._cells = {}  # Cell objects by cell id
+        self._cell_ids = {}  # The cell id by configuration
+        self._count = None  # The change count when the cache was filled
+
     def cell(self, configuration=None):
         """Return the cell parameters for the configuration.
 
@@ -37,12 +49,80 @@ class _CellParameters(Table):
         cell_id, configuration = self.cell_id(configuration)
         if cell_id is None:
             return None
-        else:
+
+        cell = self._cells.get(cell_id)
+        if cell is None:
             self.cursor.execute(
                 f"SELECT a, b, c, alpha, beta, gamma FROM {self.table}"
                 "  WHERE id = ?", (cell_id,)
             )
-            return Cell(*self.cursor.fetchone())
+            row = self.cursor.fetchone()
+            if row is None:
+                return None
+            cell = self._cells[cell_id] = Cell(*row)
+        # Hand out a copy so that changes to it do not affect the cache. The
+        # copy shares the transformation matrices.
+        return cell.copy()
+
+    def cells(self, configurations=None):
+        """Return the cell parameters for many configurations at once.
+
+        The parameters are read with a single query over the cell and
+        configuration tables.
+
+        Parameters
+        ----------
+        configurations : [int] = None
+            The configurations of interest. Defaults to all the
+            configurations that have a cell.
+
+        Returns
+        -------
+        cells : CellArray
+            The cells, in the order of the configurations, which are
+            available as cells.configurations.
+
+        Raises
+        ------
+        KeyError
+            If any of the configurations given do not have a cell.
+        """
+        sql = (
+            "SELECT configuration.id, a, b, c, alpha, beta, gamma"
+            f"  FROM configuration, {self.table} AS cell"
+            " WHERE cell.id = configuration.cell"
+        )
+        if configurations is None:
+            sql += " ORDER BY configuration.id"
+            parameters = ()
+        else:
+            configurations = numpy.array(configurations, dtype=numpy.int64)
+            sql += (
+                " AND configuration.id IN (SELECT value FROM json_each(?))"
+            )
+            parameters = (json.dumps(configurations.tolist()),)
+
+        data = numpy.fromiter(
+            itertools.chain.from_iterable(self.db.execute(sql, parameters)),
+            dtype=float
+        ).reshape(-1, 7)
+        ids = data[:, 0].astype(numpy.int64)
+
+        if configurations is not None:
+            # Put the rows in the order requested
+            order = numpy.argsort(ids)
+            ids = ids[order]
+            i = numpy.searchsorted(ids, configurations)
+            i[i == ids.size] = 0
+            if ids.size == 0 or numpy.any(ids[i] != configurations):
+                missing = set(configurations.tolist()) - set(ids.tolist())
+                raise KeyError(
+                    f'Configurations {sorted(missing)} do not have a cell.'
+                )
+            data = data[order[i]]
+            ids = configurations
+
+        return CellArray(data[:, 1:], ids)
 
     def cell_id(self, configuration=None):
         """Return the id of the cell parameters for the configuration.
@@ -60,14 +140,21 @@ class _CellParameters(Table):
         """
         if configuration is None:
             configuration = self.system.current_configuration
-        self.cursor.execute(
-            "SELECT cell FROM configuration WHERE id = ?", (configuration,)
-        )
-        cell_id = self.cursor.fetchone()
-        if cell_id is None:
-            return None, configuration
-        else:
-            return cell_id[0], configuration
+
+        count = self.system.change_count('cell', 'configuration')
+        if count != self._count:
+            self._cells = {}
+            self._cell_ids = {}
+            self._count = count
+
+        if configuration not in self._cell_ids:
+            self.cursor.execute(
+                "SELECT cell FROM configuration WHERE id = ?",
+                (configuration,)
+            )
+            row = self.cursor.fetchone()
+            self._cell_ids[configuration] = None if row is None else row[0]
+        return self._cell_ids[configuration], configuration
 
     def set_cell(self, *args, configuration=None):
         """Set the cell parameters for the configuration.
@@ -110,9 +197,11 @@ class _CellParameters(Table):
                 "UPDATE configuration SET cell = ? WHERE id = ?",
                 (cell_id, configuration)
             )
+            self.system.mark_changed('configuration')
         else:
             parameters.append(cell_id)
             self.cursor.execute(
                 "UPDATE cell SET a=?, b=?, c=?, alpha=?, beta=?, gamma=?"
                 " WHERE id = ?", parameters
             )
+            self.system.mark_changed('cell')
@@ -2,16 +2,298 @@
 
 """Functions for handling CIF files"""
 
+import functools
 import io
 import logging
-import math
+import re
 
-import CifFile
+import numpy
+
+from molsystem.cif_reader import read_cif
 
 logger = logging.getLogger(__name__)
 
 bond_order = {1: 'SING', 2: 'DOUB', 3: 'TRIP'}
 
+# The tags used when reading CIF files
+_cif_tags = (
+    '_cell_', '_atom_site_', '_space_group_symop_', '_symmetry_equiv_pos_'
+)
+
+# The columns of the atom_site loop used when reading mmCIF files, and their
+# types. The author's names and numbering, which match PDB files, are used
+# in preference to the label_ ones.
+_mmcif_dtypes = {
+    '_atom_site.' + key: dtype for key, dtype in (
+        ('type_symbol', str),
+        ('auth_atom_id', str),
+        ('label_atom_id', str),
+        ('auth_comp_id', str),
+        ('label_comp_id', str),
+        ('auth_asym_id', str),
+        ('label_asym_id', str),
+        ('auth_seq_id', str),
+        ('label_seq_id', str),
+        ('cartn_x', float),
+        ('cartn_y', float),
+        ('cartn_z', float),
+        ('pdbx_pdb_model_num', str),
+    )
+}
+
+# The chemical component written by write_mmcif, used if there is no atom_site
+_mmcif_dtypes.update(
+    ('_chem_comp_atom.' + key, dtype) for key, dtype in (
+        ('comp_id', str),
+        ('atom_id', str),
+        ('type_symbol', str),
+        ('model_cartn_x', float),
+        ('model_cartn_y', float),
+        ('model_cartn_z', float),
+    )
+)
+_mmcif_tags = (*_mmcif_dtypes, '_chem_comp_bond.')
+
+# The number of atoms to add to the database at a time
+chunk_atoms = 65536
+
+# A term in a symmetry operation, e.g. '-x', '+1/2' or '0.5*y'
+_term_re = re.compile(
+    r'([+-])?(?:(\d+(?:\.\d*)?|\.\d+)(?:/(\d+(?:\.\d*)?))?)?\*?([xyz])?'
+)
+
+
+def _cif_float(value):
+    """A float from CIF, ignoring any uncertainty, e.g. 0.1234(5)."""
+    return float(value.split('(', 1)[0])
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_symops(operations):
+    """Parse symmetry operations into rotation matrices and translations.
+
+    Parameters
+    ----------
+    operations : (str)
+        The operations as text, e.g. ('x,y,z', '-x+1/2,y,-z').
+
+    Returns
+    -------
+    R, t : ndarray, ndarray
+        The (n, 3, 3) matrices and (n, 3) translations so that an operation
+        maps uvw to R @ uvw + t. They are read-only because they are cached.
+    """
+    n = len(operations)
+    R = numpy.zeros((n, 3, 3))
+    t = numpy.zeros((n, 3))
+    for k, operation in enumerate(operations):
+        components = operation.replace(' ', '').strip("'\"").lower().split(',')
+        if len(components) != 3:
+            raise ValueError(f"Invalid symmetry operation '{operation}'")
+        for i, component in enumerate(components):
+            position = 0
+            while position < len(component):
+                match = _term_re.match(component, position)
+                sign, number, denominator, variable = match.groups()
+                empty = number is None and variable is None
+                if match.end() == position or empty:
+                    raise ValueError(
+                        f"Invalid symmetry operation '{operation}'"
+                    )
+                value = 1.0 if number is None else float(number)
+                if denominator is not None:
+                    value /= float(denominator)
+                if sign == '-':
+                    value = -value
+                if variable is None:
+                    t[k, i] += value
+                else:
+                    R[k, i, 'xyz'.index(variable)] += value
+                position = match.end()
+    R.flags.writeable = False
+    t.flags.writeable = False
+    return R, t
+
+
+def _expand_sites(uvw, R, t, delta=1.0e-04):
+    """Apply symmetry operations to sites, dropping duplicate positions.
+
+    The positions are wrapped into the cell and hashed on a grid with a
+    spacing of delta. A position is a duplicate if each of its coordinates
+    is within delta of those of an earlier position from the same site,
+    allowing for periodicity. Only the positions in the same and
+    neighboring grid cells need to be compared.
+
+    Parameters
+    ----------
+    uvw : ndarray
+        The (n, 3) fractional coordinates of the sites.
+    R, t : ndarray, ndarray
+        The symmetry operations, as from _parse_symops.
+    delta : float = 1.0e-04
+        The tolerance for identical positions.
+
+    Returns
+    -------
+    sites : ndarray
+        The index of the site for each position.
+    positions : ndarray
+        The (m, 3) fractional coordinates, in the order of the sites and
+        then the symmetry operations.
+    """
+    n = uvw.shape[0]
+    k = R.shape[0]
+    positions = numpy.einsum('kij,nj->nki', R, uvw) + t
+    positions -= numpy.floor(positions)
+    # check for almost 1, should be 0
+    positions[1 - positions < delta] = 0.0
+    positions = positions.reshape(-1, 3)
+    sites = numpy.repeat(numpy.arange(n, dtype=numpy.int64), k)
+
+    # Hash the positions on the grid, including the site
+    m = int(numpy.ceil(1 / delta))
+
+    def encode(cells):
+        return ((sites * m + cells[:, 0]) * m + cells[:, 1]) * m + cells[:, 2]
+
+    grid = numpy.minimum((positions / delta).astype(numpy.int64), m - 1)
+    codes = encode(grid)
+    order = numpy.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+
+    keep = numpy.ones(positions.shape[0], dtype=bool)
+    index = numpy.arange(positions.shape[0])
+    for offset in numpy.ndindex(3, 3, 3):
+        # Pair each position with all those in the neighboring grid cell
+        neighbor_codes = encode((grid + numpy.array(offset) - 1) % m)
+        lo = numpy.searchsorted(sorted_codes, neighbor_codes, side='left')
+        hi = numpy.searchsorted(sorted_codes, neighbor_codes, side='right')
+        counts = hi - lo
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        i = numpy.repeat(index, counts)
+        # and the position in sorted_codes of each neighbor in the pairs
+        shift = numpy.repeat(lo - numpy.cumsum(counts) + counts, counts)
+        j = order[numpy.arange(total) + shift]
+        earlier = j < i
+        i = i[earlier]
+        j = j[earlier]
+        difference = positions[j] - positions[i]
+        difference -= numpy.round(difference)
+        close = numpy.all(numpy.abs(difference) < delta, axis=1)
+        keep[i[close]] = False
+    return sites[keep], positions[keep]
+
+
+def _mmcif_atom_site(block):
+    """The atoms from the atom_site loop of a block of a mmCIF file.
+
+    Parameters
+    ----------
+    block : {str: str or [str] or ndarray}
+        The data block, as from read_cif.
+
+    Returns
+    -------
+    xyz : ndarray
+        The n x 3 Cartesian coordinates.
+    symbols : ndarray
+        The element symbols.
+    columns : {str: ndarray}
+        The name, resname, chainid and resseq of the atoms.
+    starts : [int]
+        The first atom of each model, and the number of atoms at the end.
+    """
+
+    def column(*keys):
+        for key in keys:
+            if '_atom_site.' + key in block:
+                return block['_atom_site.' + key]
+        raise RuntimeError(
+            f"The mmCIF file has no '_atom_site.{keys[0]}' items."
+        )
+
+    xyz = numpy.column_stack(
+        (column('cartn_x'), column('cartn_y'), column('cartn_z'))
+    )
+    columns = {
+        'name': column('auth_atom_id', 'label_atom_id'),
+        'resname': column('auth_comp_id', 'label_comp_id'),
+        'chainid': column('auth_asym_id', 'label_asym_id'),
+    }
+    symbols = numpy.char.capitalize(column('type_symbol'))
+    resseq = column('auth_seq_id', 'label_seq_id')
+    resseq[(resseq == '.') | (resseq == '?')] = '0'
+    columns['resseq'] = resseq.astype(numpy.int64)
+
+    # The models are consecutive runs of the model number
+    if '_atom_site.pdbx_pdb_model_num' in block:
+        model = block['_atom_site.pdbx_pdb_model_num']
+        starts = numpy.flatnonzero(model[1:] != model[:-1]) + 1
+    else:
+        starts = numpy.zeros(0, dtype=numpy.int64)
+    return xyz, symbols, columns, [0, *starts.tolist(), xyz.shape[0]]
+
+
+def _mmcif_chem_comp(block):
+    """The atoms and bonds of a chemical component in a mmCIF file.
+
+    This is what write_mmcif writes, a single component with its bonds.
+
+    Parameters
+    ----------
+    block : {str: str or [str] or ndarray}
+        The data block, as from read_cif.
+
+    Returns
+    -------
+    xyz : ndarray
+        The n x 3 Cartesian coordinates.
+    symbols : ndarray
+        The element symbols.
+    columns : {str: ndarray}
+        The name, resname, chainid and resseq of the atoms.
+    starts : [int]
+        0 and the number of atoms, for the one model.
+    bonds : (ndarray, ndarray, ndarray)
+        The indices of the atoms in each bond, and the bond orders.
+    """
+    prefix = '_chem_comp_atom.'
+    xyz = numpy.column_stack(
+        [block[prefix + 'model_cartn_' + axis] for axis in 'xyz']
+    )
+    n = xyz.shape[0]
+    names = block[prefix + 'atom_id']
+    columns = {
+        'name': names,
+        'resname': block[prefix + 'comp_id'],
+        'chainid': numpy.full(n, 'A'),
+        'resseq': numpy.ones(n, dtype=numpy.int64),
+    }
+    symbols = numpy.char.capitalize(block[prefix + 'type_symbol'])
+
+    index = {name: i for i, name in enumerate(names.tolist())}
+    orders = {value: key for key, value in bond_order.items()}
+    prefix = '_chem_comp_bond.'
+    try:
+        i = [index[name] for name in block.get(prefix + 'atom_id_1', [])]
+        j = [index[name] for name in block.get(prefix + 'atom_id_2', [])]
+    except KeyError as e:
+        raise RuntimeError(
+            f"A bond in the mmCIF file is to '{e.args[0]}', "
+            'which is not an atom.'
+        )
+    order = [
+        orders.get(value.upper(), 1)
+        for value in block.get(prefix + 'value_order', [])
+    ]
+    bonds = (
+        numpy.array(i, dtype=numpy.int64), numpy.array(j, dtype=numpy.int64),
+        numpy.array(order, dtype=numpy.int64)
+    )
+    return xyz, symbols, columns, [0, n], bonds
+
 
 class CIFMixin:
     """A mixin for handling CIF files."""
@@ -29,8 +311,20 @@ class CIFMixin:
         text : str
             The text of the file.
         """
+        fd = io.StringIO()
+        self.write_cif(fd, configuration=configuration)
+        return fd.getvalue()[:-1]
+
+    def write_cif(self, fd, configuration=None):
+        """Write a CIF file for the configuration to an open file.
 
-        lines = []
+        Parameters
+        ----------
+        fd : file
+            The open file, or any object with a write method.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
+        """
 
         atoms = self.atoms
 
@@ -43,42 +337,42 @@ class CIFMixin:
         empirical_formula = ''.join(empirical_formula)
 
         # And created the file, line-by-line
-        lines = []
-        lines.append('# Generated by MolSSI SEAMM')
-        lines.append(f"data_{empirical_formula}")
+        write = functools.partial(print, file=fd)
+        write('# Generated by MolSSI SEAMM')
+        write(f"data_{empirical_formula}")
 
         # Cell information
         if self.periodicity == 3:
             cell = self['cell'].cell(configuration)
             a, b, c, alpha, beta, gamma = cell.parameters
             volume = cell.volume
-            lines.append("_symmetry_space_group_name_H-M   'P 1'")
-            lines.append(f'_cell_length_a   {a}')
-            lines.append(f'_cell_length_b   {b}')
-            lines.append(f'_cell_length_c   {c}')
-            lines.append(f'_cell_angle_alpha   {alpha}')
-            lines.append(f'_cell_angle_beta    {beta}')
-            lines.append(f'_cell_angle_gamma   {gamma}')
-            lines.append('_symmetry_Int_Tables_number   1')
-            lines.append(f'_cell_volume   {volume}')
-            lines.append(f'_cell_formula_units_Z   {Z}')
-            lines.append('loop_')
-            lines.append(' _symmetry_equiv_pos_site_id')
-            lines.append(' _symmetry_equiv_pos_as_xyz')
-            lines.append("  1  'x, y, z'")
-
-        lines.append(f'_chemical_formula_structural   {empirical_formula}')
-        lines.append(f"_chemical_formula_sum   '{formula}'")
+            write("_symmetry_space_group_name_H-M   'P 1'")
+            write(f'_cell_length_a   {a}')
+            write(f'_cell_length_b   {b}')
+            write(f'_cell_length_c   {c}')
+            write(f'_cell_angle_alpha   {alpha}')
+            write(f'_cell_angle_beta    {beta}')
+            write(f'_cell_angle_gamma   {gamma}')
+            write('_symmetry_Int_Tables_number   1')
+            write(f'_cell_volume   {volume}')
+            write(f'_cell_formula_units_Z   {Z}')
+            write('loop_')
+            write(' _symmetry_equiv_pos_site_id')
+            write(' _symmetry_equiv_pos_as_xyz')
+            write("  1  'x, y, z'")
+
+        write(f'_chemical_formula_structural   {empirical_formula}')
+        write(f"_chemical_formula_sum   '{formula}'")
 
         # The atoms
-        lines.append('loop_')
-        lines.append(' _atom_site_type_symbol')
-        lines.append(' _atom_site_label')
-        lines.append(' _atom_site_symmetry_multiplicity')
-        lines.append(' _atom_site_fract_x')
-        lines.append(' _atom_site_fract_y')
-        lines.append(' _atom_site_fract_z')
-        lines.append(' _atom_site_occupancy')
+        write('loop_')
+        write(' _atom_site_type_symbol')
+        write(' _atom_site_label')
+        write(' _atom_site_symmetry_multiplicity')
+        write(' _atom_site_fract_x')
+        write(' _atom_site_fract_y')
+        write(' _atom_site_fract_z')
+        write(' _atom_site_occupancy')
 
         # Need unique names
         if 'names' in atoms:
@@ -103,104 +397,155 @@ class CIFMixin:
         symbols = atoms.symbols(configuration)
         for element, name, uvw in zip(symbols, names, UVW):
             u, v, w = uvw
-            lines.append(f'{element} {name}  1  {u:.3f} {v:.3f} {w:.3f}  1')
+            write(f'{element} {name}  1  {u:.3f} {v:.3f} {w:.3f}  1')
 
-        # And that is it!
-        return '\n'.join(lines)
+    def from_cif_text(self, text, configuration=None, as_systems=False):
+        """Create the system from a CIF file.
 
-    def from_cif_text(self, text, configuration=None):
-        """Create the system from a CIF file..
+        Each data block in the file is a structure. The first goes into the
+        configuration given and each further one into a new configuration,
+        or a new system if as_systems is True.
 
         Parameters
         ----------
-        text : str
-            The text from the CIF file
+        text : str or file
+            The text from the CIF file, or the open file.
         configuration : int = None
             The configuration to use, defaults to the current configuration.
+        as_systems : bool = False
+            Put the structures after the first in new systems named after
+            their data blocks, rather than new configurations.
 
         Returns
         -------
-        None
+        [int] or [_System]
+            The configurations, or the systems, for the data blocks.
         """
+        return self._from_cif_blocks(
+            read_cif(text, tags=_cif_tags), configuration, as_systems
+        )
 
-        cif = CifFile.ReadCif(io.StringIO(text))
+    def from_cif_file(self, path, configuration=None, as_systems=False):
+        """Create the system from a CIF file, reading it a line at a time.
 
-        data_blocks = [*cif.keys()]
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The CIF file.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
+        as_systems : bool = False
+            Put the structures after the first in new systems named after
+            their data blocks, rather than new configurations.
 
-        if len(data_blocks) != 1:
-            raise RuntimeError(
-                f'There are {len(data_blocks)} data blocks in the cif file.'
+        Returns
+        -------
+        [int] or [_System]
+            The configurations, or the systems, for the data blocks.
+        """
+        with open(path, 'r') as fd:
+            return self._from_cif_blocks(
+                read_cif(fd, tags=_cif_tags), configuration, as_systems
             )
-        data_block = cif[data_blocks[0]]
 
-        # Reset the system
-        self.clear(configuration=configuration)
+    def _from_cif_blocks(self, blocks, configuration, as_systems):
+        """Create configurations or systems from the blocks of a CIF file.
+
+        Parameters
+        ----------
+        blocks : iterable of (str, dict)
+            The data blocks, as from read_cif.
+        configuration : int = None
+            The configuration for the first block.
+        as_systems : bool
+            Whether to put the other blocks in new systems.
+
+        Returns
+        -------
+        [int] or [_System]
+            The configurations, or the systems, for the data blocks.
+        """
+        if configuration is None:
+            configuration = self.current_configuration
+
+        result = []
+        for name, block in blocks:
+            if len(result) == 0:
+                self.clear(configuration=configuration)
+                system = self
+                result.append(self if as_systems else configuration)
+            elif as_systems:
+                system = self._new_system(name, len(result) + 1)
+                configuration = system.current_configuration
+                result.append(system)
+            else:
+                system = self
+                configuration = self.add_configuration(
+                    name=name, changed_atoms=True
+                )
+                result.append(configuration)
+            system._from_cif_block(block, configuration)
+
+        if len(result) == 0:
+            raise RuntimeError('There are no data blocks in the cif file.')
+        return result
+
+    def _from_cif_block(self, block, configuration):
+        """Create a configuration from one data block of a CIF file.
+
+        Parameters
+        ----------
+        block : {str: str or [str]}
+            The data block, as from read_cif.
+        configuration : int
+            The configuration, which should be empty.
+        """
         self.periodicity = 3
         self.coordinate_system = 'fractional'
 
         # The cell
-        a = data_block['_cell_length_a']
-        b = data_block['_cell_length_b']
-        c = data_block['_cell_length_c']
-        alpha = data_block['_cell_angle_alpha']
-        beta = data_block['_cell_angle_beta']
-        gamma = data_block['_cell_angle_gamma']
-        self.cell.set_cell(a, b, c, alpha, beta, gamma)
-
-        # Add the atoms
-        # TEMPORARILY lower the symmetry to P1
-        delta = 1.0e-04
-        for x, y, z, symbol in zip(
-            data_block['_atom_site_fract_x'],
-            data_block['_atom_site_fract_y'],
-            data_block['_atom_site_fract_z'],
-            data_block['_atom_site_type_symbol']
-        ):  # yapf: disable
-            xs = []
-            ys = []
-            zs = []
-            symbols = []
-            # These variables *are* used in the eval below.
-            x = float(x)
-            y = float(y)
-            z = float(z)
-            for symop in data_block['_space_group_symop_operation_xyz']:
-                x_eq, y_eq, z_eq = symop.split(',')
-                x_new = eval(x_eq)
-                y_new = eval(y_eq)
-                z_new = eval(z_eq)
-                # Translate into cell.
-                x_new = x_new - math.floor(x_new)
-                y_new = y_new - math.floor(y_new)
-                z_new = z_new - math.floor(z_new)
-                # check for almost 1, should be 0
-                if abs(1 - x_new) < delta:
-                    x_new = 0.0
-                if abs(1 - y_new) < delta:
-                    y_new = 0.0
-                if abs(1 - z_new) < delta:
-                    z_new = 0.0
-                found = False
-                for x0, y0, z0 in zip(xs, ys, zs):
-                    if (
-                        abs(x_new - x0) < delta and abs(y_new - y0) < delta and
-                        abs(z_new - z0) < delta
-                    ):
-                        found = True
-                        break
-                if not found:
-                    xs.append(x_new)
-                    ys.append(y_new)
-                    zs.append(z_new)
-                    symbols.append(symbol)
-            self.atoms.append(x=xs, y=ys, z=zs, symbol=symbols)
-
-        # self.atoms.append(
-        #     x=data_block['_atom_site_fract_x'],
-        #     y=data_block['_atom_site_fract_y'],
-        #     z=data_block['_atom_site_fract_z'],
-        #     symbol=data_block['_atom_site_type_symbol']
-        # )
+        try:
+            parameters = [
+                _cif_float(block['_cell_' + key]) for key in (
+                    'length_a', 'length_b', 'length_c', 'angle_alpha',
+                    'angle_beta', 'angle_gamma'
+                )
+            ]
+        except KeyError as e:
+            raise RuntimeError(f'The cif file has no {e.args[0]}.')
+        self.cell.set_cell(*parameters, configuration=configuration)
+
+        # Add the atoms, lowering the symmetry to P1
+        uvw = numpy.array(
+            [
+                [_cif_float(x) for x in block['_atom_site_fract_x']],
+                [_cif_float(y) for y in block['_atom_site_fract_y']],
+                [_cif_float(z) for z in block['_atom_site_fract_z']],
+            ]
+        ).T
+        symbols = block['_atom_site_type_symbol']
+
+        operations = None
+        for key in (
+            '_space_group_symop_operation_xyz', '_symmetry_equiv_pos_as_xyz'
+        ):
+            if key in block:
+                operations = block[key]
+                break
+        if operations is None:
+            operations = ['x,y,z']
+        if isinstance(operations, str):
+            operations = [operations]
+        R, t = _parse_symops(tuple(operations))
+
+        sites, positions = _expand_sites(uvw, R, t)
+        self.atoms.append(
+            configuration=configuration,
+            x=positions[:, 0].tolist(),
+            y=positions[:, 1].tolist(),
+            z=positions[:, 2].tolist(),
+            atno=self.to_atnos(numpy.asarray(symbols))[sites].tolist()
+        )
 
     def to_mmcif_text(self, configuration=None):
         """Create the text of a mmCIF file from the confguration.
@@ -215,8 +560,20 @@ class CIFMixin:
         text : str
             The text of the file.
         """
+        fd = io.StringIO()
+        self.write_mmcif(fd, configuration=configuration)
+        return fd.getvalue()[:-1]
 
-        lines = []
+    def write_mmcif(self, fd, configuration=None):
+        """Write a mmCIF file for the configuration to an open file.
+
+        Parameters
+        ----------
+        fd : file
+            The open file, or any object with a write method.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
+        """
 
         atoms = self.atoms
         bonds = self.bonds
@@ -230,49 +587,49 @@ class CIFMixin:
         empirical_formula = ''.join(empirical_formula)
 
         # And created the file, line-by-line
-        lines = []
-        lines.append('# Generated by MolSSI SEAMM')
-        lines.append(f"data_{empirical_formula}")
-        lines.append(f"_chem_comp.name '{formula}'")
-        lines.append(f"_chem_comp.id '{empirical_formula}'")
-        lines.append(f"_chem_comp.formula   '{formula}'")
+        write = functools.partial(print, file=fd)
+        write('# Generated by MolSSI SEAMM')
+        write(f"data_{empirical_formula}")
+        write(f"_chem_comp.name '{formula}'")
+        write(f"_chem_comp.id '{empirical_formula}'")
+        write(f"_chem_comp.formula   '{formula}'")
 
         # Cell information
         if self.periodicity == 3:
             cell = self['cell'].cell(configuration)
             a, b, c, alpha, beta, gamma = cell.parameters
             volume = cell.volume
-            lines.append("_symmetry_space_group_name_H-M   'P 1'")
-            lines.append(f'_cell_length_a   {a}')
-            lines.append(f'_cell_length_b   {b}')
-            lines.append(f'_cell_length_c   {c}')
-            lines.append(f'_cell_angle_alpha   {alpha}')
-            lines.append(f'_cell_angle_beta    {beta}')
-            lines.append(f'_cell_angle_gamma   {gamma}')
-            lines.append('_symmetry_Int_Tables_number   1')
-            lines.append(f'_cell_volume   {volume}')
-            lines.append(f'_cell_formula_units_Z   {Z}')
-            lines.append('loop_')
-            lines.append(' _symmetry_equiv_pos_site_id')
-            lines.append(' _symmetry_equiv_pos_as_xyz')
-            lines.append("  1  'x, y, z'")
-
-        lines.append(f'_chemical_formula_structural   {empirical_formula}')
-        lines.append(f"_chemical_formula_sum   '{formula}'")
+            write("_symmetry_space_group_name_H-M   'P 1'")
+            write(f'_cell_length_a   {a}')
+            write(f'_cell_length_b   {b}')
+            write(f'_cell_length_c   {c}')
+            write(f'_cell_angle_alpha   {alpha}')
+            write(f'_cell_angle_beta    {beta}')
+            write(f'_cell_angle_gamma   {gamma}')
+            write('_symmetry_Int_Tables_number   1')
+            write(f'_cell_volume   {volume}')
+            write(f'_cell_formula_units_Z   {Z}')
+            write('loop_')
+            write(' _symmetry_equiv_pos_site_id')
+            write(' _symmetry_equiv_pos_as_xyz')
+            write("  1  'x, y, z'")
+
+        write(f'_chemical_formula_structural   {empirical_formula}')
+        write(f"_chemical_formula_sum   '{formula}'")
 
         # The atoms
-        lines.append('loop_')
-        lines.append(' _chem_comp_atom.comp_id')
-        lines.append(' _chem_comp_atom.atom_id')
-        lines.append(' _chem_comp_atom.type_symbol')
-        lines.append(' _chem_comp_atom.model_Cartn_x')
-        lines.append(' _chem_comp_atom.model_Cartn_y')
-        lines.append(' _chem_comp_atom.model_Cartn_z')
-        lines.append(' _chem_comp_atom.pdbx_model_Cartn_x_ideal')
-        lines.append(' _chem_comp_atom.pdbx_model_Cartn_y_ideal')
-        lines.append(' _chem_comp_atom.pdbx_model_Cartn_z_ideal')
-        lines.append(' _chem_comp_atom.pdbx_component_comp_id')
-        lines.append(' _chem_comp_atom.pdbx_residue_numbering')
+        write('loop_')
+        write(' _chem_comp_atom.comp_id')
+        write(' _chem_comp_atom.atom_id')
+        write(' _chem_comp_atom.type_symbol')
+        write(' _chem_comp_atom.model_Cartn_x')
+        write(' _chem_comp_atom.model_Cartn_y')
+        write(' _chem_comp_atom.model_Cartn_z')
+        write(' _chem_comp_atom.pdbx_model_Cartn_x_ideal')
+        write(' _chem_comp_atom.pdbx_model_Cartn_y_ideal')
+        write(' _chem_comp_atom.pdbx_model_Cartn_z_ideal')
+        write(' _chem_comp_atom.pdbx_component_comp_id')
+        write(' _chem_comp_atom.pdbx_residue_numbering')
 
         # Need unique names
         if 'names' in atoms:
@@ -301,25 +658,159 @@ class CIFMixin:
         for element, name, xyza, xyz in zip(symbols, names, XYZa, XYZ):
             xa, ya, za = xyza
             x, y, z = xyz
-            lines.append(
+            write(
                 f'MOL1 {name} {element} {xa:.3f} {ya:.3f} {za:.3f} '
                 f'{x:.3f} {y:.3f} {z:.3f} HET 1'
             )
 
         # The bonds
-        lines.append('#')
-        lines.append('loop_')
-        lines.append(' _chem_comp_bond.comp_id')
-        lines.append(' _chem_comp_bond.atom_id_1')
-        lines.append(' _chem_comp_bond.atom_id_2')
-        lines.append(' _chem_comp_bond.value_order')
+        write('#')
+        write('loop_')
+        write(' _chem_comp_bond.comp_id')
+        write(' _chem_comp_bond.atom_id_1')
+        write(' _chem_comp_bond.atom_id_2')
+        write(' _chem_comp_bond.value_order')
         for row in bonds.bonds(configuration=configuration):
             i = row['i']
             j = row['j']
             order = bond_order[row['bondorder']]
             nm1 = names[i - 1]
             nm2 = names[j - 1]
-            lines.append(f'MOL1 {nm1} {nm2} {order}')
+            write(f'MOL1 {nm1} {nm2} {order}')
+
+    def from_mmcif_text(self, text, configuration=None):
+        """Create the system from the text of a mmCIF file.
+
+        The atom_site loop of the first data block gives the atoms. If there
+        are several models, as in NMR entries, the first goes into the
+        configuration and the others into new configurations.
+
+        Parameters
+        ----------
+        text : str or file
+            The text from the mmCIF file, or the open file.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
+
+        Returns
+        -------
+        [int]
+            The configurations for the models.
+        """
+        return self._from_mmcif_blocks(
+            read_cif(text, tags=_mmcif_tags, dtypes=_mmcif_dtypes),
+            configuration
+        )
+
+    def from_mmcif_file(self, path, configuration=None):
+        """Create the system from a mmCIF file, reading it a line at a time.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The mmCIF file.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
 
-        # And that is it!
-        return '\n'.join(lines)
+        Returns
+        -------
+        [int]
+            The configurations for the models.
+        """
+        with open(path, 'r') as fd:
+            blocks = read_cif(fd, tags=_mmcif_tags, dtypes=_mmcif_dtypes)
+            return self._from_mmcif_blocks(blocks, configuration)
+
+    def _from_mmcif_blocks(self, blocks, configuration):
+        """Create the configurations from the first block of a mmCIF file.
+
+        Parameters
+        ----------
+        blocks : iterable of (str, dict)
+            The data blocks, as from read_cif.
+        configuration : int = None
+            The configuration for the first model.
+
+        Returns
+        -------
+        [int]
+            The configurations for the models.
+        """
+        for name, block in blocks:
+            break
+        else:
+            raise RuntimeError('There are no data blocks in the mmCIF file.')
+
+        if '_chem_comp_atom.model_cartn_x' in block and (
+            '_atom_site.cartn_x' not in block
+        ):
+            xyz, symbols, columns, starts, bonds = _mmcif_chem_comp(block)
+        else:
+            xyz, symbols, columns, starts = _mmcif_atom_site(block)
+            bonds = None
+        resseq = columns.pop('resseq')
+        atnos = self.to_atnos(symbols)
+
+        if configuration is None:
+            configuration = self.current_configuration
+        self.clear(configuration=configuration)
+        self.periodicity = 0
+
+        atoms = self.atoms
+        for key in ('name', 'resname', 'chainid'):
+            if key not in atoms:
+                atoms.add_attribute(key, coltype='string')
+        if 'resseq' not in atoms:
+            atoms.add_attribute('resseq', coltype='int')
+
+        result = []
+        ids = []
+        for start, stop in zip(starts[:-1], starts[1:]):
+            same_atoms = len(result) > 0 and stop - start == len(ids)
+            if len(result) > 0:
+                configuration = self.add_configuration(
+                    name=f'model {len(result) + 1}',
+                    changed_atoms=not same_atoms
+                )
+            result.append(configuration)
+
+            if same_atoms:
+                # Another model of the same atoms, so only the coordinates.
+                for i in range(start, stop, chunk_atoms):
+                    j = min(i + chunk_atoms, stop)
+                    self['coordinates'].append(
+                        configuration=configuration,
+                        atom=ids[i - start:j - start],
+                        x=xyz[i:j, 0].tolist(),
+                        y=xyz[i:j, 1].tolist(),
+                        z=xyz[i:j, 2].tolist()
+                    )
+                continue
+
+            ids = []
+            for i in range(start, stop, chunk_atoms):
+                j = min(i + chunk_atoms, stop)
+                ids.extend(
+                    atoms.append(
+                        configuration=configuration,
+                        atno=atnos[i:j].tolist(),
+                        x=xyz[i:j, 0].tolist(),
+                        y=xyz[i:j, 1].tolist(),
+                        z=xyz[i:j, 2].tolist(),
+                        resseq=resseq[i:j].tolist(),
+                        **{
+                            key: values[i:j].tolist()
+                            for key, values in columns.items()
+                        }
+                    )
+                )
+            if bonds is not None:
+                i, j, order = bonds
+                ids = numpy.array(ids)
+                self.bonds.append(
+                    configuration=configuration,
+                    i=ids[i].tolist(),
+                    j=ids[j].tolist(),
+                    bondorder=order.tolist()
+                )
+        return result
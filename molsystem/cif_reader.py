@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""A fast, streaming reader for CIF and mmCIF files
+
+The reader tokenizes the file a line at a time and returns each data block
+as soon as it is complete, so files with many blocks, or very large blocks,
+do not have to be held in memory as text. A block is returned as a
+dictionary from the tags, in lowercase, to their values. Single items are
+strings; the columns of loops are lists of strings, or NumPy arrays if a
+dtype is requested for the tag.
+
+Only the tags that are wanted need to be kept, which keeps the memory
+needed for large mmCIF files close to that of the data that is used:
+
+    >>> for name, block in read_cif(
+    ...     fd, tags=('_cell_', '_atom_site.'),
+    ...     dtypes={'_atom_site.cartn_x': float}
+    ... ):
+    ...     ...
+
+The reader handles the parts of CIF 1.1 found in practice: comments,
+single- and double-quoted strings, semicolon-delimited text fields,
+'loop_', and 'data_' blocks. Save frames and global blocks are skipped.
+Values of '?' (unknown) and '.' (inapplicable) are kept as is in strings,
+and become NaN in float arrays.
+"""
+
+import logging
+import re
+
+import numpy
+
+logger = logging.getLogger(__name__)
+
+# Tokens on a line: a quoted string, which ends at the matching quote
+# followed by whitespace, a comment, or a bare word.
+_token_re = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(#.*)|(\S+)""")
+
+# The number of rows of a loop to gather before converting them to columns
+chunk_rows = 65536
+
+_reserved = ('data_', 'loop_', 'save_', 'global_', 'stop_')
+
+# The first characters of lines that may not be simple rows of loops
+_special = frozenset(';_dlsgDLSG')
+
+
+def _tokenize(line):
+    """Split a line into tokens, noting which are quoted.
+
+    Returns
+    -------
+    [(str, bool)]
+        The tokens and whether each was quoted.
+    """
+    result = []
+    for single, double, comment, word in _token_re.findall(line):
+        if comment:
+            break
+        if word:
+            result.append((word, False))
+        elif single or not double:
+            # An empty '' is also handled here
+            result.append((single, True))
+        else:
+            result.append((double, True))
+    return result
+
+
+def _wanted(tag, tags):
+    """Whether a tag matches any of the tags or prefixes wanted."""
+    return tags is None or tag.startswith(tags)
+
+
+class _Loop(object):
+    """The columns of a loop being read."""
+
+    def __init__(self, block, tags, dtypes):
+        self.block = block
+        self.tags = []  # The tags for the columns, in order
+        self.keep = []  # The columns to keep: (index, tag, dtype)
+        self.values = []  # Values of the rows not yet moved to the columns
+        self.columns = {}  # The column data, as a list of chunks
+        self._wanted_tags = tags
+        self._dtypes = dtypes
+
+    def add_tag(self, tag):
+        """Add a column to the loop."""
+        if _wanted(tag, self._wanted_tags):
+            self.keep.append(
+                (len(self.tags), tag, self._dtypes.get(tag, None))
+            )
+            self.columns[tag] = []
+        self.tags.append(tag)
+
+    def flush(self, final=False):
+        """Move the complete rows to the columns."""
+        n_columns = len(self.tags)
+        if n_columns == 0:
+            raise ValueError('A loop has no tags.')
+        n = len(self.values) - len(self.values) % n_columns
+        if final and n != len(self.values):
+            raise ValueError(
+                f'The loop with {self.tags[0]} has {len(self.values)} '
+                f'values, which is not a multiple of {n_columns} columns.'
+            )
+        if n == 0:
+            return
+        values = self.values[:n]
+        del self.values[:n]
+        for i, tag, dtype in self.keep:
+            column = values[i::n_columns]
+            if dtype is not None:
+                column = _convert(column, dtype)
+            self.columns[tag].append(column)
+
+    def finish(self):
+        """Finish the loop, putting the columns into the block."""
+        self.flush(final=True)
+        for i, tag, dtype in self.keep:
+            chunks = self.columns[tag]
+            if dtype is None:
+                if len(chunks) == 1:
+                    self.block[tag] = chunks[0]
+                else:
+                    self.block[tag] = [x for chunk in chunks for x in chunk]
+            elif len(chunks) == 0:
+                self.block[tag] = numpy.zeros(0, dtype=dtype)
+            elif len(chunks) == 1:
+                self.block[tag] = chunks[0]
+            else:
+                self.block[tag] = numpy.concatenate(chunks)
+
+
+def _convert(values, dtype):
+    """Convert a list of CIF values to an array."""
+    array = numpy.array(values)
+    try:
+        return array.astype(dtype)
+    except ValueError:
+        if numpy.dtype(dtype).kind != 'f':
+            raise
+    # Strip uncertainties, e.g. 1.234(5), and handle ? and .
+    if any('(' in x for x in values):
+        array = numpy.array([x.split('(', 1)[0] for x in values])
+    array[(array == '?') | (array == '.')] = 'nan'
+    return array.astype(dtype)
+
+
+def read_cif(source, tags=None, dtypes=None):
+    """Read the data blocks of a CIF or mmCIF file, one at a time.
+
+    Parameters
+    ----------
+    source : str or iterable of str
+        The text of the file, or an open file or other iterable giving
+        the lines.
+    tags : str or (str) = None
+        The tags to keep, or their prefixes, e.g. '_atom_site.' for all of
+        the atom_site category in mmCIF, in lowercase. By default all the
+        tags are kept.
+    dtypes : {str: dtype} = None
+        The NumPy dtype to use for the columns of loops. Columns without a
+        dtype are kept as lists of strings.
+
+    Yields
+    ------
+    name : str
+        The name of the data block.
+    block : {str: str or [str] or ndarray}
+        The values for the tags, which are in lowercase.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    if isinstance(tags, str):
+        tags = (tags,)
+    elif tags is not None:
+        tags = tuple(tags)
+    if dtypes is None:
+        dtypes = {}
+    else:
+        dtypes = {k.lower(): v for k, v in dtypes.items()}
+
+    name = None
+    block = None
+    loop = None  # The loop being read, if any
+    in_loop_header = False
+    tag = None  # A tag waiting for its value
+    text = None  # The lines of a text field being read
+    skipping = False  # In a save frame or global block
+
+    for line in source:
+        # The fast path for the rows of loops, without quotes or comments
+        if (
+            loop is not None and not in_loop_header and text is None and
+            "'" not in line and '"' not in line and '#' not in line
+        ):
+            words = line.split()
+            if len(words) > 0 and (
+                words[0][0] not in _special or not (
+                    words[0][0] == ';' or words[0][0] == '_' or
+                    words[0].lower().startswith(_reserved)
+                )
+            ):
+                loop.values.extend(words)
+                if len(loop.values) >= chunk_rows * len(loop.tags):
+                    loop.flush()
+                continue
+
+        line = line.rstrip('\r\n')
+
+        # Text fields, delimited by semicolons at the start of lines
+        if text is not None:
+            if line.startswith(';'):
+                value = '\n'.join(text)
+                text = None
+                tokens = [(value, True)]
+                rest = line[1:]
+                if rest.strip() != '':
+                    tokens.extend(_tokenize(rest))
+            else:
+                text.append(line)
+                continue
+        elif line.startswith(';'):
+            text = [line[1:]]
+            continue
+        elif "'" in line or '"' in line or '#' in line:
+            tokens = _tokenize(line)
+        else:
+            tokens = [(word, False) for word in line.split()]
+
+        for token, quoted in tokens:
+            if not quoted:
+                lower = token.lower()
+                if lower.startswith(_reserved):
+                    if loop is not None:
+                        loop.finish()
+                        loop = None
+                    if tag is not None:
+                        raise ValueError(f'No value for {tag} in {name}')
+                    if lower.startswith('data_'):
+                        if block is not None:
+                            yield name, block
+                        name = token[5:]
+                        block = {}
+                        skipping = False
+                    elif lower == 'loop_':
+                        loop = _Loop(
+                            {} if skipping or block is None else block, tags,
+                            dtypes
+                        )
+                        in_loop_header = True
+                    elif lower.startswith('save_'):
+                        # A save frame is skipped up to the bare save_
+                        skipping = len(token) > 5
+                    elif lower.startswith('global_'):
+                        skipping = True
+                    continue
+                if token[0] == '_':
+                    if in_loop_header:
+                        loop.add_tag(lower)
+                        continue
+                    if loop is not None:
+                        loop.finish()
+                        loop = None
+                    if tag is not None:
+                        raise ValueError(f'No value for {tag} in {name}')
+                    tag = lower
+                    continue
+            # A value
+            if tag is not None:
+                if block is None:
+                    raise ValueError(f'{tag} is not in a data block')
+                if not skipping and _wanted(tag, tags):
+                    block[tag] = token
+                tag = None
+            elif loop is not None:
+                in_loop_header = False
+                loop.values.append(token)
+            else:
+                raise ValueError(f"Unexpected value '{token}' in {name}")
+
+    if text is not None:
+        raise ValueError(f'Unterminated text field in {name}')
+    if loop is not None:
+        loop.finish()
+    if tag is not None:
+        raise ValueError(f'No value for {tag} in {name}')
+    if block is not None:
+        yield name, block
@@ -16,9 +16,9 @@ class _Column(FrozenColumn, collections.abc.MutableSequence):
     updates the SQL database appropriately.
     """
 
-    def __init__(self, table, column: str, sql=None, where=''):
+    def __init__(self, table, column: str, sql=None, where='', parameters=()):
         self._rowids = None
-        super().__init__(table, column, sql, where)
+        super().__init__(table, column, sql, where, parameters)
 
     def __setitem__(self, index, value) -> None:
         """Allow x[index] access to the data"""
@@ -70,7 +70,8 @@ class _Column(FrozenColumn, collections.abc.MutableSequence):
                 f"UPDATE {table} SET {self.column} = ? WHERE rowid = ?",
                 parameters
             )
-        db.commit()
+        self._table.system.commit()
+        self._table.system.mark_changed(self._table._table)
 
     def __delitem__(self, index, value) -> None:
         """Do NOT allow deletion!"""
@@ -96,6 +97,6 @@ class _Column(FrozenColumn, collections.abc.MutableSequence):
         else:
             sql = self._sql
 
-        for row in self._table.db.execute(sql):
+        for row in self._table.db.execute(sql, self._parameters):
             self._rowids.append(row[0])
             self._data.append(row[1])
@@ -1,5 +1,7 @@
 """Tabulated data about the elements."""
 
+import numpy
+
 # From https://ciaaw.org/abridged-atomic-weights.htm  30 July 2020
 # With missing masses from WebElements
 # yapf: disable
@@ -832,3 +834,46 @@ element_data = {
     }
 }
 # yapf: enable
+
+# The data as lookups shared by all systems. The arrays are indexed by atomic
+# number, so the first entry, for atomic number 0, is a placeholder.
+_by_atno = sorted(element_data.values(), key=lambda x: x['atomic number'])
+atomic_symbols = numpy.array(
+    [''] + [x['atomic symbol'] for x in _by_atno], dtype='U2'
+)
+atomic_masses = numpy.array(
+    [numpy.nan] + [x['atomic weight'] for x in _by_atno]
+)
+symbol_to_atno = {x['atomic symbol']: x['atomic number'] for x in _by_atno}
+atno_to_symbol = {x['atomic number']: x['atomic symbol'] for x in _by_atno}
+symbol_to_mass = {x['atomic symbol']: x['atomic weight'] for x in _by_atno}
+atno_to_mass = {x['atomic number']: x['atomic weight'] for x in _by_atno}
+
+
+def symbol_keys(symbols):
+    """Integer keys for element symbols, from the codes of their characters.
+
+    Parameters
+    ----------
+    symbols : numpy.ndarray
+        The symbols, of at most two characters.
+
+    Returns
+    -------
+    numpy.ndarray
+        The keys, as a 1-D array of integers, or 0 for symbols with
+        characters that are not ASCII.
+    """
+    codes = symbols.astype('U2').reshape(-1).view(numpy.uint32)
+    first = codes[0::2]
+    second = codes[1::2]
+    keys = (first << 7) | second
+    keys[(first | second) >= 128] = 0
+    return keys
+
+
+# The atomic number for each key of a symbol, or 0 for keys of no element,
+# for finding the atomic numbers of an array of symbols by indexing.
+atno_by_key = numpy.zeros(128 * 128, dtype=numpy.int64)
+_keys = symbol_keys(atomic_symbols[1:])
+atno_by_key[_keys] = numpy.arange(1, len(atomic_symbols))
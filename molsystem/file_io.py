@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""Reading and writing files in any of the supported formats
+
+The readers and writers for each format work with open files a line at a
+time, so read() and write() can handle large files with little memory.
+Files compressed with gzip or xz are handled transparently: when reading
+they are recognized from their first bytes, and when writing from the
+'.gz' or '.xz' suffix of the path.
+
+    >>> system.write('big.pdb.gz')
+    >>> other.read('big.pdb.gz')
+"""
+
+import contextlib
+import functools
+import gzip
+import io
+import logging
+import lzma
+import os
+from pathlib import PurePath
+
+logger = logging.getLogger(__name__)
+
+# The reader and writer for each format. The readers take the open file as
+# the text and the writers the open file and configuration(s).
+_formats = {
+    'cif': ('from_cif_text', 'write_cif'),
+    'mmcif': ('from_mmcif_text', 'write_mmcif'),
+    'molfile': ('from_molfile_text', 'write_molfile'),
+    'pdb': ('from_pdb_text', 'write_pdb'),
+}
+
+# The formats for the suffixes of filenames
+_suffixes = {
+    '.cif': 'cif',
+    '.ent': 'pdb',
+    '.mdl': 'molfile',
+    '.mmcif': 'mmcif',
+    '.mol': 'molfile',
+    '.pdb': 'pdb',
+    '.sdf': 'molfile',
+}
+
+# The compression methods, with their suffixes and the first bytes of files.
+# The default level for gzip, 9, is 4-5 times slower than 6 for files only
+# 2-3% smaller, so use 6 like the gzip program does.
+_gzip_open = functools.partial(gzip.open, compresslevel=6)
+_compression = {
+    'gzip': ('.gz', b'\x1f\x8b', _gzip_open),
+    'xz': ('.xz', b'\xfd7zXZ\x00', lzma.open),
+}
+
+
+def _is_path(path_or_fh):
+    """Whether the argument is a path rather than an open file."""
+    return isinstance(path_or_fh, (str, os.PathLike))
+
+
+def guess_format(path_or_fh):
+    """The format of a file from the suffix of its name.
+
+    Parameters
+    ----------
+    path_or_fh : str, pathlib.Path or file
+        The path, or an open file with a name.
+
+    Returns
+    -------
+    str
+        The format, e.g. 'pdb'.
+    """
+    if _is_path(path_or_fh):
+        name = path_or_fh
+    else:
+        name = getattr(path_or_fh, 'name', None)
+    if not isinstance(name, (str, os.PathLike)):
+        raise ValueError('The format must be given for files without names.')
+    suffixes = [suffix.lower() for suffix in PurePath(name).suffixes]
+    compressed = [value[0] for value in _compression.values()]
+    if len(suffixes) > 0 and suffixes[-1] in compressed:
+        suffixes.pop()
+    if len(suffixes) == 0 or suffixes[-1] not in _suffixes:
+        raise ValueError(f"Cannot tell the format of the file '{name}'.")
+    return _suffixes[suffixes[-1]]
+
+
+@contextlib.contextmanager
+def open_file(path_or_fh, mode='r'):
+    """Open a file for reading or writing text, handling compression.
+
+    Parameters
+    ----------
+    path_or_fh : str, pathlib.Path or file
+        The path, or an open file. Open files are not closed. Binary files
+        are read as text, uncompressing them if needed, which requires that
+        they can peek ahead or seek back.
+    mode : str = 'r'
+        'r' to read or 'w' to write.
+
+    Yields
+    ------
+    file
+        The file, opened for text.
+    """
+    if mode not in ('r', 'w'):
+        raise ValueError(f"The mode must be 'r' or 'w', not '{mode}'")
+
+    if not _is_path(path_or_fh):
+        if isinstance(path_or_fh, io.TextIOBase):
+            yield path_or_fh
+            return
+        # A binary file, which may be compressed when reading
+        opener = None
+        start = b''
+        if mode == 'r' and hasattr(path_or_fh, 'peek'):
+            start = path_or_fh.peek(6)
+        elif mode == 'r' and path_or_fh.seekable():
+            position = path_or_fh.tell()
+            start = path_or_fh.read(6)
+            path_or_fh.seek(position)
+        for suffix, magic, function in _compression.values():
+            if start.startswith(magic):
+                opener = function
+        if opener is not None:
+            with opener(path_or_fh, mode + 't') as fd:
+                yield fd
+        else:
+            fd = io.TextIOWrapper(path_or_fh)
+            try:
+                yield fd
+            finally:
+                fd.flush()
+                fd.detach()
+        return
+
+    opener = open
+    if mode == 'r':
+        with open(path_or_fh, 'rb') as fd:
+            start = fd.read(6)
+        for suffix, magic, function in _compression.values():
+            if start.startswith(magic):
+                opener = function
+    else:
+        suffix = PurePath(path_or_fh).suffix.lower()
+        for compressed, magic, function in _compression.values():
+            if suffix == compressed:
+                opener = function
+    with opener(path_or_fh, mode + 't') as fd:
+        yield fd
+
+
+class FileIOMixin:
+    """A mixin for reading and writing files in any supported format."""
+
+    def read(self, path_or_fh, format=None, configuration=None, **kwargs):
+        """Read a file into the system.
+
+        Parameters
+        ----------
+        path_or_fh : str, pathlib.Path or file
+            The path, or an open file.
+        format : str = None
+            The format: 'cif', 'mmcif', 'molfile' or 'pdb'. By default it
+            is taken from the suffix of the filename.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
+        kwargs : {str: Any}
+            Other arguments for the reader for the format.
+
+        Returns
+        -------
+        Any
+            What the reader for the format returns, e.g. the configurations.
+        """
+        reader, writer = self._file_format(path_or_fh, format)
+        with open_file(path_or_fh, 'r') as fd:
+            read = getattr(self, reader)
+            return read(fd, configuration=configuration, **kwargs)
+
+    def write(self, path_or_fh, format=None, configuration=None, **kwargs):
+        """Write the system to a file.
+
+        Parameters
+        ----------
+        path_or_fh : str, pathlib.Path or file
+            The path, or an open file. Paths ending in '.gz' or '.xz' are
+            compressed.
+        format : str = None
+            The format: 'cif', 'mmcif', 'molfile' or 'pdb'. By default it
+            is taken from the suffix of the filename.
+        configuration : int or [int] = None
+            The configuration to use, defaults to the current configuration.
+            Formats that can hold several configurations, such as PDB,
+            accept a list.
+        kwargs : {str: Any}
+            Other arguments for the writer for the format.
+        """
+        reader, writer = self._file_format(path_or_fh, format)
+        with open_file(path_or_fh, 'w') as fd:
+            getattr(self, writer)(fd, configuration, **kwargs)
+
+    def _file_format(self, path_or_fh, format):
+        """The reader and writer for a file."""
+        if format is None:
+            format = guess_format(path_or_fh)
+        format = format.lower()
+        if format in ('mol', 'sdf'):
+            format = 'molfile'
+        if format not in _formats:
+            raise ValueError(f"The format '{format}' is not supported.")
+        return _formats[format]
@@ -12,11 +12,12 @@ class _FrozenColumn(collections.abc.Sequence):
     This is a wrapper around a single column in a SQL table.
     """
 
-    def __init__(self, table, column: str, sql=None, where=''):
+    def __init__(self, table, column: str, sql=None, where='', parameters=()):
         self._table = table
         self._column = column
         self._sql = sql
         self._where = where
+        self._parameters = parameters
         self._data = None
 
         self._initialize()
@@ -54,9 +55,9 @@ class _FrozenColumn(collections.abc.Sequence):
                 f'SELECT {self.column} FROM {self._table.table} {self._where}'
             )
         else:
-            sql = sql._sql
+            sql = self._sql
 
-        for row in self._table.db.execute(sql):
+        for row in self._table.db.execute(sql, self._parameters):
             self._data.append(row[0])
 
     def equal(self, other, tol=1.0e-6):
@@ -1,12 +1,280 @@
 # -*- coding: utf-8 -*-
 
-"""Functions for handling MDL molfiles"""
+"""Functions for handling MDL molfiles and SD files
 
+An SD file is a series of molfiles, each followed by optional data items and
+a line '$$$$'. The reader works a line at a time and returns each molecule
+as soon as it is complete, so libraries with millions of molecules can be
+streamed from open files:
+
+    >>> for record in read_sdf(fd):
+    ...     print(record['title'], len(record['symbols']))
+
+Both V3000 and V2000 connection tables are read; V3000 is written.
+"""
+
+import functools
+import io
 import logging
+import re
 import time
 
 logger = logging.getLogger(__name__)
 
+# Tokens on a V3000 line: a quoted string, with "" for a quote inside it, or
+# a bare word.
+_token_re = re.compile(r'"((?:[^"]|"")*)"|(\S+)')
+
+# The formal charges for the charge codes in the atom block of V2000 files
+_v2000_charges = {1: 3, 2: 2, 3: 1, 5: -1, 6: -2, 7: -3}
+
+
+def _tokenize(line):
+    """Split the text of a V3000 line into its tokens."""
+    if '"' not in line:
+        return line.split()
+    return [
+        word if word else quoted.replace('""', '"')
+        for quoted, word in _token_re.findall(line)
+    ]
+
+
+def _v3000_ctab(lines):
+    """Read a V3000 connection table, up to and including 'M  END'.
+
+    Parameters
+    ----------
+    lines : iterator of str
+        The lines after the counts line of the molfile.
+
+    Returns
+    -------
+    dict
+        The symbols, coordinates, charges and bonds.
+    """
+    ids = []
+    symbols = []
+    xs = []
+    ys = []
+    zs = []
+    charges = []
+    have_charges = False
+    iatoms = []
+    jatoms = []
+    orders = []
+    counts = None
+
+    block = None
+    continued = ''
+    for line in lines:
+        if line.startswith('M  V30 '):
+            text = line[7:].rstrip()
+            if text.endswith('-'):
+                continued += text[:-1]
+                continue
+            if continued != '':
+                text = continued + text
+                continued = ''
+            tokens = _tokenize(text)
+            if len(tokens) == 0:
+                continue
+            if block == 'ATOM' and tokens[0] != 'END':
+                ids.append(tokens[0])
+                symbols.append(tokens[1])
+                xs.append(float(tokens[2]))
+                ys.append(float(tokens[3]))
+                zs.append(float(tokens[4]))
+                charge = 0
+                for token in tokens[6:]:
+                    if token.startswith('CHG='):
+                        charge = int(token[4:])
+                        have_charges = True
+                charges.append(charge)
+            elif block == 'BOND' and tokens[0] != 'END':
+                orders.append(int(tokens[1]))
+                iatoms.append(tokens[2])
+                jatoms.append(tokens[3])
+            elif tokens[0] == 'BEGIN':
+                block = tokens[1]
+            elif tokens[0] == 'END':
+                block = None
+            elif tokens[0] == 'COUNTS':
+                counts = int(tokens[1]), int(tokens[2])
+        elif line.startswith('M  END'):
+            break
+    else:
+        raise ValueError("The molfile has no 'M  END' line.")
+
+    if counts is not None and counts != (len(symbols), len(orders)):
+        raise ValueError(
+            f'The molfile has {len(symbols)} atoms and {len(orders)} bonds '
+            f'but the counts are {counts[0]} and {counts[1]}.'
+        )
+
+    # The atoms are referred to by their index, which need not be 1...n
+    index = {atom: n for n, atom in enumerate(ids)}
+    try:
+        iatoms = [index[atom] for atom in iatoms]
+        jatoms = [index[atom] for atom in jatoms]
+    except KeyError as e:
+        raise ValueError(f'A bond is to atom {e.args[0]}, which is not known.')
+
+    return {
+        'symbols': symbols,
+        'x': xs,
+        'y': ys,
+        'z': zs,
+        'charges': charges if have_charges else None,
+        'i': iatoms,
+        'j': jatoms,
+        'bondorders': orders,
+    }
+
+
+def _v2000_ctab(counts, lines):
+    """Read a V2000 connection table, up to and including 'M  END'.
+
+    Parameters
+    ----------
+    counts : str
+        The counts line.
+    lines : iterator of str
+        The lines after the counts line of the molfile.
+
+    Returns
+    -------
+    dict
+        The symbols, coordinates, charges and bonds.
+    """
+    n_atoms = int(counts[0:3])
+    n_bonds = int(counts[3:6])
+
+    symbols = []
+    xs = []
+    ys = []
+    zs = []
+    charges = []
+    for line in _take(lines, n_atoms):
+        xs.append(float(line[0:10]))
+        ys.append(float(line[10:20]))
+        zs.append(float(line[20:30]))
+        symbols.append(line[31:34].strip())
+        code = line[36:39].strip()
+        charges.append(_v2000_charges.get(int(code), 0) if code else 0)
+
+    iatoms = []
+    jatoms = []
+    orders = []
+    for line in _take(lines, n_bonds):
+        iatoms.append(int(line[0:3]) - 1)
+        jatoms.append(int(line[3:6]) - 1)
+        orders.append(int(line[6:9]))
+
+    # The properties. Any 'M  CHG' lines replace the charges in the atom block
+    have_charges = any(charges)
+    reset = True
+    for line in lines:
+        if line.startswith('M  END'):
+            break
+        if line.startswith('M  CHG'):
+            if reset:
+                charges = [0] * n_atoms
+                reset = False
+            fields = line[6:].split()
+            for n in range(int(fields[0])):
+                charges[int(fields[2 * n + 1]) - 1] = int(fields[2 * n + 2])
+            have_charges = True
+    else:
+        raise ValueError("The molfile has no 'M  END' line.")
+
+    return {
+        'symbols': symbols,
+        'x': xs,
+        'y': ys,
+        'z': zs,
+        'charges': charges if have_charges else None,
+        'i': iatoms,
+        'j': jatoms,
+        'bondorders': orders,
+    }
+
+
+def _take(lines, n):
+    """The next n lines, raising an error if there are too few."""
+    result = []
+    if n == 0:
+        return result
+    for line in lines:
+        result.append(line)
+        if len(result) == n:
+            return result
+    raise ValueError('The molfile ends in the connection table.')
+
+
+def read_sdf(source):
+    """Read the molecules in an SD file or molfile, one at a time.
+
+    Parameters
+    ----------
+    source : str or iterable of str
+        The text of the file, or an open file or other iterable giving the
+        lines.
+
+    Yields
+    ------
+    dict
+        The molecule: 'title', 'comment', 'symbols', the coordinates 'x',
+        'y' and 'z', the formal 'charges' or None if there are none, the
+        bonds as 0-based indices of the atoms 'i' and 'j' with their
+        'bondorders', and the SD 'data' items as a dictionary of strings.
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    lines = (line.rstrip('\r\n') for line in source)
+
+    for title in lines:
+        header = next(lines, None)
+        if header is None:
+            if title.strip() == '':
+                # Blank lines at the end of the file
+                break
+            raise ValueError('The molfile ends after the title.')
+        comment = next(lines, None)
+        counts = next(lines, None)
+        if counts is None:
+            raise ValueError('The molfile ends before the counts line.')
+
+        if 'V3000' in counts:
+            record = _v3000_ctab(lines)
+        elif 'V2000' in counts or len(counts.split()) >= 2:
+            record = _v2000_ctab(counts, lines)
+        else:
+            raise ValueError(f"The molfile has no counts line: '{counts}'")
+        record['title'] = title.strip()
+        record['comment'] = comment
+
+        # Any data items, up to the end of the record
+        data = record['data'] = {}
+        name = None
+        for line in lines:
+            if line.startswith('$$$$'):
+                break
+            if line.startswith('>'):
+                start = line.find('<')
+                stop = line.find('>', start)
+                name = line[start + 1:stop] if start > 0 else ''
+                values = []
+            elif name is not None:
+                if line.strip() == '':
+                    data[name] = '\n'.join(values)
+                    name = None
+                else:
+                    values.append(line)
+        if name is not None:
+            data[name] = '\n'.join(values)
+
+        yield record
+
 
 class MolFileMixin:
     """A mixin for handling MDL Molfiles."""
@@ -18,8 +286,9 @@ class MolFileMixin:
 
         Parameters
         ----------
-        configuration : int = None
+        configuration : int or [int] = None
             The configuration to use, defaults to the current configuration.
+            A list of configurations gives an SD file.
         title : str = None
             The title for the structure, by default the system name.
         comment : str = 'Exported from SEAMM'
@@ -30,182 +299,231 @@ class MolFileMixin:
         text : str
             The text of the file.
         """
+        fd = io.StringIO()
+        self.write_molfile(
+            fd, configuration=configuration, title=title, comment=comment
+        )
+        return fd.getvalue()[:-1]
 
-        lines = []
+    def write_molfile(
+        self,
+        fd,
+        configuration=None,
+        title=None,
+        comment='Exported from SEAMM'
+    ):
+        """Write a Molfile for the system to an open file.
 
-        atoms = self.atoms
-        bonds = self.bonds
+        If a list of configurations is given, an SD file is written with a
+        molfile for each, followed by '$$$$'.
+
+        Parameters
+        ----------
+        fd : file
+            The open file, or any object with a write method.
+        configuration : int or [int] = None
+            The configuration to use, defaults to the current configuration.
+        title : str = None
+            The title for the structure, by default the system name, or the
+            name of the configuration for SD files.
+        comment : str = 'Exported from SEAMM'
+            Comment line
+        """
+        write = functools.partial(print, file=fd)
 
         if configuration is None:
             configuration = self.current_configuration
-        n_atoms = atoms.n_atoms(configuration=configuration)
-        n_bonds = bonds.n_bonds(configuration=configuration)
+        if isinstance(configuration, int):
+            self._write_molfile_record(
+                write, configuration, self.name if title is None else title,
+                comment
+            )
+        else:
+            for cid in configuration:
+                if title is None:
+                    name = self.db.execute(
+                        'SELECT name FROM configuration WHERE id = ?', (cid,)
+                    ).fetchone()[0]
+                    if name is None:
+                        name = self.name
+                else:
+                    name = title
+                self._write_molfile_record(write, cid, name, comment)
+                write('$$$$')
 
-        nsgroups = 0
-        n3d = 0
-        is_chiral = 0  # may need to think about this later.
+    def _write_molfile_record(self, write, configuration, title, comment):
+        """Write the molfile for one configuration.
 
-        if title is None:
-            lines.append(self.name)
-        else:
-            lines.append(title)
-        date_time = time.strftime('%m%d%y%H%M')
+        Parameters
+        ----------
+        write : function
+            The function to write a line.
+        configuration : int
+            The configuration.
+        title : str
+            The title line.
+        comment : str
+            The comment line.
+        """
+        to_symbol = self._atno_to_symbol
 
-        lines.append('PS' + 'SEAMM_WF' + date_time + '3D')
-        lines.append(comment)
-        lines.append('  0  0  0     0  0            999 V3000')
+        columns = 'at.id, at.atno, co.x, co.y, co.z'
+        charged = 'formal_charge' in self.atoms
+        if charged:
+            columns += ', at.formal_charge'
+        atoms = self._pdb_query(columns, configuration)
+        index = {row[0]: n for n, row in enumerate(atoms, start=1)}
 
-        lines.append('M  V30 BEGIN CTAB')
-        lines.append(
-            'M  V30 COUNTS {} {} {} {} {}'.format(
-                n_atoms, n_bonds, nsgroups, n3d, is_chiral
+        subset = self.all_subset(configuration)
+        bonds = self.db.execute(
+            'SELECT iatom.atom, jatom.atom, templatebond.bondorder'
+            '  FROM subset_atom as iatom'
+            ' CROSS JOIN templatebond CROSS JOIN subset_atom as jatom'
+            ' WHERE templatebond.i = iatom.templateatom'
+            '   AND templatebond.j = jatom.templateatom'
+            '   AND iatom.subset = ? AND jatom.subset = ?', (subset, subset)
+        ).fetchall()
+
+        date_time = time.strftime('%m%d%y%H%M')
+        lines = [
+            title,
+            'PS' + 'SEAMM_WF' + date_time + '3D',
+            comment,
+            '  0  0  0     0  0            999 V3000',
+            'M  V30 BEGIN CTAB',
+            f'M  V30 COUNTS {len(atoms)} {len(bonds)} 0 0 0',
+            'M  V30 BEGIN ATOM',
+        ]
+        for n, row in enumerate(atoms, start=1):
+            line = (
+                f'M  V30 {n} {to_symbol[row[1]]} {row[2]} {row[3]} {row[4]} 0'
             )
-        )
-        lines.append('M  V30 BEGIN ATOM')
-        count = 0
-        if 'formal charges' in atoms:
-            for row in atoms.atoms(configuration):
-                count += 1
-                symbol = self.to_symbols([row['atno']])
-                lines.append(
-                    f"M  V30 {count} {symbol} {row['x']} {row['y']} {row['z']}"
-                    " 0 CHG={row['formal charge']}"
-                )
-        else:
-            for row in atoms.atoms(configuration=configuration):
-                count += 1
-                symbol = self.to_symbols([row['atno']])[0]
-                lines.append(
-                    f"M  V30 {count} {symbol} {row['x']} {row['y']} {row['z']}"
-                    " 0"
-                )
+            if charged and row[5]:
+                line += f' CHG={row[5]}'
+            lines.append(line)
         lines.append('M  V30 END ATOM')
         lines.append('M  V30 BEGIN BOND')
-        count = 0
-        for row in bonds.bonds(configuration=configuration):
-            count += 1
-            lines.append(
-                f"M  V30 {count} {row['bondorder']} "
-                f"{row['i']} {row['j']}"
-            )
+        for n, (i, j, order) in enumerate(bonds, start=1):
+            lines.append(f'M  V30 {n} {order} {index[i]} {index[j]}')
         lines.append('M  V30 END BOND')
         lines.append('M  V30 END CTAB')
         lines.append('M  END')
+        write('\n'.join(lines))
 
-        return '\n'.join(lines)
+    def from_molfile_text(self, data, configuration=None, as_systems=False):
+        """Create the system from an MDL Molfile or SD file.
 
-    def from_molfile_text(self, data, configuration=None):
-        """Create the system from an MDL Molfile, version 3
+        The first molecule goes into the configuration given, and each
+        further molecule in an SD file into a new configuration, named by
+        the title of the molecule, or into a new system if as_systems is
+        True. The lines are handled one molecule at a time, so an open file
+        can be read without holding it all in memory.
 
         Parameters
         ----------
-        data : str
-            The complete text of the Molfile.
+        data : str, [str] or file
+            The complete text of the file, its lines, or an open file.
         configuration : int = None
             The configuration to use, defaults to the current configuration.
+        as_systems : bool = False
+            Whether to put each molecule after the first in a new system.
+
+        Returns
+        -------
+        [int] or [_System]
+            The configurations, or the systems, for the molecules.
         """
+        result = self._from_records(read_sdf(data), configuration, as_systems)
+        if len(result) == 0:
+            raise RuntimeError('There are no molecules in the molfile.')
+        return result
+
+    def _from_records(self, records, configuration, as_systems):
+        """Add molecules to configurations or systems.
 
-        self.clear(configuration=configuration)
+        Parameters
+        ----------
+        records : iterable of dict
+            The molecules, as from read_sdf.
+        configuration : int
+            The configuration for the first molecule, defaults to the current
+            configuration.
+        as_systems : bool
+            Whether to put each molecule after the first in a new system.
+
+        Returns
+        -------
+        [int] or [_System]
+            The configurations, or the systems, for the molecules.
+        """
+        if configuration is None:
+            configuration = self.current_configuration
+
+        # Commit the changes once at the end, not for each table and molecule
+        result = []
+        with self.batch():
+            for record in records:
+                title = record['title']
+                if len(result) == 0:
+                    self.clear(configuration=configuration)
+                    self.name = title
+                    system = self
+                    result.append(self if as_systems else configuration)
+                elif as_systems:
+                    system = self._new_system(title, len(result) + 1)
+                    configuration = system.current_configuration
+                    result.append(system)
+                else:
+                    system = self
+                    configuration = self.add_configuration(
+                        name=title, changed_atoms=True, changed_bonds=True
+                    )
+                    result.append(configuration)
+                with system.batch():
+                    system._add_molfile_record(record, configuration)
+        return result
+
+    def _add_molfile_record(self, record, configuration):
+        """Add the atoms and bonds of a molecule to a configuration.
+
+        Parameters
+        ----------
+        record : dict
+            The molecule, as from read_sdf.
+        configuration : int
+            The configuration, which should be empty.
+        """
         self.periodicity = 0
 
-        n_molecules = 0
-        lines = enumerate(data.splitlines())
-
-        # title
-        lineno, title = next(lines)
-        self.name = title.strip()
-        # header
-        next(lines)
-        # comment
-        next(lines)
-        lineno, line = next(lines)
-        if line.split()[6] != 'V3000':
-            raise RuntimeError(
-                f"molfile:to_seamm -- the file is not version 3: '{line}'"
+        try:
+            atnos = self.to_atnos(record['symbols'])
+        except KeyError as e:
+            raise ValueError(
+                f"'{e.args[0]}' in molecule '{record['title']}' is not an "
+                'element.'
+            )
+
+        kwargs = {}
+        if record['charges'] is not None:
+            if 'formal_charge' not in self.atoms:
+                self.atoms.add_attribute(
+                    'formal_charge', coltype='int', default=0
+                )
+            kwargs['formal_charge'] = record['charges']
+
+        atom_ids = self.atoms.append(
+            configuration=configuration,
+            x=record['x'],
+            y=record['y'],
+            z=record['z'],
+            atno=atnos,
+            **kwargs
+        )
+
+        if len(record['i']) > 0:
+            self.bonds.append(
+                i=[atom_ids[i] for i in record['i']],
+                j=[atom_ids[j] for j in record['j']],
+                bondorder=record['bondorders'],
+                configuration=configuration
             )
-        for lineno, line in lines:
-            logger.debug(f'{lineno}: {line}')
-            if 'M  END' in line:
-                break
-            elif 'M  V30 BEGIN CTAB' in line:
-                n_molecules += 1
-                if n_molecules > 1:
-                    raise NotImplementedError('Multiple molecules?')
-            elif 'M V30 END CTAB' in line:
-                pass
-            elif 'M  V30 COUNTS' in line:
-                natoms, nbonds, nsgroups, n3d, is_chiral = line.split()[3:]
-
-                natoms = int(natoms)
-                nbonds = int(nbonds)
-                # not used, yet.
-                # nsgroups = int(nsgroups)
-                # n3d = int(n3d)
-                # is_chiral = bool(is_chiral)
-            elif 'M  V30 BEGIN ATOM' in line:
-                logger.debug('In atom table')
-                xs = []
-                ys = []
-                zs = []
-                symbols = []
-                formal_charges = []
-                have_formal_charges = False
-                for lineno, line in lines:
-                    if 'M  V30 END ATOM' in line:
-                        logger.debug(f'Saving {len(xs)} atoms to system')
-                        if (
-                            have_formal_charges and
-                            'formal_charges' not in self.atoms
-                        ):
-                            logger.debug('   with formal charges')
-                            self.atoms.add_attribute(
-                                'formal_charge', coltype='int', default=0
-                            )
-                            atom_ids = self.atoms.append(
-                                configuration=configuration,
-                                x=xs,
-                                y=ys,
-                                z=zs,
-                                symbol=symbols,
-                                formal_charge=formal_charges
-                            )
-                        else:
-                            atom_ids = self.atoms.append(
-                                configuration=configuration,
-                                x=xs,
-                                y=ys,
-                                z=zs,
-                                symbol=symbols
-                            )
-                        break
-                    i, symbol, x, y, z, q = line.split()[2:8]
-                    xs.append(float(x))
-                    ys.append(float(y))
-                    zs.append(float(z))
-                    symbols.append(symbol)
-                    if 'CHG=' in line:
-                        for tmp in line.split()[8:]:
-                            if 'CHG=' in tmp:
-                                formal_charges.append(int(tmp[4:]))
-                                have_formal_charges = True
-                    else:
-                        formal_charges.append(0)
-            elif 'M  V30 BEGIN BOND' in line:
-                logger.debug('In bond table')
-                iatoms = []
-                jatoms = []
-                bondorders = []
-                for lineno, line in lines:
-                    if 'M  V30 END BOND' in line:
-                        if len(iatoms) > 0:
-                            self.bonds.append(
-                                i=iatoms,
-                                j=jatoms,
-                                bondorder=bondorders,
-                                configuration=configuration
-                            )
-                        break
-                    bondorder, iatom, jatom = line.split()[3:6]
-                    iatoms.append(atom_ids[int(iatom) - 1])
-                    jatoms.append(atom_ids[int(jatom) - 1])
-                    bondorders.append(int(bondorder))
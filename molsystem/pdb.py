@@ -124,12 +124,189 @@ Description of CONECT records::
     27 - 31        Integer        serial       Serial number of bonded atom
 """  # noqa: E501
 
-import collections
+import io
+import itertools
 import logging
 import time
 
+import numpy
+
 logger = logging.getLogger(__name__)
 
+# The records that are read but not used. 'MDLTYPE' is also accepted, as it
+# has been in the past, though the record is 'MDLTYP'.
+_ignored_records = frozenset(
+    (
+        'HEADER', 'OBSLTE', 'TITLE', 'SPLIT', 'CAVEAT', 'COMPND', 'SOURCE',
+        'KEYWDS', 'EXPDTA', 'NUMMDL', 'MDLTYP', 'MDLTYPE', 'AUTHOR', 'REVDAT',
+        'SPRSDE', 'JRNL', 'REMARK', 'DBREF', 'DBREF1', 'DBREF2', 'SEQADV',
+        'SEQRES', 'MODRES', 'HET', 'HETNAM', 'HETSYN', 'FORMUL', 'HELIX',
+        'SHEET', 'SSBOND', 'LINK', 'CISPEP', 'SITE', 'CRYST1', 'ORIGX1',
+        'ORIGX2', 'ORIGX3', 'SCALE1', 'SCALE2', 'SCALE3', 'MTRIX1', 'MTRIX2',
+        'MTRIX3', 'MODEL', 'ANISOU', 'TER', 'ENDMDL', 'MASTER'
+    )
+)
+
+# The optional columns of the atoms, with their type and default. The
+# columns are only created if the values in the file are not all the default
+_optional_columns = (
+    ('resname', 'string', 'UNK'),
+    ('chainid', 'string', 'A'),
+    ('resseq', 'int', 1),
+    ('occupancy', 'float', 1.0),
+    ('tempfactor', 'float', 0.0),
+)
+
+# The number of atoms to format and write at a time
+chunk_atoms = 65536
+
+
+def _format(values, spec):
+    """Format values, formatting each distinct value only once.
+
+    Parameters
+    ----------
+    values : [Any]
+        The values, which should all be the same type.
+    spec : str
+        The format specification, e.g. '4d'.
+
+    Returns
+    -------
+    ndarray
+        The formatted values as strings.
+    """
+    unique, inverse = numpy.unique(numpy.asarray(values), return_inverse=True)
+    text = [format(value, spec) for value in unique.tolist()]
+    return numpy.array(text, dtype=str)[inverse.ravel()]
+
+
+def _fixed_width(records, start, stop):
+    """A column of fixed-width records, as an array of bytes.
+
+    Parameters
+    ----------
+    records : ndarray
+        The (n, width) array of single bytes of the records.
+    start, stop : int
+        The first character of the column and the one after its end,
+        counting from zero.
+
+    Returns
+    -------
+    ndarray
+        The n values, as bytes with trailing blanks and nulls removed.
+    """
+    field = numpy.ascontiguousarray(records[:, start:stop])
+    return numpy.char.rstrip(field.view(f'S{stop - start}').ravel())
+
+
+def _number(records, start, stop, dtype, default):
+    """A column of numbers from fixed-width records, with blanks the default.
+    """
+    field = _fixed_width(records, start, stop)
+    field[numpy.char.strip(field) == b''] = str(default).encode()
+    return field.astype(dtype)
+
+
+def _pdb_records(lines):
+    """The ATOM and HETATM records as an (n, 80) array of single bytes."""
+    return numpy.array(lines, dtype='S80').view('S1').reshape(-1, 80)
+
+
+def _pdb_atoms(lines):
+    """Parse ATOM and HETATM records into columns.
+
+    The records are placed in a fixed-width array of bytes, so that each
+    field is a slice of the array, and the fields are converted in bulk.
+
+    Parameters
+    ----------
+    lines : [str]
+        The ATOM and HETATM records.
+
+    Returns
+    -------
+    {str: ndarray}
+        The columns: name, symbol, x, y, z, resname, chainid, resseq,
+        occupancy and tempfactor.
+    """
+    records = _pdb_records(lines)
+
+    def text(start, stop):
+        return numpy.char.strip(_fixed_width(records, start, stop)).astype(str)
+
+    return {
+        'name': text(12, 16),
+        # Symbol maybe fully capitalized e.g. 'FE', so need to fix
+        'symbol': numpy.char.capitalize(text(75, 78)),
+        'x': _number(records, 30, 38, float, 0.0),
+        'y': _number(records, 38, 46, float, 0.0),
+        'z': _number(records, 46, 54, float, 0.0),
+        'resname': text(17, 20),
+        'chainid': text(21, 22),
+        'resseq': _number(records, 22, 26, numpy.int64, 0),
+        'occupancy': _number(records, 54, 60, float, 1.0),
+        'tempfactor': _number(records, 60, 66, float, 0.0),
+    }
+
+
+def _pdb_coordinates(lines):
+    """Parse just the coordinates from ATOM and HETATM records.
+
+    Parameters
+    ----------
+    lines : [str]
+        The ATOM and HETATM records.
+
+    Returns
+    -------
+    x, y, z : ndarray, ndarray, ndarray
+        The coordinates.
+    """
+    records = _pdb_records(lines)
+    return (
+        _number(records, 30, 38, float, 0.0),
+        _number(records, 38, 46, float, 0.0),
+        _number(records, 46, 54, float, 0.0),
+    )
+
+
+def _pdb_bonds(lines, n_atoms):
+    """Find the bonds from CONECT records.
+
+    Parameters
+    ----------
+    lines : [str]
+        The CONECT records.
+    n_atoms : int
+        The number of atoms.
+
+    Returns
+    -------
+    i, j : ndarray, ndarray
+        The serial numbers of the atoms in each bond.
+    """
+    records = numpy.array(lines, dtype='S31').view('S1').reshape(-1, 31)
+    atom = _number(records, 6, 11, numpy.int64, 0)
+    i = []
+    j = []
+    for start in range(11, 31, 5):
+        partner = _number(records, start, start + 5, numpy.int64, 0)
+        i.append(atom[partner > 0])
+        j.append(partner[partner > 0])
+    i = numpy.concatenate(i)
+    j = numpy.concatenate(j)
+
+    # Each bond should be given for both atoms, so only keep one of the
+    # pair, unless the partner is missing.
+    m = n_atoms + 1
+    found = numpy.isin(j * m + i, i * m + j)
+    for ii, jj in zip(i[~found].tolist(), j[~found].tolist()):
+        logger.warning(f'Bond {ii}-{jj} not found in PDB file')
+    keep = (i < j) | ~found
+    return i[keep], j[keep]
+
 
 class PDBMixin:
     """A mixin for handling PDB files."""
@@ -141,8 +318,9 @@ class PDBMixin:
 
         Parameters
         ----------
-        configuration : int = None
+        configuration : int or [int] = None
             The configuration to use, defaults to the current configuration.
+            If several are given, each is written as a MODEL.
         title : str = None
             The title for the structure, by default the system name.
         comment : str = 'Exported from SEAMM'
@@ -153,342 +331,447 @@ class PDBMixin:
         text : str
             The text of the file.
         """
-        lines = []
-
-        atoms = self.atoms
+        fd = io.StringIO()
+        self.write_pdb(
+            fd, configurations=configuration, title=title, comment=comment
+        )
+        return fd.getvalue()[:-1]
+
+    def write_pdb(
+        self,
+        fd,
+        configurations=None,
+        title=None,
+        comment='Exported from SEAMM'
+    ):
+        """Write a PDB file to an open file.
 
-        if configuration is None:
-            configuration = self.current_configuration
+        The ATOM records are formatted in chunks of atoms. The text that is
+        the same in every model, i.e. all but the coordinates, is formatted
+        once, column by column, into a template for the chunk, and the
+        coordinates are then filled in with a single formatting operation.
 
-        n_atoms = atoms.n_atoms(configuration=configuration)
+        Parameters
+        ----------
+        fd : file
+            The open file, or any object with a write method.
+        configurations : int or [int] = None
+            The configurations to write, defaults to the current one. If
+            there are several, each is written as a MODEL.
+        title : str = None
+            The title for the structure, by default the system name.
+        comment : str = 'Exported from SEAMM'
+            Comment line
+        """
+        if configurations is None:
+            configurations = [self.current_configuration]
+        elif isinstance(configurations, int):
+            configurations = [configurations]
+        models = len(configurations) > 1
 
         date_time = time.strftime('%m%d%y%H%M')
 
-        lines.append('COMPND    UNNAMED')
-        lines.append('AUTHOR    MolSSI SEAMM at ' + date_time)
-
-        # atoms
-
-        if 'resname' in atoms:
-            resnames = atoms['resname']
-        else:
-            resnames = ['UNK'] * n_atoms
-
-        if 'chainid' in atoms:
-            chainids = atoms['chainid']
-        else:
-            chainids = ['A'] * n_atoms
+        fd.write('COMPND    UNNAMED\n')
+        fd.write('AUTHOR    MolSSI SEAMM at ' + date_time + '\n')
+
+        subset = None
+        for model, configuration in enumerate(configurations, start=1):
+            if self.all_subset(configuration) != subset:
+                subset = self.all_subset(configuration)
+                templates = self._pdb_templates(configuration)
+            xyz = self._pdb_coordinates(configuration)
+            if models:
+                fd.write(f'MODEL     {model:4d}\n')
+            for start, template in templates:
+                values = xyz[start:start + chunk_atoms].ravel().tolist()
+                fd.write(template % tuple(values))
+            if models:
+                fd.write('ENDMDL\n')
 
-        if 'resseq' in atoms:
-            resseqs = atoms['resseq']
+        # bonds
+        configuration = configurations[0]
+        n_atoms = self.atoms.n_atoms(configuration=configuration)
+        if n_atoms < 100000:
+            i, j, _ = self._bonded_indices(configuration)
+            self._write_conect(fd, n_atoms, i, j)
         else:
-            resseqs = [1] * n_atoms
+            logger.warning(
+                'No CONECT records are written for more than 99,999 atoms.'
+            )
 
-        if 'occupancy' in atoms:
-            occupancies = atoms['occupancy']
-        else:
-            occupancies = [1.0] * n_atoms
+        fd.write(
+            'MASTER        0    0    0    0    0    0    0    0'
+            f'{n_atoms:5d}    0{n_atoms:5d}\n'
+        )
+        fd.write('END\n')
 
-        if 'tempfactor' in atoms:
-            tempfactors = atoms['tempfactor']
-        else:
-            tempfactors = [0.0] * n_atoms
+    def _pdb_templates(self, configuration):
+        """The templates for the ATOM records of a configuration.
 
-        if 'formal_charge' in atoms:
-            charges = atoms['formal_charge']
-        else:
-            charges = [' '] * n_atoms
+        Parameters
+        ----------
+        configuration : int
+            The configuration.
 
-        count = 0
-        symbols = atoms.symbols(configuration=configuration)
-        coordinates = atoms.coordinates(configuration=configuration)
-        if 'name' in atoms:
-            names = atoms['name']
+        Returns
+        -------
+        [(int, str)]
+            The first atom in each chunk and the template for its records,
+            which needs the x, y, z coordinates of each atom.
+        """
+        atoms = self.atoms
+        atom_table = atoms._atom_table.attributes
+        coordinates_table = atoms._coordinates_table.attributes
+        keys = ['atno']
+        selected = ['at.atno']
+        for key in (
+            'name', 'resname', 'chainid', 'resseq', 'occupancy', 'tempfactor',
+            'formal_charge'
+        ):
+            if key in atom_table:
+                keys.append(key)
+                selected.append(f'at."{key}"')
+            elif key in coordinates_table:
+                keys.append(key)
+                selected.append(f'co."{key}"')
+        data = self._pdb_query(', '.join(selected), configuration)
+        n_atoms = len(data)
+        columns = dict(zip(keys, zip(*data)))
+
+        def column(key, default):
+            if key not in columns:
+                return [default] * n_atoms
+            return [default if x is None else x for x in columns[key]]
+
+        symbols = self.to_symbols(numpy.array(column('atno', 0), dtype=int))
+        if 'name' in columns:
+            names = numpy.array(column('name', ''), dtype=str).reshape(-1)
         else:
             names = symbols
 
-        for (
-            element, xyz, name, resname, chainid, resseq, occupancy,
-            tempfactor, charge
-        ) in zip(
-            symbols, coordinates, names, resnames, chainids, resseqs,
-            occupancies, tempfactors, charges
+        # Single-character elements start in the second column of the name
+        one_letter = numpy.char.str_len(symbols) == 1
+        shift = one_letter & (numpy.char.str_len(names) < 4)
+        names = numpy.where(shift, numpy.char.add(' ', names), names)
+
+        # The serial numbers wrap around after 99,999
+        serial = numpy.arange(1, n_atoms + 1) % 100000
+        prefix = numpy.char.add('ATOM  ', _format(serial, '5d'))
+        for text in (
+            ' ',
+            numpy.char.ljust(names, 4),
+            ' ',
+            _format(column('resname', 'UNK'), '3s'),
+            ' ',
+            _format(column('chainid', 'A'), '1s'),
+            _format(column('resseq', 1), '4d'),
+            '    ',
         ):
-            count += 1
-            x, y, z = xyz
-            if len(element) == 1 and len(name) < 4:
-                name = ' ' + name
-            lines.append(
-                f'ATOM  {count:5d} {name:4s} {resname:3s} {chainid:1s}'
-                f'{resseq:4d}    {x:8.3f}{y:8.3f}{z:8.3f}{occupancy:6.2f}'
-                f'{tempfactor:6.2f}          {element.upper():>2s}'
-                f'{charge:2}'
-            )
-
-        # bonds
-        for i, js in enumerate(
-            self.bonded_neighbors(
-                configuration=configuration, as_indices=True
-            )
+            prefix = numpy.char.add(prefix, text)
+        suffix = _format(column('occupancy', 1.0), '6.2f')
+        for text in (
+            _format(column('tempfactor', 0.0), '6.2f'),
+            '          ',
+            numpy.char.rjust(numpy.char.upper(symbols), 2),
+            _format(column('formal_charge', ' '), '2'),
+            '\n',
         ):
-            lines.append(
-                f'CONECT{i+1:5d}' + ''.join([f'{j+1:5d}' for j in js])
-            )
+            suffix = numpy.char.add(suffix, text)
 
-        lines.append(
-            'MASTER        0    0    0    0    0    0    0    0'
-            f'{n_atoms:5d}    0{n_atoms:5d}'
+        records = numpy.char.add(
+            numpy.char.add(numpy.char.replace(prefix, '%', '%%'), '%8.3f' * 3),
+            numpy.char.replace(suffix, '%', '%%')
+        )
+        return [
+            (start, ''.join(records[start:start + chunk_atoms].tolist()))
+            for start in range(0, n_atoms, chunk_atoms)
+        ]
+
+    def _pdb_query(self, columns, configuration, subset=None):
+        """The values of columns of the atoms and coordinates, in order.
+
+        Parameters
+        ----------
+        columns : str
+            The columns, e.g. 'co.x, co.y, co.z', from the atom table 'at' and
+            coordinates table 'co'.
+        configuration : int
+            The configuration.
+        subset : int = None
+            The subset, defaults to the 'all/all' subset of the configuration.
+
+        Returns
+        -------
+        [tuple]
+            The values for each atom, in the order of the subset.
+        """
+        if subset is None:
+            subset = self.all_subset(configuration)
+        atoms = self.atoms
+        cursor = self.db.cursor()
+        cursor.row_factory = None
+        cursor.execute(
+            f'SELECT {columns}'
+            '  FROM subset_atom as sa,'
+            f'      "{atoms._atom_tablename}" as at,'
+            f'      "{atoms._coordinates_tablename}" as co'
+            ' WHERE sa.subset = ? AND at.id = sa.atom'
+            '   AND co.atom = at.id AND co.configuration = ?'
+            ' ORDER BY sa.rowid', (subset, configuration)
+        )
+        return cursor.fetchall()
+
+    def _pdb_coordinates(self, configuration, subset=None):
+        """The Cartesian coordinates of a configuration as an (n, 3) array.
+        """
+        rows = self._pdb_query('co.x, co.y, co.z', configuration, subset)
+        xyz = numpy.array(rows, dtype=float).reshape(-1, 3)
+        if self.periodicity != 0 and self.coordinate_system == 'fractional':
+            cell = self['cell'].cell(configuration)
+            xyz = cell.to_cartesians(xyz, as_array=True)
+        return xyz
+
+    def _bonded_indices(self, configuration, subset=None):
+        """The bonds of a configuration as 0-based atom indices.
+
+        Parameters
+        ----------
+        configuration : int
+            The configuration.
+        subset : int = None
+            The subset, defaults to the 'all/all' subset of the configuration.
+
+        Returns
+        -------
+        i, j, bondorders : ndarray, ndarray, ndarray
+            The indices of the atoms in each bond, in the order of the
+            subset, and its order.
+        """
+        if subset is None:
+            subset = self.all_subset(configuration)
+        ids = numpy.fromiter(
+            itertools.chain.from_iterable(
+                self.db.execute(
+                    'SELECT atom FROM subset_atom WHERE subset = ?'
+                    ' ORDER BY rowid', (subset,)
+                )
+            ),
+            dtype=numpy.int64
         )
-        lines.append('END')
+        bonds = numpy.fromiter(
+            itertools.chain.from_iterable(
+                self.db.execute(
+                    'SELECT iatom.atom, jatom.atom, templatebond.bondorder'
+                    '  FROM subset_atom as iatom'
+                    ' CROSS JOIN templatebond CROSS JOIN subset_atom as jatom'
+                    ' WHERE templatebond.i = iatom.templateatom'
+                    '   AND templatebond.j = jatom.templateatom'
+                    '   AND iatom.subset = ? AND jatom.subset = ?',
+                    (subset, subset)
+                )
+            ),
+            dtype=numpy.int64
+        ).reshape(-1, 3)
+        sorter = numpy.argsort(ids)
+        i = sorter[numpy.searchsorted(ids, bonds[:, 0], sorter=sorter)]
+        j = sorter[numpy.searchsorted(ids, bonds[:, 1], sorter=sorter)]
+        return i, j, bonds[:, 2]
 
-        return '\n'.join(lines)
+    @staticmethod
+    def _write_conect(fd, n_atoms, i, j):
+        """Write the CONECT records, one per atom, from the bonds.
+
+        The bonds are put in compressed sparse row (CSR) form, each atom
+        followed by its sorted neighbors, and formatted in chunks.
+
+        Parameters
+        ----------
+        fd : file
+            The open file.
+        n_atoms : int
+            The number of atoms.
+        i, j : ndarray
+            The 0-based indices of the atoms in each bond.
+        """
+        if n_atoms == 0:
+            return
+        first = numpy.concatenate((i, j))
+        second = numpy.concatenate((j, i))
+        order = numpy.lexsort((second, first))
+        neighbors = second[order]
+        counts = numpy.bincount(first, minlength=n_atoms)
+        pointers = numpy.zeros(n_atoms + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=pointers[1:])
+
+        # Each row is the atom followed by its neighbors, counting from 1
+        values = numpy.empty(n_atoms + neighbors.size, dtype=numpy.int64)
+        rows = pointers[:-1] + numpy.arange(n_atoms)
+        values[rows] = numpy.arange(1, n_atoms + 1)
+        mask = numpy.ones(values.size, dtype=bool)
+        mask[rows] = False
+        values[mask] = neighbors + 1
+
+        records = numpy.char.add(
+            numpy.char.add('CONECT%5d', numpy.char.multiply('%5d', counts)),
+            '\n'
+        )
+        ends = numpy.append(rows, values.size)
+        for start in range(0, n_atoms, chunk_atoms):
+            stop = min(start + chunk_atoms, n_atoms)
+            template = ''.join(records[start:stop].tolist())
+            fd.write(template % tuple(values[ends[start]:ends[stop]].tolist()))
 
     def from_pdb_text(self, data, configuration=None):
         """Create the system from a PDF file.
 
+        Each MODEL in the file is a configuration. The first model goes into
+        the configuration given, and each further model into a new
+        configuration. If a model has the same number of atoms as the one
+        before, the configuration shares the atoms and bonds, and only the
+        coordinates are stored. The lines are handled one model at a time,
+        so an open file can be read without holding it all in memory.
+
         Parameters
         ----------
-        data : str
-            The complete text of the Molfile.
+        data : str, [str] or file
+            The complete text of the PDB file, its lines, or an open file.
         configuration : int = None
             The configuration to use, defaults to the current configuration.
+
+        Returns
+        -------
+        [int]
+            The configurations for the models.
         """
         # Initialize the structure
 
         # self.clear()
         self.periodicity = 0
 
-        if isinstance(data, list):
-            lines = data
-        else:
+        if isinstance(data, str):
             lines = data.splitlines()
+        else:
+            lines = data
 
-        names = []
-        symbols = []
-        xs = []
-        ys = []
-        zs = []
-        resnames = []
-        chainids = []
-        resseqs = []
-        occupancies = []
-        tempfactors = []
-        connections = None
+        if configuration is None:
+            configuration = self.current_configuration
+
+        configurations = []
+        atom_id = None
+        atom_lines = []
+        conect_lines = []
         for line in lines:
             key = line[0:6].rstrip()
-            if key == 'HEADER':
-                pass
-            elif key == 'OBSLTE':
-                pass
-            elif key == 'TITLE':
-                pass
-            elif key == 'SPLIT':
-                pass
-            elif key == 'CAVEAT':
-                pass
-            elif key == 'COMPND':
-                pass
-            elif key == 'SOURCE':
-                pass
-            elif key == 'KEYWDS':
-                pass
-            elif key == 'EXPDTA':
-                pass
-            elif key == 'NUMMDL':
-                pass
-            elif key == 'MDLTYPE':
-                pass
-            elif key == 'AUTHOR':
-                pass
-            elif key == 'REVDAT':
-                pass
-            elif key == 'SPRSDE':
-                pass
-            elif key == 'JRNL':
-                pass
-            elif key == 'REMARK':
-                pass
-            elif key == 'DBREF':
-                pass
-            elif key == 'DBREF1':
-                pass
-            elif key == 'DBREF2':
-                pass
-            elif key == 'SEQADV':
-                pass
-            elif key == 'SEQRES':
-                pass
-            elif key == 'MODRES':
-                pass
-            elif key == 'HET':
-                pass
-            elif key == 'HETNAM':
-                pass
-            elif key == 'HETSYN':
-                pass
-            elif key == 'FORMUL':
-                pass
-            elif key == 'HELIX':
-                pass
-            elif key == 'SHEET':
-                pass
-            elif key == 'SSBOND':
-                pass
-            elif key == 'LINK':
-                pass
-            elif key == 'CISPEP':
-                pass
-            elif key == 'SITE':
-                pass
-            elif key == 'CRYST1':
-                pass
-            elif key == 'ORIGX1':
-                pass
-            elif key == 'ORIGX2':
-                pass
-            elif key == 'ORIGX3':
-                pass
-            elif key == 'SCALE1':
-                pass
-            elif key == 'SCALE2':
-                pass
-            elif key == 'SCALE3':
-                pass
-            elif key == 'MTRIX1':
-                pass
-            elif key == 'MTRIX2':
-                pass
-            elif key == 'MTRIX3':
-                pass
-            elif key == 'MODEL':
-                pass
-            elif key == 'ATOM' or key == 'HETATM':
-                # serial = int(line[6:11])  # noqa: F841
-                name = line[12:16].strip()
-                # altloc = line[16]  # noqa: F841
-                resname = line[17:20].strip()
-                chainid = line[21]
-                resseq = int(line[22:26])
-                # icode = line[26]  # noqa: F841
-                x = float(line[30:38])
-                y = float(line[38:46])
-                z = float(line[46:54])
-                tmp = line[54:60].strip()
-                occupancy = 1.0 if tmp == '' else float(tmp)
-                tmp = line[60:66].strip()
-                tempfactor = 0.0 if tmp == '' else float(tmp)
-
-                # Symbol maybe fully capitalized e.g. 'FE', so need to fix
-                symbol = line[75:78].strip().capitalize()
-                # tmp = line[78:80].strip()
-                # charge = 0.0 if tmp == '' else float(tmp)  # noqa: F841
-
-                names.append(name)
-                symbols.append(symbol)
-                xs.append(x)
-                ys.append(y)
-                zs.append(z)
-                resnames.append(resname)
-                chainids.append(chainid)
-                resseqs.append(resseq)
-                occupancies.append(occupancy)
-                tempfactors.append(tempfactor)
-            elif key == 'ANISOU':
-                pass
-            elif key == 'TER':
-                pass
+            if key == 'ATOM' or key == 'HETATM':
+                atom_lines.append(line)
             elif key == 'ENDMDL':
-                pass
+                configuration, atom_id = self._add_pdb_model(
+                    atom_lines, configuration, atom_id, len(configurations)
+                )
+                if len(configurations) == 0:
+                    first_atom_id = atom_id
+                configurations.append(configuration)
+                atom_lines = []
             elif key == 'CONECT':
-                if connections is None:
-                    n_atoms = len(symbols)
-                    connections = []
-                    for i in range(n_atoms + 1):
-                        connections.append(list())
-
-                atom = int(line[6:11])
-                # should use columns in case they run together.
-                for i in range(11, 31, 5):
-                    tmp = line[i:i + 5].strip()
-                    if tmp == '':
-                        break
-                    connections[atom].append(int(tmp))
-            elif key == 'MASTER':
-                pass
+                conect_lines.append(line)
             elif key == 'END':
                 break
-            else:
+            elif key not in _ignored_records:
                 raise RuntimeError('Illegal line in PDB file\n\t' + line)
 
-        if 'name' not in self.atoms:
-            self.atoms.add_attribute('name', coltype='string')
+        if len(atom_lines) > 0 or len(configurations) == 0:
+            configuration, atom_id = self._add_pdb_model(
+                atom_lines, configuration, atom_id, len(configurations)
+            )
+            if len(configurations) == 0:
+                first_atom_id = atom_id
+            configurations.append(configuration)
+
+        # The CONECT records are for the atoms of the first model
+        if len(conect_lines) > 0:
+            i, j = _pdb_bonds(conect_lines, len(first_atom_id))
+            first_atom_id = numpy.array(first_atom_id)
+            self.bonds.append(
+                configuration=configurations[0],
+                i=first_atom_id[i - 1].tolist(),
+                j=first_atom_id[j - 1].tolist()
+            )
 
-        atom_id = self.atoms.append(
-            configuration=configuration,
-            symbol=symbols,
-            name=names,
-            x=xs,
-            y=ys,
-            z=zs
-        )
+        return configurations
 
-        if 'resname' in self.atoms:
-            self.atoms['resname'][0:] = resnames
-        else:
-            counts = collections.Counter(resnames)
-            if len(counts) > 1 or [*counts.keys()] != ['UNK']:
-                self.atoms.add_attribute('resname', coltype='string')
-                self.atoms['resname'][0:] = resnames
+    def from_pdb_file(self, path, configuration=None):
+        """Create the system from a PDB file, reading it a model at a time.
 
-        if 'chainid' in self.atoms:
-            self.atoms['chainid'][0:] = chainids
-        else:
-            counts = collections.Counter(chainids)
-            if len(counts) > 1 or [*counts.keys()] != ['A']:
-                self.atoms.add_attribute('chainid', coltype='string')
-                self.atoms['chainid'][0:] = chainids
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The PDB file.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
 
-        if 'resseq' in self.atoms:
-            self.atoms['resseq'][0:] = resseqs
-        else:
-            counts = collections.Counter(resseqs)
-            if len(counts) > 1 or [*counts.keys()] != ['1']:
-                self.atoms.add_attribute('resseq', coltype='int')
-                self.atoms['resseq'][0:] = resseqs
+        Returns
+        -------
+        [int]
+            The configurations for the models.
+        """
+        with open(path, 'r') as fd:
+            return self.from_pdb_text(fd, configuration=configuration)
 
-        if 'occupancy' in self.atoms:
-            self.atoms['occupancy'][0:] = occupancies
-        else:
-            counts = collections.Counter(occupancies)
-            if len(counts) > 1 or [*counts.keys()] != [1.0]:
-                self.atoms.add_attribute(
-                    'occupancy', coltype='float', default=1.0
-                )
-                self.atoms['occupancy'][0:] = occupancies
+    def _add_pdb_model(self, lines, configuration, atom_id, n_models):
+        """Add the atoms of one model in a PDB file.
 
-        if 'tempfactor' in self.atoms:
-            self.atoms['tempfactor'][0:] = tempfactors
-        else:
-            counts = collections.Counter(tempfactors)
-            if len(counts) > 1 or [*counts.keys()] != [0.0]:
-                self.atoms.add_attribute(
-                    'tempfactor', coltype='float', default=1.0
+        Parameters
+        ----------
+        lines : [str]
+            The ATOM and HETATM records of the model.
+        configuration : int
+            The configuration for the first model.
+        atom_id : [int]
+            The ids of the atoms of the previous model, or None for the first.
+        n_models : int
+            The number of models already added.
+
+        Returns
+        -------
+        configuration : int
+            The configuration for the model.
+        atom_id : [int]
+            The ids of the atoms.
+        """
+        atoms = self.atoms
+        if atom_id is not None:
+            same_atoms = len(lines) == len(atom_id)
+            # Different atoms have their own bonds, none from CONECT records
+            configuration = self.add_configuration(
+                name=f'model {n_models + 1}',
+                changed_atoms=not same_atoms,
+                changed_bonds=not same_atoms
+            )
+            if same_atoms:
+                x, y, z = _pdb_coordinates(lines)
+                self['coordinates'].append(
+                    configuration=configuration,
+                    atom=atom_id,
+                    x=x.tolist(),
+                    y=y.tolist(),
+                    z=z.tolist()
                 )
-                self.atoms['tempfactor'][0:] = tempfactors
-
-        iatom = []
-        jatom = []
-        if connections is not None:
-            for i in range(1, n_atoms + 1):
-                for j in connections[i]:
-                    if i not in connections[j]:
-                        logger.warning(f'Bond {j}-{i} not found in PDB file')
-                        # put in the bond since we won't see its partner!
-                        iatom.append(atom_id[i - 1])
-                        jatom.append(atom_id[j - 1])
-                    elif i < j:
-                        # put in only 1 of 2 equivalent bonds
-                        iatom.append(atom_id[i - 1])
-                        jatom.append(atom_id[j - 1])
-
-            self.bonds.append(configuration=configuration, i=iatom, j=jatom)
+                return configuration, atom_id
+
+        columns = _pdb_atoms(lines)
+
+        if 'name' not in atoms:
+            atoms.add_attribute('name', coltype='string')
+        for key, coltype, default in _optional_columns:
+            if key not in atoms and numpy.any(columns[key] != default):
+                if coltype == 'float':
+                    # The default for tempfactor has always been 1.0
+                    atoms.add_attribute(key, coltype=coltype, default=1.0)
+                else:
+                    atoms.add_attribute(key, coltype=coltype)
+            if key not in atoms:
+                del columns[key]
+
+        data = {key: values.tolist() for key, values in columns.items()}
+        atom_id = atoms.append(configuration=configuration, **data)
+        return configuration, atom_id
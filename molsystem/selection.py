@@ -0,0 +1,727 @@
+# -*- coding: utf-8 -*-
+
+"""A small language for selecting atoms
+
+Selections are written much like in VMD or MDAnalysis, e.g.::
+
+    resname LIG
+    element C N O and not hydrogen
+    name CA C N and resseq 10 to 20
+    x < 5.0 or (subset 3 4)
+    within 5.0 of resname LIG and not hydrogen
+
+The grammar, from lowest to highest precedence, is
+
+    expression : term ("or" term)*
+    term       : factor ("and" factor)*
+    factor     : "not" factor
+               | "within" <distance> "of" factor
+               | "(" expression ")"
+               | "all" | "none" | "hydrogen"
+               | "element" <symbol>+ | "symbol" <symbol>+
+               | "subset" <id>+
+               | <attribute> <op> <value>
+               | <attribute> <value or range>+
+
+where <attribute> is any attribute of the atoms, e.g. 'id', 'atno', 'name',
+'resname' or 'x'; <op> is one of <, <=, >, >=, ==, = or !=; a range is
+written "<low> to <high>"; and values containing the wildcards *, ? or [...]
+are matched with glob-style patterns. Values may be quoted with ' or ". Note
+that "within" applies to the factor following it, so the last example above
+is "(within 5.0 of resname LIG) and (not hydrogen)".
+
+Everything except "within" is compiled to a single parameterized SQL
+expression, so most selections are one query. "within" is evaluated with a
+vectorized cell-list neighbor search over the coordinates, using the minimum
+image convention for periodic systems.
+"""
+
+import functools
+import itertools
+import json
+import logging
+import re
+
+import numpy
+
+logger = logging.getLogger(__name__)
+
+_token_re = re.compile(
+    r"""\s*(?:
+        (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?![^\s()<>=!])
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<op><=|>=|==|!=|<|>|=)
+      | (?P<paren>[()])
+      | (?P<word>[^\s()<>=!"']+)
+    )""", re.VERBOSE
+)
+
+# The words ending a list of values
+_terminators = {'and', 'or', ')'}
+
+# Lists longer than this are passed as a single JSON parameter.
+_max_parameters = 100
+
+# The most cells to use in the neighbor search
+_max_cells = 1 << 22
+
+
+def _tokenize(text):
+    """Split the text of a selection into (kind, value) tokens."""
+    tokens = []
+    text = text.rstrip()
+    pos = 0
+    while pos < len(text):
+        match = _token_re.match(text, pos)
+        if match is None:
+            raise ValueError(
+                f"Cannot understand '{text[pos:].strip()}' in the selection "
+                f"'{text}'"
+            )
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            try:
+                value = int(value)
+            except ValueError:
+                value = float(value)
+        elif kind == 'string':
+            value = value[1:-1]
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser(object):
+    """A recursive-descent parser turning a selection into a tree of tuples.
+
+    The nodes of the tree are
+
+        ('all',)
+        ('none',)
+        ('not', node)
+        ('and', node, node)
+        ('or', node, node)
+        ('within', distance, node)
+        ('element', (symbol, ...))
+        ('subset', (id, ...))
+        ('compare', attribute, op, value)
+        ('values', attribute, (value, ...), ((low, high), ...), (glob, ...))
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def parse(self):
+        """Parse the selection, returning the tree."""
+        if len(self.tokens) == 0:
+            raise ValueError('The selection is empty.')
+        result = self.expression()
+        if self.pos < len(self.tokens):
+            self.error(f"unexpected '{self.tokens[self.pos][1]}'")
+        return result
+
+    def error(self, message):
+        """Raise an error for a problem parsing the selection."""
+        raise ValueError(f"Error in the selection '{self.text}': {message}")
+
+    def peek(self):
+        """The next token, as a lowercase keyword if it is a word."""
+        if self.pos >= len(self.tokens):
+            return None
+        kind, value = self.tokens[self.pos]
+        if kind in ('word', 'paren'):
+            return value.lower()
+        return None
+
+    def next(self, kind=None):
+        """Consume and return the value of the next token."""
+        if self.pos >= len(self.tokens):
+            self.error('unexpected end of the selection')
+        token_kind, value = self.tokens[self.pos]
+        if kind is not None and token_kind not in kind:
+            self.error(f"unexpected '{value}'")
+        self.pos += 1
+        return value
+
+    def expect(self, keyword):
+        """Consume the given keyword."""
+        if self.peek() != keyword:
+            self.error(f"expected '{keyword}'")
+        self.pos += 1
+
+    def expression(self):
+        result = self.term()
+        while self.peek() == 'or':
+            self.pos += 1
+            result = ('or', result, self.term())
+        return result
+
+    def term(self):
+        result = self.factor()
+        while self.peek() == 'and':
+            self.pos += 1
+            result = ('and', result, self.factor())
+        return result
+
+    def factor(self):
+        keyword = self.peek()
+        if keyword is None:
+            self.error(f"unexpected '{self.next()}'")
+        if keyword == 'not':
+            self.pos += 1
+            return ('not', self.factor())
+        if keyword == 'within':
+            self.pos += 1
+            distance = self.next(kind=('number',))
+            if distance < 0:
+                self.error('the distance for within cannot be negative')
+            self.expect('of')
+            return ('within', float(distance), self.factor())
+        if keyword == '(':
+            self.pos += 1
+            result = self.expression()
+            self.expect(')')
+            return result
+        if keyword in ('all', 'none'):
+            self.pos += 1
+            return (keyword,)
+        if keyword == 'hydrogen':
+            self.pos += 1
+            return ('values', 'atno', (1,), (), ())
+        if keyword in ('element', 'symbol'):
+            self.pos += 1
+            values = self.values()
+            return ('element', tuple(str(value) for value in values))
+        if keyword == 'subset':
+            self.pos += 1
+            values = self.values()
+            if not all(isinstance(value, int) for value in values):
+                self.error('subsets are given by their integer ids')
+            return ('subset', tuple(values))
+        if keyword == ')':
+            self.error("unexpected ')'")
+
+        attribute = self.next(kind=('word',))
+        if self.pos < len(self.tokens) and self.tokens[self.pos][0] == 'op':
+            op = self.next()
+            value = self.next(kind=('number', 'string', 'word'))
+            return ('compare', attribute, '=' if op == '==' else op, value)
+
+        values = []
+        ranges = []
+        globs = []
+        tokens = self.values(raw=True)
+        i = 0
+        while i < len(tokens):
+            kind, value = tokens[i]
+            if (
+                i + 2 < len(tokens) and tokens[i + 1][0] == 'word' and
+                tokens[i + 1][1].lower() == 'to'
+            ):
+                ranges.append((value, tokens[i + 2][1]))
+                i += 3
+                continue
+            if kind == 'word' and any(c in value for c in '*?['):
+                globs.append(value)
+            else:
+                values.append(value)
+            i += 1
+        return (
+            'values', attribute, tuple(values), tuple(ranges), tuple(globs)
+        )
+
+    def values(self, raw=False):
+        """The list of values up to the next 'and', 'or' or ')'."""
+        start = self.pos
+        while self.pos < len(self.tokens):
+            kind, value = self.tokens[self.pos]
+            if kind == 'op' or (kind == 'paren' and value == '('):
+                self.error(f"unexpected '{value}'")
+            if kind in ('word', 'paren') and value.lower() in _terminators:
+                break
+            self.pos += 1
+        if self.pos == start:
+            self.error('expected one or more values')
+        tokens = self.tokens[start:self.pos]
+        if raw:
+            return tokens
+        return [value for kind, value in tokens]
+
+
+@functools.lru_cache(maxsize=128)
+def _parse(text):
+    """Parse the text of a selection, caching the result."""
+    return _Parser(text).parse()
+
+
+def _fetch(db, sql, parameters, dtype, n_columns=1):
+    """Run a query and return the results as an array."""
+    data = numpy.fromiter(
+        itertools.chain.from_iterable(db.execute(sql, parameters)),
+        dtype=dtype
+    )
+    if n_columns == 1:
+        return data
+    return data.reshape(-1, n_columns)
+
+
+def _within(points, sources, cutoff, candidates, transform=None):
+    """Which candidate points are within a distance of any of the sources.
+
+    This is a cell-list search: the sources are binned into cells at least
+    the cutoff wide and each candidate is only compared with the sources in
+    its own and neighboring cells.
+
+    Parameters
+    ----------
+    points : numpy.ndarray(n, 3)
+        The coordinates, Cartesian unless the transform is given.
+    sources : numpy.ndarray(bool)
+        Mask of the points to measure the distance from.
+    cutoff : float
+        The distance.
+    candidates : numpy.ndarray(bool)
+        Mask of the points to test.
+    transform : numpy.ndarray(3, 3) = None
+        For periodic systems, the transform from fractional to Cartesian
+        coordinates, in which case the points are fractional coordinates.
+
+    Returns
+    -------
+    numpy.ndarray(bool)
+        True for the candidates within the cutoff of a source point.
+    """
+    result = sources & candidates
+    to_test = numpy.nonzero(candidates & ~sources)[0]
+    source_ids = numpy.nonzero(sources)[0]
+    if source_ids.size == 0 or to_test.size == 0 or cutoff == 0.0:
+        return result
+
+    # Limit the number of cells, making them larger if necessary, so that
+    # the table of cells stays a reasonable size.
+    max_cells = min(_max_cells, max(4096, 8 * source_ids.size))
+
+    periodic = transform is not None
+    if periodic:
+        # The perpendicular widths of the cell are the inverse lengths of
+        # the reciprocal vectors.
+        widths = 1 / numpy.linalg.norm(numpy.linalg.inv(transform), axis=0)
+        n_cells = numpy.maximum(1, numpy.floor(widths / cutoff)).astype(int)
+        if numpy.prod(n_cells) > max_cells:
+            factor = (numpy.prod(n_cells) / max_cells)**(1 / 3)
+            n_cells = numpy.maximum(1, n_cells // factor).astype(int)
+        points = points - numpy.floor(points)
+        cells = numpy.minimum(
+            numpy.floor(points * n_cells).astype(numpy.int64), n_cells - 1
+        )
+        # Any image within the cutoff is at most this many cells away
+        # once the fractional differences are in [-1/2, 1/2].
+        n_images = numpy.floor(0.5 + cutoff / widths).astype(int)
+        images = numpy.array(
+            [*itertools.product(*[range(-n, n + 1) for n in n_images])],
+            dtype=float
+        )
+        offsets = [
+            sorted({o % n for o in (-1, 0, 1)}, key=abs) for n in n_cells
+        ]
+    else:
+        origin = points[source_ids].min(axis=0)
+        extent = points[source_ids].max(axis=0) - origin
+        size = cutoff
+        n_cells = numpy.floor(extent / size).astype(int) + 1
+        if numpy.prod(n_cells) > max_cells:
+            size *= 1.01 * (numpy.prod(n_cells) / max_cells)**(1 / 3)
+            n_cells = numpy.floor(extent / size).astype(int) + 1
+        cells = numpy.floor((points - origin) / size).astype(numpy.int64)
+        offsets = [(0, -1, 1)] * 3
+
+    # Sort the sources by cell, with pointers to the start of each cell
+    source_keys = numpy.ravel_multi_index(cells[source_ids].T, n_cells)
+    order = numpy.argsort(source_keys, kind='stable')
+    source_points = points[source_ids[order]]
+    n_total = int(numpy.prod(n_cells))
+    pointers = numpy.zeros(n_total + 1, dtype=numpy.int64)
+    numpy.cumsum(
+        numpy.bincount(source_keys, minlength=n_total), out=pointers[1:]
+    )
+
+    cutoff2 = cutoff * cutoff
+    chunk = 1 << 16
+    for begin in range(0, to_test.size, chunk):
+        remaining = to_test[begin:begin + chunk]
+        for offset in itertools.product(*offsets):
+            if remaining.size == 0:
+                break
+            neighbors = cells[remaining] + numpy.array(offset)
+            if periodic:
+                neighbors %= n_cells
+            else:
+                valid = numpy.all(
+                    (neighbors >= 0) & (neighbors < n_cells), axis=1
+                )
+                neighbors[~valid] = 0
+            keys = numpy.ravel_multi_index(neighbors.T, n_cells)
+            starts = pointers[keys]
+            counts = pointers[keys + 1] - starts
+            if not periodic:
+                counts[~valid] = 0
+            total = counts.sum()
+            if total == 0:
+                continue
+
+            # All the (candidate, source) pairs in these cells
+            which = numpy.repeat(numpy.arange(remaining.size), counts)
+            pairs = numpy.repeat(starts - numpy.cumsum(counts), counts)
+            pairs += numpy.repeat(counts, counts) + numpy.arange(total)
+            delta = points[remaining[which]] - source_points[pairs]
+            if periodic:
+                delta -= numpy.rint(delta)
+                if images.shape[0] == 1:
+                    xyz = delta @ transform
+                    r2 = numpy.einsum('ij,ij->i', xyz, xyz)
+                else:
+                    r2 = numpy.full(delta.shape[0], numpy.inf)
+                    for image in images:
+                        xyz = (delta + image) @ transform
+                        numpy.minimum(
+                            r2, numpy.einsum('ij,ij->i', xyz, xyz), out=r2
+                        )
+            else:
+                r2 = numpy.einsum('ij,ij->i', delta, delta)
+            hit = numpy.zeros(remaining.size, dtype=bool)
+            hit[which[r2 <= cutoff2]] = True
+            result[remaining[hit]] = True
+            remaining = remaining[~hit]
+    return result
+
+
+class _Selection(object):
+    """A selection of atoms, written in the selection language.
+
+    The selection is parsed once, when created, but is evaluated against
+    the atoms each time it is used, so the same selection can be applied to
+    different configurations or systems.
+
+    Parameters
+    ----------
+    text : str
+        The selection, e.g. 'within 5.0 of resname LIG and not hydrogen'
+    """
+
+    def __init__(self, text):
+        self._text = text
+        self._tree = _parse(text)
+
+    def __repr__(self):
+        return f'_Selection({self._text!r})'
+
+    def __str__(self):
+        return self._text
+
+    @property
+    def is_sql(self):
+        """Whether the selection can be done entirely in SQL."""
+        return self._is_sql(self._tree)
+
+    @property
+    def text(self):
+        """The text of the selection."""
+        return self._text
+
+    @property
+    def tree(self):
+        """The parsed selection, as nested tuples."""
+        return self._tree
+
+    def atom_ids(self, atoms, subset=None, configuration=None):
+        """The ids of the selected atoms.
+
+        Parameters
+        ----------
+        atoms : _Atoms
+            The atoms to select from.
+        subset : int = None
+            Select from the atoms in the subset. Defaults to the 'all/all'
+            subset for the configuration given.
+        configuration : int = None
+            The configuration of interest. Defaults to the current
+            configuration.
+
+        Returns
+        -------
+        numpy.ndarray
+            The ids of the selected atoms, in the order of the subset.
+        """
+        if configuration is None:
+            configuration = atoms.current_configuration
+        if subset is None:
+            subset = atoms.system.all_subset(configuration)
+
+        if self.is_sql:
+            condition, values = self._sql(self._tree, atoms)
+            from_clause, parameters = self._from(
+                atoms, subset, configuration, 'co."' in condition
+            )
+            return _fetch(
+                atoms.db, f'SELECT sa.atom {from_clause} AND {condition}'
+                ' ORDER BY sa.rowid', parameters + values, numpy.int64
+            )
+
+        context = self._context(atoms, subset, configuration)
+        mask = self._mask(
+            self._tree, numpy.ones(context['ids'].size, dtype=bool), context
+        )
+        return context['ids'][mask]
+
+    def mask(self, atoms, subset=None, configuration=None):
+        """A boolean mask of the selected atoms.
+
+        Parameters
+        ----------
+        atoms : _Atoms
+            The atoms to select from.
+        subset : int = None
+            Select from the atoms in the subset. Defaults to the 'all/all'
+            subset for the configuration given.
+        configuration : int = None
+            The configuration of interest. Defaults to the current
+            configuration.
+
+        Returns
+        -------
+        numpy.ndarray
+            True for each selected atom, in the order of the subset.
+        """
+        if configuration is None:
+            configuration = atoms.current_configuration
+        if subset is None:
+            subset = atoms.system.all_subset(configuration)
+
+        context = self._context(atoms, subset, configuration)
+        return self._mask(
+            self._tree, numpy.ones(context['ids'].size, dtype=bool), context
+        )
+
+    def where(self, atoms, subset=None, configuration=None):
+        """SQL condition on the tables 'at' and 'co' for the selection.
+
+        Parameters
+        ----------
+        atoms : _Atoms
+            The atoms to select from.
+        subset : int = None
+            Select from the atoms in the subset. Defaults to the 'all/all'
+            subset for the configuration given. Only used if the selection
+            cannot be done entirely in SQL.
+        configuration : int = None
+            The configuration of interest. Defaults to the current
+            configuration. Only used if the selection cannot be done
+            entirely in SQL.
+
+        Returns
+        -------
+        str, [Any]
+            The SQL condition and the values of its parameters.
+        """
+        if self.is_sql:
+            return self._sql(self._tree, atoms)
+        ids = self.atom_ids(atoms, subset=subset, configuration=configuration)
+        return (
+            '(at.id IN (SELECT value FROM json_each(?)))',
+            [json.dumps(ids.tolist())]
+        )
+
+    def _column(self, atoms, attribute):
+        """The qualified SQL column name for an attribute."""
+        if attribute in atoms._atom_table.attributes:
+            return f'at."{attribute}"'
+        if attribute in atoms._coordinates_table.attributes:
+            return f'co."{attribute}"'
+        raise ValueError(
+            f"'{attribute}' in the selection '{self._text}' is not an "
+            "attribute of the atoms."
+        )
+
+    def _context(self, atoms, subset, configuration):
+        """The information needed while evaluating the selection.
+
+        The rows of 'subset_atom' for the subset give the order of the
+        atoms. Parts of the selection done in SQL return just the rowids of
+        the selected rows, which are located in this list.
+        """
+        tmp = _fetch(
+            atoms.db, 'SELECT rowid, atom FROM subset_atom WHERE subset = ?'
+            ' ORDER BY rowid', (subset,), numpy.int64, 2
+        )
+        return {
+            'atoms': atoms,
+            'subset': subset,
+            'configuration': configuration,
+            'rowids': tmp[:, 0].copy(),
+            'ids': tmp[:, 1].copy(),
+        }
+
+    def _from(self, atoms, subset, configuration, coordinates):
+        """The FROM and WHERE clauses joining the atoms to the subset."""
+        sql = f'  FROM subset_atom as sa, "{atoms._atom_tablename}" as at'
+        if coordinates:
+            sql += f', "{atoms._coordinates_tablename}" as co'
+        sql += ' WHERE sa.subset = ? AND at.id = sa.atom'
+        parameters = [subset]
+        if coordinates:
+            sql += ' AND co.atom = at.id AND co.configuration = ?'
+            parameters.append(configuration)
+        return sql, parameters
+
+    def _is_sql(self, node):
+        """Whether a node of the tree can be evaluated entirely in SQL."""
+        if node[0] == 'within':
+            return False
+        if node[0] in ('and', 'or'):
+            return self._is_sql(node[1]) and self._is_sql(node[2])
+        if node[0] == 'not':
+            return self._is_sql(node[1])
+        return True
+
+    def _in(self, column, values):
+        """The SQL to test if a column is in a list of values."""
+        if len(values) == 1:
+            return f'{column} = ?', [*values]
+        if len(values) > _max_parameters:
+            return (
+                f'{column} IN (SELECT value FROM json_each(?))',
+                [json.dumps([*values])]
+            )
+        placeholders = ', '.join(['?'] * len(values))
+        return f'{column} IN ({placeholders})', [*values]
+
+    def _mask(self, node, candidates, context):
+        """Evaluate a node of the tree, as a mask.
+
+        Only the answers for the candidates are needed, so the result is
+        False for all other atoms, which avoids unneeded distance checks.
+        """
+        kind = node[0]
+        if kind == 'all':
+            return candidates
+        if kind == 'none':
+            return numpy.zeros_like(candidates)
+        if self._is_sql(node):
+            atoms = context['atoms']
+            condition, values = self._sql(node, atoms)
+            coordinates = 'co."' in condition
+            from_clause, parameters = self._from(
+                atoms, context['subset'], context['configuration'], coordinates
+            )
+            rowids = _fetch(
+                atoms.db, f'SELECT sa.rowid {from_clause} AND {condition}',
+                parameters + values, numpy.int64
+            )
+            result = numpy.zeros_like(candidates)
+            result[numpy.searchsorted(context['rowids'], rowids)] = True
+            return result & candidates
+        if kind == 'and':
+            # Do the SQL first, since it is cheap and limits the candidates
+            first, second = node[1:]
+            if not self._is_sql(first):
+                first, second = second, first
+            candidates = self._mask(first, candidates, context)
+            return self._mask(second, candidates, context)
+        if kind == 'or':
+            result = self._mask(node[1], candidates, context)
+            return result | self._mask(node[2], candidates & ~result, context)
+        if kind == 'not':
+            return candidates & ~self._mask(node[1], candidates, context)
+        if kind == 'within':
+            cutoff = node[1]
+            points, transform = self._points(context)
+            sources = self._mask(
+                node[2], numpy.ones(points.shape[0], dtype=bool), context
+            )
+            return _within(points, sources, cutoff, candidates, transform)
+        raise RuntimeError(f"Unknown node '{kind}' in the selection.")
+
+    def _points(self, context):
+        """The coordinates for the distance searches, fetched once."""
+        if 'points' not in context:
+            atoms = context['atoms']
+            configuration = context['configuration']
+            # Reading the whole configuration and putting the atoms in
+            # order here is faster than joining with the subset in SQL.
+            tmp = _fetch(
+                atoms.db, 'SELECT atom, x, y, z'
+                f'  FROM "{atoms._coordinates_tablename}"'
+                ' WHERE configuration = ?', (configuration,), float, 4
+            )
+            ids = context['ids']
+            sorter = numpy.argsort(ids)
+            rows = numpy.searchsorted(ids, tmp[:, 0], sorter=sorter)
+            rows[rows == ids.size] = 0
+            keep = ids[sorter[rows]] == tmp[:, 0]
+            xyz = numpy.zeros((ids.size, 3))
+            xyz[sorter[rows[keep]]] = tmp[keep, 1:]
+            transform = None
+            if atoms.system.periodicity != 0:
+                cell = atoms.system['cell'].cell(configuration)
+                transform = cell.to_cartesians_transform(as_array=True)
+                if atoms.system.coordinate_system == 'Cartesian':
+                    xyz = cell.to_fractionals(xyz, as_array=True)
+            context['points'] = (xyz, transform)
+        return context['points']
+
+    def _sql(self, node, atoms):
+        """Compile a node of the tree to an SQL condition and parameters."""
+        kind = node[0]
+        if kind == 'all':
+            return '1', []
+        if kind == 'none':
+            return '0', []
+        if kind in ('and', 'or'):
+            left, left_values = self._sql(node[1], atoms)
+            right, right_values = self._sql(node[2], atoms)
+            return (
+                f'({left} {kind.upper()} {right})', left_values + right_values
+            )
+        if kind == 'not':
+            # NULL, e.g. a missing attribute, is not selected, so 'not'
+            # selects it.
+            condition, values = self._sql(node[1], atoms)
+            return f'(NOT COALESCE({condition}, 0))', values
+        if kind == 'element':
+            try:
+                atnos = atoms.to_atnos(node[1])
+            except KeyError as e:
+                raise ValueError(
+                    f"Unknown element {e} in the selection '{self._text}'"
+                )
+            return self._in('at.atno', atnos)
+        if kind == 'subset':
+            condition, values = self._in('subset', node[1])
+            return (
+                '(at.id IN (SELECT atom FROM subset_atom'
+                f' WHERE {condition}))', values
+            )
+        if kind == 'compare':
+            attribute, op, value = node[1:]
+            column = self._column(atoms, attribute)
+            return f'{column} {op} ?', [value]
+        if kind == 'values':
+            attribute, values, ranges, globs = node[1:]
+            column = self._column(atoms, attribute)
+            conditions = []
+            parameters = []
+            if len(values) > 0:
+                condition, tmp = self._in(column, values)
+                conditions.append(condition)
+                parameters.extend(tmp)
+            for low, high in ranges:
+                conditions.append(f'{column} BETWEEN ? AND ?')
+                parameters.extend((low, high))
+            for glob in globs:
+                conditions.append(f'{column} GLOB ?')
+                parameters.append(glob)
+            return '(' + ' OR '.join(conditions) + ')', parameters
+        raise RuntimeError(f"Unknown node '{kind}' in the selection.")
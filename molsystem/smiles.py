@@ -2,12 +2,290 @@
 
 """Functions for handling SMILES"""
 
+import concurrent.futures
 import logging
 
-from openbabel import openbabel
-
 logger = logging.getLogger(__name__)
 
+# OpenBabel is imported in the functions that use it, since importing it is
+# slow and many users of molsystem never need it.
+
+# The OpenBabel conversions and builder, made once per process. Creating
+# them costs more than converting a small molecule.
+_conversions = {}
+_builders = []
+
+# The number of molecules to send to a worker process at a time
+chunk_molecules = 16
+
+
+def _conversion(in_format, out_format, *options):
+    """The conversion between two formats, reused for the process.
+
+    Parameters
+    ----------
+    in_format, out_format : str
+        The formats, e.g. 'smi' and 'can'.
+    options : str
+        Options for the output, e.g. 'n' to not write the title.
+
+    Returns
+    -------
+    openbabel.OBConversion
+        The conversion.
+    """
+    from openbabel import openbabel
+
+    key = (in_format, out_format, options)
+    if key not in _conversions:
+        conversion = openbabel.OBConversion()
+        conversion.SetInAndOutFormats(in_format, out_format)
+        for option in options:
+            conversion.AddOption(option)
+        _conversions[key] = conversion
+    return _conversions[key]
+
+
+def _builder():
+    """The builder for 3-D structures, reused for the process."""
+    from openbabel import openbabel
+
+    if len(_builders) == 0:
+        _builders.append(openbabel.OBBuilder())
+    return _builders[0]
+
+
+def _obmol(record):
+    """Create an OpenBabel molecule from the atoms and bonds in a record.
+
+    The hydrogens that are not given are added implicitly, and stereochemistry
+    comes from the coordinates, as when OpenBabel reads a molfile.
+
+    Parameters
+    ----------
+    record : dict
+        The title, atnos, x, y, z, charges (or None), and 0-based i, j and
+        bondorders of the bonds.
+
+    Returns
+    -------
+    openbabel.OBMol
+        The molecule.
+    """
+    from openbabel import openbabel
+
+    mol = openbabel.OBMol()
+    mol.BeginModify()
+    charges = record['charges']
+    for n, (atno, x, y, z) in enumerate(
+        zip(record['atnos'], record['x'], record['y'], record['z'])
+    ):
+        atom = mol.NewAtom()
+        atom.SetAtomicNum(atno)
+        atom.SetVector(x, y, z)
+        if charges is not None:
+            atom.SetFormalCharge(charges[n])
+    for i, j, order in zip(record['i'], record['j'], record['bondorders']):
+        # 1-based indices in OpenBabel
+        mol.AddBond(i + 1, j + 1, order)
+    mol.EndModify()
+    for atom in openbabel.OBMolAtomIter(mol):
+        openbabel.OBAtomAssignTypicalImplicitHydrogens(atom)
+    mol.SetDimension(3)
+    openbabel.StereoFrom3D(mol)
+    mol.SetTitle(record['title'])
+    return mol
+
+
+def _graph(atnos, bonds):
+    """Create an OpenBabel molecule with only the atoms and bonds.
+
+    There are no coordinates or implicit hydrogens, so the SMILES have no
+    stereochemistry and only the hydrogens given.
+
+    Parameters
+    ----------
+    atnos : [int]
+        The atomic numbers of the atoms.
+    bonds : [(int, int, int)]
+        The 0-based indices of the atoms in each bond, and its order.
+
+    Returns
+    -------
+    openbabel.OBMol
+        The molecule.
+    """
+    from openbabel import openbabel
+
+    mol = openbabel.OBMol()
+    for atno in atnos:
+        mol.NewAtom().SetAtomicNum(atno)
+    for i, j, order in bonds:
+        # 1-based indices in OpenBabel
+        mol.AddBond(i + 1, j + 1, order)
+    return mol
+
+
+def _record(mol):
+    """The atoms and bonds of an OpenBabel molecule, as read_sdf gives them.
+
+    Parameters
+    ----------
+    mol : openbabel.OBMol
+        The molecule.
+
+    Returns
+    -------
+    dict
+        The title, symbols, x, y, z, charges (or None), and 0-based i, j and
+        bondorders of the bonds.
+    """
+    from openbabel import openbabel
+
+    symbols = []
+    x = []
+    y = []
+    z = []
+    charges = []
+    for atom in openbabel.OBMolAtomIter(mol):
+        symbols.append(openbabel.GetSymbol(atom.GetAtomicNum()))
+        x.append(atom.GetX())
+        y.append(atom.GetY())
+        z.append(atom.GetZ())
+        charges.append(atom.GetFormalCharge())
+    i = []
+    j = []
+    bondorders = []
+    for bond in openbabel.OBMolBondIter(mol):
+        i.append(bond.GetBeginAtomIdx() - 1)
+        j.append(bond.GetEndAtomIdx() - 1)
+        bondorders.append(bond.GetBondOrder())
+    return {
+        'title': mol.GetTitle(),
+        'comment': '',
+        'symbols': symbols,
+        'x': x,
+        'y': y,
+        'z': z,
+        'charges': charges if any(charges) else None,
+        'i': i,
+        'j': j,
+        'bondorders': bondorders,
+        'data': {},
+    }
+
+
+def _build(smiles):
+    """Build a 3-D molecule, with hydrogens, from SMILES.
+
+    Parameters
+    ----------
+    smiles : str
+        The SMILES, optionally followed by the title.
+
+    Returns
+    -------
+    dict
+        The atoms and bonds, as from _record.
+    """
+    from openbabel import openbabel
+
+    mol = openbabel.OBMol()
+    if not _conversion('smi', 'smi').ReadString(mol, smiles):
+        raise ValueError(f"Could not read the SMILES '{smiles}'")
+    mol.AddHydrogens()
+    _builder().Build(mol)
+    return _record(mol)
+
+
+def _titled(record, title):
+    """The record, with a new title."""
+    return {**record, 'title': title}
+
+
+def _write(record, canonical, name, hydrogens):
+    """Write the SMILES for the atoms and bonds in a record.
+
+    Parameters
+    ----------
+    record : dict
+        The atoms and bonds, as for _obmol.
+    canonical : bool
+        Whether to create canonical SMILES
+    name : bool
+        Whether to return the title as well
+    hydrogens : bool
+        Whether to keep H's in the SMILES string.
+
+    Returns
+    -------
+    str or [str]
+        The SMILES string, or [SMILES, title] if the title is requested
+    """
+    return _write_obmol(_obmol(record), canonical, name, hydrogens)
+
+
+def _write_obmol(mol, canonical, name, hydrogens, title=None):
+    """Write the SMILES for an OpenBabel molecule.
+
+    Parameters
+    ----------
+    mol : openbabel.OBMol
+        The molecule.
+    canonical : bool
+        Whether to create canonical SMILES
+    name : bool
+        Whether to return the title as well
+    hydrogens : bool
+        Whether to keep H's in the SMILES string.
+    title : str = None
+        The title to return, rather than that of the molecule, so that
+        cached molecules need not be changed.
+
+    Returns
+    -------
+    str or [str]
+        The SMILES string, or [SMILES, title] if the title is requested
+    """
+    options = ['n']
+    if hydrogens:
+        options.append('h')
+    conversion = _conversion('smi', 'can' if canonical else 'smi', *options)
+    smiles = conversion.WriteString(mol).strip()
+    if name:
+        return [smiles, mol.GetTitle() if title is None else title]
+    else:
+        return smiles
+
+
+def _write_args(args):
+    """_write with its arguments in a tuple, for mapping over processes."""
+    return _write(*args)
+
+
+def _map(function, items, processes):
+    """Apply a function to items, in order, optionally in worker processes.
+
+    Parameters
+    ----------
+    function : function
+        A module-level function, so that it can be sent to the processes.
+    items : iterable
+        The arguments for the function.
+    processes : int = None
+        The number of processes, or 1 or None to work in this process.
+
+    Returns
+    -------
+    iterator
+        The results, in the order of the items.
+    """
+    if processes is None or processes == 1:
+        yield from map(function, items)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+            yield from pool.map(function, items, chunksize=chunk_molecules)
+
 
 class SMILESMixin:
     """A mixin for handling SMILES."""
@@ -37,39 +315,70 @@ class SMILESMixin:
         str
             The SMILES string, or (SMILES, name) if the rname is requested
         """
-        logger.info('to_smiles')
-
-        molfile = self.to_molfile_text()
-        logger.info('...molfile = ')
-        logger.info(molfile)
-        logger.info('...end molfile')
-
-        obConversion = openbabel.OBConversion()
-        if canonical:
-            obConversion.SetInAndOutFormats("mdl", "can")
-        else:
-            obConversion.SetInAndOutFormats("mdl", "smi")
-        mol = openbabel.OBMol()
-        obConversion.ReadString(mol, molfile)
-
-        logger.info(f'MolFile has {mol.NumAtoms()} atoms')
-
-        if not name:
-            obConversion.AddOption('n')
-        if hydrogens:
-            obConversion.AddOption('h')
-        smiles = obConversion.WriteString(mol)
-
-        logger.info('')
-        logger.info('')
-        logger.info('')
-        logger.info('')
-        logger.info(f"smiles = '{smiles}'")
-
-        if name:
-            return smiles.strip().split('\t')
-        else:
-            return smiles.strip()
+        mol = self.to_OBMol(configuration=configuration)
+        smiles = _write_obmol(mol, canonical, name, hydrogens, self.name)
+        logger.debug(f"smiles = '{smiles}'")
+        return smiles
+
+    def to_smiles_many(
+        self,
+        configurations=None,
+        canonical=False,
+        name=False,
+        hydrogens=False,
+        processes=None
+    ):
+        """Create the SMILES strings for many configurations.
+
+        The OpenBabel objects are reused from one molecule to the next, and
+        the work can be spread over several processes. In this process the
+        molecules cached by to_OBMol are used.
+
+        Parameters
+        ----------
+        configurations : [int] = None
+            The configurations, defaults to all the configurations.
+        canonical : bool = False
+            Whether to create canonical SMILES
+        name : bool = False
+            Whether to return the names of the configurations, or of the
+            system for configurations without names.
+        hydrogens : bool = False
+            Whether to keep H's in the SMILES strings.
+        processes : int = None
+            The number of processes to use, by default only this one.
+
+        Returns
+        -------
+        [str] or [[str]]
+            The SMILES strings, or [SMILES, name] if the names are requested
+        """
+        if configurations is None:
+            configurations = [*self.configurations]
+
+        titles = []
+        for configuration in configurations:
+            title = self.db.execute(
+                'SELECT name FROM configuration WHERE id = ?',
+                (configuration,)
+            ).fetchone()[0]
+            titles.append(self.name if title is None else title)
+
+        if processes is None or processes == 1:
+            result = []
+            for configuration, title in zip(configurations, titles):
+                mol = self.to_OBMol(configuration=configuration)
+                result.append(
+                    _write_obmol(mol, canonical, name, hydrogens, title)
+                )
+            return result
+
+        # The molecules cannot be sent to other processes, only their atoms
+        records = []
+        for configuration, title in zip(configurations, titles):
+            record = self._ob_record(configuration, title=title)
+            records.append((record, canonical, name, hydrogens))
+        return [*_map(_write_args, records, processes)]
 
     def from_smiles(self, smiles, name=None, configuration=None):
         """Create the system from a SMILES string.
@@ -87,21 +396,139 @@ class SMILESMixin:
         -------
         None
         """
+        self.from_smiles_many((smiles,), configuration=configuration)
+        if name is not None:
+            self.name = name
 
-        obConversion = openbabel.OBConversion()
-        obConversion.SetInAndOutFormats("smi", "mdl")
-        obConversion.AddOption('3')
-        mol = openbabel.OBMol()
-        obConversion.ReadString(mol, smiles)
+    def from_smiles_many(
+        self,
+        smiles,
+        names=None,
+        configuration=None,
+        as_systems=False,
+        processes=None
+    ):
+        """Create 3-D structures for many SMILES strings.
 
-        # Add hydrogens
-        mol.AddHydrogens()
+        As for an SD file, the first molecule goes into the configuration
+        given and each further molecule into a new configuration, or into a
+        new system if as_systems is True. Building the structures is the
+        slow part, so it can be spread over several processes.
 
-        # Get coordinates for a 3-D structure
-        builder = openbabel.OBBuilder()
-        builder.Build(mol)
+        Parameters
+        ----------
+        smiles : iterable of str
+            The SMILES strings
+        names : [str] = None
+            The names of the molecules, by default any title after the SMILES.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
+        as_systems : bool = False
+            Whether to put each molecule after the first in a new system.
+        processes : int = None
+            The number of processes to use, by default only this one.
 
-        molfile = obConversion.WriteString(mol)
-        self.from_molfile_text(molfile)
-        if name is not None:
-            self.name = name
+        Returns
+        -------
+        [int] or [_System]
+            The configurations, or the systems, for the molecules.
+        """
+        records = _map(_build, smiles, processes)
+        if names is not None:
+            records = map(_titled, records, names)
+        return self._from_records(records, configuration, as_systems)
+
+    def to_OBMol(self, configuration=None, subset=None):
+        """The OpenBabel molecule for a configuration or subset.
+
+        The molecule is built directly from the atoms and bonds, and is
+        cached until they change, so it is shared by all the callers and
+        should not be changed. Use openbabel.OBMol(mol) to get a copy that
+        can be.
+
+        Parameters
+        ----------
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
+        subset : int = None
+            The subset to use, defaults to all the atoms in the
+            configuration.
+
+        Returns
+        -------
+        openbabel.OBMol
+            The molecule.
+        """
+        if configuration is None:
+            configuration = self.current_configuration
+
+        count = self.change_count(
+            'atom', 'coordinates', 'subset_atom', 'templateatom',
+            'templatebond', 'configuration', 'cell', 'system'
+        )
+        key = (configuration, subset)
+        if key in self._obmols:
+            mol, last_count = self._obmols[key]
+            if last_count == count:
+                return mol
+
+        mol = _obmol(self._ob_record(configuration, subset))
+        self._obmols[key] = (mol, count)
+        return mol
+
+    def from_OBMol(self, mol, configuration=None):
+        """Replace the atoms and bonds of a configuration with a molecule.
+
+        The atoms and bonds are added in bulk, and the name of the system is
+        set to the title of the molecule, as when reading a molfile.
+
+        Parameters
+        ----------
+        mol : openbabel.OBMol
+            The OpenBabel molecule.
+        configuration : int = None
+            The configuration to use, defaults to the current configuration.
+
+        Returns
+        -------
+        int
+            The configuration.
+        """
+        return self._from_records((_record(mol),), configuration, False)[0]
+
+    def _ob_record(self, configuration, subset=None, title=''):
+        """The atoms and bonds of a configuration or subset, for _obmol.
+
+        Parameters
+        ----------
+        configuration : int
+            The configuration.
+        subset : int = None
+            The subset, defaults to all the atoms in the configuration.
+        title : str = ''
+            The title of the molecule.
+
+        Returns
+        -------
+        dict
+            The title, atnos, x, y, z, charges (or None), and 0-based i, j
+            and bondorders of the bonds.
+        """
+        charged = 'formal_charge' in self.atoms
+        columns = 'at.atno, at.formal_charge' if charged else 'at.atno'
+        rows = self._pdb_query(columns, configuration, subset)
+        atnos = [row[0] for row in rows]
+        charges = [row[1] for row in rows] if charged else None
+        xyz = self._pdb_coordinates(configuration, subset)
+        i, j, bondorders = self._bonded_indices(configuration, subset)
+        return {
+            'title': title,
+            'atnos': atnos,
+            'x': xyz[:, 0].tolist(),
+            'y': xyz[:, 1].tolist(),
+            'z': xyz[:, 2].tolist(),
+            'charges': charges,
+            'i': i.tolist(),
+            'j': j.tolist(),
+            'bondorders': bondorders.tolist(),
+        }
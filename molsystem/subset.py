@@ -7,6 +7,7 @@ from itertools import zip_longest
 import logging
 from typing import TypeVar, Dict, Any
 
+from molsystem.subset_index import _SubsetIndex as SubsetIndex
 from molsystem.table import _Table as Table
 
 System_tp = TypeVar("System_tp", "System", None)
@@ -33,6 +34,7 @@ class _Subsets(Table):
         super().__init__(system, tablename)
 
         self._configuration_subset_table = self.system['configuration_subset']
+        self._indices = {}  # The membership index for each configuration
 
     def n_subsets(self, configuration=None):
         """The number of subsets for a configuration.
@@ -115,6 +117,7 @@ class _Subsets(Table):
         -------
         None
         """
+        self.system.mark_changed(self._table, cascade=True)
         if ids == 'all':
             if configuration is None:
                 configuration = self.system.current_configuration
@@ -196,6 +199,38 @@ class _Subsets(Table):
 
         return result
 
+    def index(self, configuration=None):
+        """The index of which atoms are in which subsets.
+
+        The index is built the first time it is needed and then reused
+        until the subsets or their atoms change.
+
+        Parameters
+        ----------
+        configuration : int = None
+            The configuration of interest. Defaults to the current
+            configuration.
+
+        Returns
+        -------
+        _SubsetIndex
+            The index for the configuration.
+        """
+        if configuration is None:
+            configuration = self.system.current_configuration
+
+        count = self.system.change_count(
+            'subset', 'subset_atom', 'configuration_subset'
+        )
+        if configuration in self._indices:
+            index, last_count = self._indices[configuration]
+            if last_count == count:
+                return index
+
+        index = SubsetIndex(self.system, configuration)
+        self._indices[configuration] = (index, count)
+        return index
+
     def template(self, sid):
         """The template for the given subset.
 
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+
+"""An index of which atoms are in which subsets
+
+The membership of atoms in subsets is held in the 'subset_atom' table, so
+working with many subsets, e.g. residues or molecules, needs a query per
+subset. This index loads the membership for a configuration once into
+compressed sparse row (CSR) arrays going both ways, subset -> atoms and
+atom -> subsets, so that questions like "which atoms are in any of these
+subsets" or "which molecule is each atom in" are simple array operations.
+
+The index is a snapshot. Use _Subsets.index() to get an index that is
+rebuilt whenever the subsets change.
+"""
+
+import itertools
+import logging
+
+import numpy
+
+logger = logging.getLogger(__name__)
+
+
+def _fetch_array(db, sql, parameters, n_columns):
+    """Run a query returning integers and return them as an array."""
+    data = numpy.fromiter(
+        itertools.chain.from_iterable(db.execute(sql, parameters)),
+        dtype=numpy.int64
+    )
+    return data.reshape(-1, n_columns)
+
+
+def _ranges(pointers, positions):
+    """The concatenated CSR ranges for the given rows."""
+    starts = pointers[positions]
+    counts = pointers[positions + 1] - starts
+    offsets = numpy.repeat(starts - numpy.cumsum(counts) + counts, counts)
+    return offsets + numpy.arange(offsets.size)
+
+
+class _SubsetIndex(object):
+    """The membership of the atoms in the subsets of a configuration.
+
+    Atoms are numbered by their position in the 'all' subset of the
+    configuration, which is the same order as e.g. _Atoms.atom_ids() and
+    _Atoms.coordinates(), so the arrays returned line up with those.
+    """
+
+    def __init__(self, system, configuration):
+        self._system = system
+        self._configuration = configuration
+
+        self._atom_ids = None  # The atoms in the configuration
+        self._sorter = None  # Argsort of the atom ids
+        self._sorted_ids = None  # The atom ids, sorted
+        self._subset_ids = None  # The subsets in the configuration, sorted
+        self._templates = None  # The template of each subset
+        self._subset_ptr = None  # CSR pointers subset -> atoms
+        self._subset_atoms = None  # The atom indices, by subset
+        self._atom_ptr = None  # CSR pointers atom -> subsets
+        self._atom_subsets = None  # The subset indices, by atom
+
+        self._load()
+
+    def __len__(self) -> int:
+        """The number of subsets in the index."""
+        return self._subset_ids.size
+
+    def __contains__(self, subset) -> bool:
+        """Whether a subset is in the index."""
+        i = numpy.searchsorted(self._subset_ids, subset)
+        return i < self._subset_ids.size and self._subset_ids[i] == subset
+
+    @property
+    def atom_ids(self):
+        """The ids of the atoms in the configuration."""
+        return self._atom_ids
+
+    @property
+    def configuration(self):
+        """The configuration that this index describes."""
+        return self._configuration
+
+    @property
+    def n_atoms(self):
+        """The number of atoms in the configuration."""
+        return self._atom_ids.size
+
+    @property
+    def n_subsets(self):
+        """The number of subsets in the configuration."""
+        return self._subset_ids.size
+
+    @property
+    def subset_ids(self):
+        """The ids of the subsets in the configuration, in ascending order."""
+        return self._subset_ids
+
+    @property
+    def system(self):
+        """The system that we belong to."""
+        return self._system
+
+    @property
+    def templates(self):
+        """The template of each subset, in the order of subset_ids."""
+        return self._templates
+
+    def atoms(self, subset, as_indices=False):
+        """The atoms in a subset.
+
+        Parameters
+        ----------
+        subset : int
+            The id of the subset.
+        as_indices : bool = False
+            Whether to return 0-based indices (True) or atom ids (False)
+
+        Returns
+        -------
+        numpy.ndarray
+            The atom ids or indices, in the order they were added to the
+            subset.
+        """
+        i = self.subset_positions(subset)[0]
+        start, stop = self._subset_ptr[i:i + 2]
+        indices = self._subset_atoms[start:stop]
+        if as_indices:
+            return indices
+        return self._atom_ids[indices]
+
+    def atoms_in(self, subsets=None, template=None, as_indices=False):
+        """The atoms that are in any of the given subsets.
+
+        Parameters
+        ----------
+        subsets : int or [int] = None
+            The ids of the subsets.
+        template : int = None
+            Alternatively, use all the subsets of this template.
+        as_indices : bool = False
+            Whether to return 0-based indices (True) or atom ids (False)
+
+        Returns
+        -------
+        numpy.ndarray
+            The atom ids or indices, each atom once, in the order of the
+            configuration.
+        """
+        indices = numpy.nonzero(self.mask(subsets, template=template))[0]
+        if as_indices:
+            return indices
+        return self._atom_ids[indices]
+
+    def labels(self, subsets=None, template=None, default=-1):
+        """The subset containing each atom, for a set of subsets.
+
+        This is typically used with subsets that partition the atoms, such
+        as molecules or residues. If an atom is in more than one of the
+        subsets, the first one given is used.
+
+        Parameters
+        ----------
+        subsets : [int] = None
+            The ids of the subsets.
+        template : int = None
+            Alternatively, use all the subsets of this template.
+        default : int = -1
+            The label for atoms in none of the subsets.
+
+        Returns
+        -------
+        numpy.ndarray
+            The subset id for each atom in the configuration.
+        """
+        positions = self._positions(subsets, template)
+        result = numpy.full(self.n_atoms, default, dtype=numpy.int64)
+        rows = _ranges(self._subset_ptr, positions)
+        labels = numpy.repeat(
+            self._subset_ids[positions],
+            self._subset_ptr[positions + 1] - self._subset_ptr[positions]
+        )
+        # With repeated indices the last assignment wins, so reverse the
+        # order so that the first subset given wins.
+        result[self._subset_atoms[rows][::-1]] = labels[::-1]
+        return result
+
+    def mask(self, subsets=None, template=None):
+        """A boolean mask of the atoms in any of the given subsets.
+
+        Parameters
+        ----------
+        subsets : int or [int] = None
+            The ids of the subsets.
+        template : int = None
+            Alternatively, use all the subsets of this template.
+
+        Returns
+        -------
+        numpy.ndarray
+            True for each atom in the configuration that is in a subset.
+        """
+        positions = self._positions(subsets, template)
+        result = numpy.zeros(self.n_atoms, dtype=bool)
+        rows = _ranges(self._subset_ptr, positions)
+        result[self._subset_atoms[rows]] = True
+        return result
+
+    def subset_positions(self, subsets):
+        """The positions of subsets in subset_ids.
+
+        Parameters
+        ----------
+        subsets : int or [int]
+            The ids of the subsets.
+
+        Returns
+        -------
+        numpy.ndarray
+            The positions.
+
+        Raises
+        ------
+        KeyError
+            If any of the subsets are not in the configuration.
+        """
+        subsets = numpy.atleast_1d(numpy.asarray(subsets, dtype=numpy.int64))
+        positions = numpy.searchsorted(self._subset_ids, subsets)
+        positions[positions == self._subset_ids.size] = 0
+        bad = self._subset_ids[positions] != subsets
+        if self._subset_ids.size == 0 or numpy.any(bad):
+            missing = subsets if self._subset_ids.size == 0 else subsets[bad]
+            raise KeyError(
+                f'Subsets {missing.tolist()} are not in configuration '
+                f'{self._configuration}'
+            )
+        return positions
+
+    def subsets(self, atom, as_index=False):
+        """The subsets that an atom is in.
+
+        Parameters
+        ----------
+        atom : int
+            The atom id, or the 0-based index if as_index is True.
+        as_index : bool = False
+            Whether the atom is given as an index.
+
+        Returns
+        -------
+        numpy.ndarray
+            The ids of the subsets, in ascending order.
+        """
+        if as_index:
+            i = atom
+        else:
+            i = self.to_indices(atom)[0]
+        start, stop = self._atom_ptr[i:i + 2]
+        return self._subset_ids[self._atom_subsets[start:stop]]
+
+    def to_indices(self, atoms):
+        """Convert atom ids to 0-based indices in the configuration.
+
+        Parameters
+        ----------
+        atoms : int or [int]
+            The atom ids.
+
+        Returns
+        -------
+        numpy.ndarray
+            The indices.
+
+        Raises
+        ------
+        KeyError
+            If any of the atoms are not in the configuration.
+        """
+        atoms = numpy.atleast_1d(numpy.asarray(atoms, dtype=numpy.int64))
+        indices = self._lookup(atoms)
+        if numpy.any(indices < 0):
+            raise KeyError(
+                f'Atoms {atoms[indices < 0].tolist()} are not in '
+                f'configuration {self._configuration}'
+            )
+        return indices
+
+    def _load(self):
+        """Read the subsets and their atoms from the database."""
+        db = self.system.db
+        configuration = self._configuration
+
+        tmp = _fetch_array(
+            db, "SELECT subset.id, subset.template"
+            "  FROM subset, configuration_subset"
+            " WHERE configuration_subset.subset = subset.id"
+            "   AND configuration_subset.configuration = ?"
+            " ORDER BY subset.id", (configuration,), 2
+        )
+        self._subset_ids = tmp[:, 0].copy()
+        self._templates = tmp[:, 1].copy()
+
+        tmp = _fetch_array(
+            db, "SELECT subset_atom.subset, subset_atom.atom"
+            "  FROM subset_atom, configuration_subset"
+            " WHERE configuration_subset.subset = subset_atom.subset"
+            "   AND configuration_subset.configuration = ?"
+            " ORDER BY subset_atom.subset, subset_atom.rowid",
+            (configuration,), 2
+        )
+        subsets = tmp[:, 0]
+        atoms = tmp[:, 1]
+
+        all_subset = self.system.all_subset(configuration)
+        self._atom_ids = atoms[subsets == all_subset].copy()
+        self._sorter = numpy.argsort(self._atom_ids, kind='stable')
+        self._sorted_ids = self._atom_ids[self._sorter]
+
+        # Drop any atoms not in the configuration.
+        indices = self._lookup(atoms)
+        keep = indices >= 0
+        indices = indices[keep]
+        positions = numpy.searchsorted(self._subset_ids, subsets[keep])
+
+        n_subsets = self._subset_ids.size
+        self._subset_ptr = numpy.zeros(n_subsets + 1, dtype=numpy.int64)
+        numpy.cumsum(
+            numpy.bincount(positions, minlength=n_subsets),
+            out=self._subset_ptr[1:]
+        )
+        self._subset_atoms = indices
+
+        order = numpy.argsort(indices, kind='stable')
+        self._atom_ptr = numpy.zeros(self.n_atoms + 1, dtype=numpy.int64)
+        numpy.cumsum(
+            numpy.bincount(indices, minlength=self.n_atoms),
+            out=self._atom_ptr[1:]
+        )
+        self._atom_subsets = positions[order]
+
+    def _lookup(self, atoms):
+        """The indices of atom ids, -1 for atoms not in the configuration."""
+        if self._sorted_ids.size == 0:
+            return numpy.full(atoms.shape, -1, dtype=numpy.int64)
+        i = numpy.searchsorted(self._sorted_ids, atoms)
+        i[i == self._sorted_ids.size] = 0
+        found = self._sorted_ids[i] == atoms
+        return numpy.where(found, self._sorter[i], -1)
+
+    def _positions(self, subsets, template):
+        """The positions of the requested subsets."""
+        if template is not None:
+            if subsets is not None:
+                raise ValueError('Give either the subsets or the template.')
+            return numpy.nonzero(self._templates == template)[0]
+        if subsets is None:
+            raise ValueError('Either the subsets or template are needed.')
+        return self.subset_positions(subsets)
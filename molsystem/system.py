@@ -4,14 +4,21 @@
 """
 
 import collections.abc
-from collections import Counter
+import contextlib
 from functools import reduce
+import itertools
 import logging
 import math
+from pathlib import Path
 import sqlite3
 from typing import Any, Dict
 
-from molsystem.elemental_data import element_data
+import numpy
+
+from molsystem.elemental_data import (
+    atno_by_key, atomic_masses, atomic_symbols, atno_to_mass, atno_to_symbol,
+    symbol_keys, symbol_to_atno, symbol_to_mass
+)
 from molsystem.table import _Table as Table
 from molsystem.atoms import _Atoms as Atoms
 from molsystem.subset import _Subsets as Subsets
@@ -22,6 +29,7 @@ from molsystem.bonds import _Bonds as Bonds
 from molsystem.cell_parameters import _CellParameters as CellParameters
 
 from molsystem.cif import CIFMixin
+from molsystem.file_io import FileIOMixin
 from molsystem.molfile import MolFileMixin
 from molsystem.pdb import PDBMixin
 from molsystem.smiles import SMILESMixin
@@ -29,9 +37,85 @@ from molsystem.topology import TopologyMixin
 
 logger = logging.getLogger(__name__)
 
+# The default size of the cache of prepared statements for each connection.
+# The Python default, 128, is too small for the number of distinct
+# statements that a system uses.
+default_cached_statements = 256
+
+# Named profiles of the SQLite pragmas for the connection to the database.
+# The page size only applies to new databases. 'default' leaves SQLite's own
+# defaults: a rollback journal, fully synchronous, and no memory mapping.
+# 'fast' uses write-ahead logging, only syncing at checkpoints, which is safe
+# unless the computer itself fails. 'bulk' is for scratch databases that are
+# filled in bulk, and does not sync at all.
+profiles = {'default': {}}
+profiles['fast'] = {
+    'page_size': 4096,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # in KiB
+    'mmap_size': 256 * 1024**2,
+    'temp_store': 'MEMORY',
+}
+profiles['bulk'] = {
+    'page_size': 16384,
+    'journal_mode': 'WAL',
+    'synchronous': 'OFF',
+    'cache_size': -256000,  # in KiB
+    'mmap_size': 1024**3,
+    'temp_store': 'MEMORY',
+}
+default_profile = 'default'
+
+# The number of pages copied at a time when saving or loading a database
+# with the backup API, which lets other threads work between steps and
+# allows reporting the progress.
+backup_pages = 1024
+
+# The indexes for finding the atoms, coordinates and bonds of a configuration
+# without scanning the whole table, which matters once there are many
+# configurations: (name, table, columns)
+_indexes = (
+    (
+        'idx_coordinates_configuration_atom', 'coordinates',
+        'configuration, atom'
+    ),
+    (
+        'idx_subset_atom_subset_templateatom', 'subset_atom',
+        'subset, templateatom'
+    ),
+    ('idx_templateatom_template', 'templateatom', 'template'),
+    ('idx_templatebond_i_j', 'templatebond', 'i, j'),
+)
+
+
+class _Connection(sqlite3.Connection):
+    """A connection that counts the transactions it has ended.
+
+    Two reads in the same transaction see the same count, so the count
+    identifies the transaction for caches that are valid for its duration.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transactions = 0
+
+    def commit(self):
+        self.transactions += 1
+        super().commit()
+
+    def rollback(self):
+        self.transactions += 1
+        super().rollback()
+
+    def executescript(self, sql):
+        # executescript commits any open transaction first
+        self.transactions += 1
+        return super().executescript(sql)
+
 
 class _System(
-    PDBMixin, MolFileMixin, CIFMixin, SMILESMixin, TopologyMixin,
+    PDBMixin, MolFileMixin, CIFMixin, SMILESMixin, TopologyMixin, FileIOMixin,
     collections.abc.MutableMapping
 ):
     """A single system -- molecule, crystal, etc. -- in SEAMM.
@@ -121,10 +205,31 @@ class _System(
         self._db = None
         self._cursor = None
         self._items = {}
-        self._symbol_to_atno = {}
-        self._atno_to_symbol = {}
-        self._symbol_to_mass = {}
-        self._atno_to_mass = {}
+        self._symbol_to_atno = symbol_to_atno  # Shared by all systems
+        self._atno_to_symbol = atno_to_symbol
+        self._symbol_to_mass = symbol_to_mass
+        self._atno_to_mass = atno_to_mass
+        self._changes = {}  # Count of changes to each table
+        self._change_epoch = 0  # Incremented when everything may have changed
+        self._fk_dependents = None  # Tables referencing each table
+        self._table_attributes = {}  # Cache of the attributes of the tables
+        self._scalars = None  # Cache of the row in the system table
+        self._scalars_count = None  # The change count when cached
+        self._data_version = None  # The data_version when cached
+        self._data_version_checked = None  # The transaction it was checked
+        self._batch_depth = 0  # The depth of nested batch() contexts
+        self._obmols = {}  # Cache of OpenBabel molecules and change counts
+        self._compositions = {}  # Cache of element counts and change counts
+        self._cached_statements = kwargs.pop(
+            'cached_statements', default_cached_statements
+        )
+        if self._cached_statements is None:
+            self._cached_statements = default_cached_statements
+        self._profile = kwargs.pop('profile', default_profile)
+        if self._profile is None:
+            self._profile = default_profile
+        if isinstance(self._profile, str) and self._profile not in profiles:
+            raise ValueError(f"Unknown database profile '{self._profile}'")
 
         if 'filename' in kwargs:
             self.filename = kwargs.pop('filename')
@@ -140,7 +245,7 @@ class _System(
     def __enter__(self) -> Any:
         self.db.commit()
 
-        backup = self.parent.copy_system(self, temporary=True)
+        backup = self.parent.copy_system(self, memory=True)
         self._checkpoints.append(backup)
         return self
 
@@ -220,6 +325,8 @@ class _System(
         """Allow deletion of keys"""
         if key in self:
             self.cursor.execute(f"DROP TABLE '{key}'")
+            self.mark_schema_changed()
+            self.mark_changed(key, cascade=True)
 
     def __iter__(self):
         """Allow iteration over the object"""
@@ -310,6 +417,21 @@ class _System(
         """The periodic cell."""
         return self['cell']
 
+    @property
+    def cached_statements(self):
+        """The number of prepared SQL statements cached by the connection."""
+        return self._cached_statements
+
+    @property
+    def in_memory(self):
+        """Whether the database is in memory rather than in a file."""
+        return 'mode=memory' in str(self._filename)
+
+    @property
+    def profile(self):
+        """The profile of pragmas for the database, by name or as a dict."""
+        return self._profile
+
     @property
     def configurations(self):
         """The dictionary of configurations."""
@@ -318,23 +440,14 @@ class _System(
     @property
     def coordinate_system(self):
         """The coordinates system used, 'fractional' or 'Cartesian'"""
-        self.cursor.execute(
-            "SELECT coordinatesystem FROM system WHERE id = ?", (self._id,)
-        )
-        return self.cursor.fetchone()[0]
+        return self._get_scalar('coordinatesystem')
 
     @coordinate_system.setter
     def coordinate_system(self, value):
         if value.lower()[0] == 'f':
-            self.cursor.execute(
-                "UPDATE system SET coordinatesystem = 'fractional'"
-                " WHERE id = ?", (self._id,)
-            )
+            self._set_scalar('coordinatesystem', 'fractional')
         else:
-            self.cursor.execute(
-                "UPDATE system SET coordinatesystem = 'Cartesian'"
-                " WHERE id = ?", (self._id,)
-            )
+            self._set_scalar('coordinatesystem', 'Cartesian')
 
     @property
     def current_configuration(self):
@@ -370,30 +483,20 @@ class _System(
                 self._db = None
                 self._cursor = None
             self._filename = value
+            self.mark_schema_changed()
+            self.mark_changed()
             if self._filename is not None:
-                self._db = sqlite3.connect(self._filename)
-                self._db.row_factory = sqlite3.Row
-                self._db.execute('PRAGMA foreign_keys = ON')
-                self._cursor = self._db.cursor()
+                self._connect(self._filename)
                 self._initialize()
 
     @property
     def name(self):
         """Return the name of this system."""
-        self.cursor.execute(
-            "SELECT name FROM system WHERE id = ?", (self._id,)
-        )
-        result = self.cursor.fetchone()
-        if result is None:
-            return None
-        else:
-            return result[0]
+        return self._get_scalar('name')
 
     @name.setter
     def name(self, value):
-        self.cursor.execute(
-            "UPDATE system SET name = ? WHERE id = ?", (value, self._id)
-        )
+        self._set_scalar('name', value)
 
     @property
     def nickname(self):
@@ -408,10 +511,7 @@ class _System(
     @property
     def periodicity(self):
         """The periodicity of the system, 0, 1, 2 or 3"""
-        self.cursor.execute(
-            "SELECT periodicity FROM system WHERE id=?", (self._id,)
-        )
-        return self.cursor.fetchone()[0]
+        return self._get_scalar('periodicity')
 
     @property
     def parent(self):
@@ -422,10 +522,7 @@ class _System(
     def periodicity(self, value):
         if value < 0 or value > 3:
             raise ValueError('The periodicity must be between 0 and 3.')
-        self.cursor.execute(
-            "UPDATE system SET periodicity = ? WHERE id = ?",
-            (value, self._id)
-        )
+        self._set_scalar('periodicity', value)
 
     @property
     def subsets(self):
@@ -450,13 +547,12 @@ class _System(
     @property
     def version(self):
         """The version of the system, incrementing from 0"""
-        self.cursor.execute("SELECT version FROM system")
-        return int(self.cursor.fetchone()[0])
+        return int(self._get_scalar('version'))
 
     @version.setter
     def version(self, value):
-        self.cursor.execute("UPDATE system SET version = ?", (str(value),))
-        self.db.commit()
+        self._set_scalar('version', int(value))
+        self.commit()
 
     def add_configuration(
         self,
@@ -509,12 +605,17 @@ class _System(
             * Connect the previous 'all' subset to the configuration in the
               configuration_subset table.
         """
-        # Work out the subset and template for 'all'
+        cid = self['configuration'].append(
+            system=system, name=name, symmetry=symmetry
+        )[0]
+
+        # Work out the subset and template for 'all'. New subsets are linked
+        # to this configuration when they are created.
         if len(self._configurations) == 0:
             changed_bonds = True
             changed_atoms = True
             tid = self['template'].append(name='all', type='all')[0]
-            sid = self['subset'].create(template=tid)
+            sid = self['subset'].create(template=tid, configuration=cid)
         else:
             last_configuration = max(self._configurations)
             last_sid, last_tid = self._configurations[last_configuration]
@@ -523,26 +624,27 @@ class _System(
 
             if changed_bonds:
                 # Case 1
-                # If the bonding changed, need a new template and new subset
-                tid = self['template'].append(name='all', type='all')
-                sid = self['subset'].append(template=tid)
+                # If the bonding changed, need a new template and new subset.
+                # The names of templates are unique, so number the new one.
+                n = self.db.execute('SELECT MAX(id) FROM template').fetchone()
+                tid = self['template'].append(
+                    name=f'all {n[0] + 1}', type='all'
+                )[0]
+                sid = self['subset'].append(template=tid, configuration=cid)[0]
                 if not changed_atoms:
-                    atom_ids = self['atom'].atoms(
+                    atom_ids = self.atoms.atom_ids(
                         configuration=last_configuration
                     )
                     self['subset_atom'].append(subset=sid, atom=atom_ids)
             elif changed_atoms:
                 # Case 2
-                sid = self['subset'].append(template=tid)[0]
+                sid = self['subset'].append(template=tid, configuration=cid)[0]
             else:
                 # Case 3
-                pass
-
-        cid = self['configuration'].append(
-            system=system, name=name, symmetry=symmetry
-        )[0]
+                self['configuration_subset'].append(
+                    configuration=cid, subset=sid
+                )
 
-        self['configuration_subset'].append(configuration=cid, subset=sid)
         self._configurations[cid] = (sid, tid)
 
         return cid
@@ -565,6 +667,7 @@ class _System(
             f"ATTACH DATABASE '{other.filename}' AS '{other.nickname}'"
         )
         self._attached.append(other.nickname)
+        self.mark_schema_changed()
 
     def is_attached(self, name):
         """Return whether another system is attached to this one."""
@@ -572,9 +675,52 @@ class _System(
 
     def detach(self, other):
         """Detach an attached system."""
-        if self.is_attached(other.name):
-            self.cursor.execute(f'DETACH DATABASE "{other.name}"')
-            self._attached.remove(other.name)
+        if self.is_attached(other.nickname):
+            self.cursor.execute(f'DETACH DATABASE "{other.nickname}"')
+            self._attached.remove(other.nickname)
+            self.mark_schema_changed()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Make many changes in one transaction.
+
+        Normally each change is committed to the database as it is made,
+        which costs a write to the disk each time. Inside this context the
+        changes are only committed at the end, which is much faster when
+        making many small changes, such as reading thousands of molecules.
+        The changes made are committed even if there is an exception.
+
+            >>> with system.batch():
+            ...     system.from_molfile_text(sdf_text)
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.db.commit()
+
+    def change_count(self, *tables) -> int:
+        """A count of the changes to the given tables.
+
+        The count only ever increases, so caches of data derived from the
+        tables can save it and compare it later to see if they are stale.
+
+        Parameters
+        ----------
+        tables : str
+            The names of the tables.
+
+        Returns
+        -------
+        int
+            The count of changes.
+        """
+        count = self._change_epoch
+        for table in tables:
+            count += self._changes.get(table, 0)
+        return count
 
     def clear(self, configuration=None) -> int:
         """Remove everything from the configuration
@@ -596,6 +742,11 @@ class _System(
         # Delete the template atoms.
         self.templateatoms.remove(template=self.all_template(configuration))
 
+    def commit(self):
+        """Commit the changes to the database, unless in a batch()."""
+        if self._batch_depth == 0:
+            self.db.commit()
+
     def create_table(self, name, cls=Table, other=None):
         """Create a new table with the given name.
 
@@ -675,7 +826,11 @@ class _System(
         formulas : (str, str, int)
             The chemical formula, empirical formula and Z.
         """
-        counts = Counter(self.atoms.symbols(configuration))
+        composition = self._composition(configuration=configuration)
+        atnos = numpy.nonzero(composition)[0]
+        counts = dict(
+            zip(atomic_symbols[atnos].tolist(), composition[atnos].tolist())
+        )
 
         # Order the elements ... Merck CH then alphabetical,
         # or if no C or H, then just alphabetically
@@ -724,6 +879,271 @@ class _System(
             result.append(row['name'])
         return result
 
+    def load(self, path, pages=None, progress=None):
+        """Replace the contents of the system with a database file.
+
+        The database is copied with SQLite's backup API a number of pages at
+        a time. This is the complement of save(), and the usual way to fill a
+        system that is in memory.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The filename of the database.
+        pages : int = None
+            The number of pages to copy at a time, or -1 for all at once.
+            Defaults to molsystem.system.backup_pages.
+        progress : function = None
+            Called after each step as progress(status, remaining, total),
+            with the number of pages remaining and in total.
+
+        Returns
+        -------
+        None
+        """
+        path = Path(path).expanduser().resolve()
+        if not path.exists():
+            raise RuntimeError(f"File '{path}' does not exist!")
+
+        source = sqlite3.connect(path)
+        try:
+            self._copy_from(source, pages=pages, progress=progress)
+        finally:
+            source.close()
+
+    def make_supercell(self, na, nb, nc, configuration=None):
+        """Replace the configuration with an na x nb x nc supercell.
+
+        The atoms are replicated with their attributes, as are the bonds,
+        including those that cross the boundary of the original cell, and
+        any subsets other than 'all'. The atoms of the original cell keep
+        their ids and become the first image. The atoms and bonds must not
+        be shared with other configurations, but if the cell is, this
+        configuration is given its own cell.
+
+        Parameters
+        ----------
+        na, nb, nc : int
+            The number of copies of the cell along a, b and c.
+        configuration : int = None
+            The configuration of interest. Defaults to the current
+            configuration.
+
+        Returns
+        -------
+        None
+        """
+        if self.periodicity != 3:
+            raise RuntimeError('Supercells are only defined for 3-D systems.')
+        counts = numpy.array([na, nb, nc], dtype=numpy.int64)
+        if numpy.any(counts < 1):
+            raise ValueError(
+                f'The number of copies must be positive: {na}, {nb}, {nc}'
+            )
+        if configuration is None:
+            configuration = self.current_configuration
+
+        n_images = int(counts.prod())
+        if n_images == 1:
+            return
+
+        # The atoms and bonds of this configuration are in the subset and
+        # template for 'all', which other configurations may share.
+        sid, tid = self._configurations[configuration]
+        for other, (other_sid, other_tid) in self._configurations.items():
+            shared = sid == other_sid or tid == other_tid
+            if other != configuration and shared:
+                raise RuntimeError(
+                    f'Configuration {configuration} shares its atoms or bonds '
+                    f'with configuration {other}, so cannot be made into a '
+                    'supercell.'
+                )
+
+        atoms = self['atom']
+        bonds = self['bond']
+        cells = self['cell']
+        fractional = self.coordinate_system == 'fractional'
+        cell = cells.cell(configuration)
+
+        # The atoms, their coordinates and everything else about them, in
+        # order of their ids.
+        atom_keys = [x for x in atoms._atom_table.attributes if x != 'id']
+        coordinate_keys = [
+            x for x in atoms._coordinates_table.attributes
+            if x not in ('id', 'atom', 'configuration', 'x', 'y', 'z')
+        ]
+        columns = ['at.id', 'co.x', 'co.y', 'co.z']
+        columns += [f'at."{x}"' for x in atom_keys]
+        columns += [f'co."{x}"' for x in coordinate_keys]
+        rows = self.db.execute(
+            f"SELECT {', '.join(columns)}"
+            "  FROM subset_atom AS sa"
+            f" CROSS JOIN {atoms._atom_tablename} AS at"
+            f" CROSS JOIN {atoms._coordinates_tablename} AS co"
+            " WHERE sa.subset = ? AND at.id = sa.atom"
+            "   AND co.atom = at.id AND co.configuration = ?"
+            " ORDER BY at.id", (sid, configuration)
+        ).fetchall()
+        values = [*zip(*rows)] if len(rows) > 0 else [()] * len(columns)
+        ids = numpy.array(values[0], dtype=numpy.int64)
+        n_atoms = ids.size
+        uvw = numpy.array([*zip(*values[1:4])], dtype=float).reshape(-1, 3)
+        if not fractional:
+            uvw = cell.to_fractionals(uvw, as_array=True)
+        others = {
+            key: [*column]
+            for key, column in zip(atom_keys + coordinate_keys, values[4:])
+        }
+
+        # The bonds, and which image of j is bonded to i
+        i = []
+        j = []
+        bond_data = {}
+        for row in bonds.bonds(configuration=configuration):
+            i.append(row['i'])
+            j.append(row['j'])
+            for key in row.keys():
+                if key not in ('id', 'i', 'j'):
+                    bond_data.setdefault(key, []).append(row[key])
+        i = numpy.searchsorted(ids, i)
+        j = numpy.searchsorted(ids, j)
+        shifts = numpy.rint(uvw[j] - uvw[i]).astype(numpy.int64)
+
+        # The offsets of the images, in cells, starting with the original.
+        offsets = numpy.indices(counts).reshape(3, -1).T
+        new_uvw = (uvw + offsets[:, numpy.newaxis, :]) / counts
+
+        # The new cell, which is used for the coordinates
+        cell_id, _ = cells.cell_id(configuration)
+        n = self.db.execute(
+            "SELECT COUNT(*) FROM configuration WHERE cell = ?", (cell_id,)
+        ).fetchone()[0]
+        if n > 1:
+            # Shared with other configurations, so set_cell makes a new one
+            self.db.execute(
+                "UPDATE configuration SET cell = NULL WHERE id = ?",
+                (configuration,)
+            )
+            self.mark_changed('configuration')
+        cells.set_cell(
+            cell.a * na,
+            cell.b * nb,
+            cell.c * nc,
+            cell.alpha,
+            cell.beta,
+            cell.gamma,
+            configuration=configuration
+        )
+        if n_atoms == 0:
+            return
+        if not fractional:
+            new_uvw = cells.cell(configuration).to_cartesians(
+                new_uvw.reshape(-1, 3), as_array=True
+            ).reshape(n_images, n_atoms, 3)
+
+        # Move the original atoms, then add the rest in one go.
+        atoms.set_coordinates(
+            new_uvw[0], configuration=configuration, fractionals=fractional
+        )
+        xyz = new_uvw[1:].reshape(-1, 3)
+        data = {key: values * (n_images - 1) for key, values in others.items()}
+        new_ids = atoms.append(
+            configuration=configuration,
+            x=xyz[:, 0].tolist(),
+            y=xyz[:, 1].tolist(),
+            z=xyz[:, 2].tolist(),
+            **data
+        )
+        image_ids = numpy.concatenate((ids, new_ids))
+        image_ids = image_ids.reshape(n_images, n_atoms)
+
+        # The bonds. Atom i in an image is bonded to j in the image offset by
+        # the shift, wrapped around the supercell.
+        if len(i) > 0:
+            bonds.remove(configuration=configuration)
+            partner = (offsets[:, numpy.newaxis, :] - shifts) % counts
+            partner = numpy.ravel_multi_index(partner.reshape(-1, 3).T, counts)
+            partner = partner.reshape(n_images, -1)
+            data = {
+                key: values * n_images for key, values in bond_data.items()
+            }
+            bonds.append(
+                configuration=configuration,
+                i=image_ids[:, i].ravel().tolist(),
+                j=image_ids[partner, j].ravel().tolist(),
+                **data
+            )
+
+        # And the subsets other than 'all'
+        all_subset = self.all_subset(configuration)
+        rows = self.db.execute(
+            "SELECT sa.subset, s.template, sa.atom, sa.templateatom"
+            "  FROM subset_atom AS sa, subset AS s, configuration_subset AS cs"
+            " WHERE s.id = sa.subset AND cs.subset = s.id"
+            "   AND cs.configuration = ? AND s.id != ?"
+            " ORDER BY sa.subset, sa.rowid", (configuration, all_subset)
+        ).fetchall()
+        if len(rows) > 0:
+            subsets, templates, members, templateatoms = zip(*rows)
+            subsets = numpy.array(subsets, dtype=numpy.int64)
+            old_sids, first = numpy.unique(subsets, return_index=True)
+            positions = numpy.searchsorted(old_sids, subsets)
+            members = numpy.searchsorted(ids, members)
+
+            sids = numpy.array(
+                self['subset'].append(
+                    configuration=configuration,
+                    template=[templates[x] for x in first] * (n_images - 1)
+                ),
+                dtype=numpy.int64
+            ).reshape(n_images - 1, -1)
+            self['subset_atom'].append(
+                subset=sids[:, positions].ravel().tolist(),
+                atom=image_ids[1:, members].ravel().tolist(),
+                templateatom=list(templateatoms) * (n_images - 1)
+            )
+
+    def mark_schema_changed(self):
+        """Note that tables or their attributes have been added or removed.
+
+        Returns
+        -------
+        None
+        """
+        self._fk_dependents = None
+        self._table_attributes.clear()
+
+    def mark_changed(self, *tables, cascade=False):
+        """Note that the contents of tables have changed.
+
+        Parameters
+        ----------
+        tables : str
+            The names of the tables. If none are given, all tables are
+            considered to have changed.
+        cascade : bool = False
+            Whether to also mark the tables that refer to these through
+            foreign keys, for example when rows are deleted.
+
+        Returns
+        -------
+        None
+        """
+        if len(tables) == 0:
+            self._change_epoch += 1
+            return
+
+        todo = [x.strip('"') for x in tables]
+        done = set()
+        while len(todo) > 0:
+            table = todo.pop()
+            if table in done:
+                continue
+            done.add(table)
+            self._changes[table] = self._changes.get(table, 0) + 1
+            if cascade:
+                todo.extend(self._foreign_key_dependents().get(table, ()))
+
     def n_atoms(self, subset=None, configuration=None) -> int:
         """The number of atoms in a subset or configuration
 
@@ -762,19 +1182,63 @@ class _System(
         """
         return self.bonds.n_bonds(subset=subset, configuration=configuration)
 
+    def save(self, path, pages=None, progress=None):
+        """Save the system to a database file.
+
+        The database is copied with SQLite's backup API a number of pages at
+        a time, so a system in memory can be written to disk when needed. Any
+        existing file is overwritten.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The filename of the database.
+        pages : int = None
+            The number of pages to copy at a time, or -1 for all at once.
+            Defaults to molsystem.system.backup_pages.
+        progress : function = None
+            Called after each step as progress(status, remaining, total),
+            with the number of pages remaining and in total.
+
+        Returns
+        -------
+        None
+        """
+        if pages is None:
+            pages = backup_pages
+
+        self.db.commit()
+        target = sqlite3.connect(Path(path).expanduser().resolve())
+        try:
+            self.db.backup(target, pages=pages, progress=progress)
+        finally:
+            target.close()
+
     def to_atnos(self, symbols):
         """Convert element symbols to atomic numbers.
 
         Parameters
         ----------
-        symbols : [str]
+        symbols : [str] or numpy.ndarray
             The atomic symbols
 
         Returns
         -------
-        atnos : [int]
-            The corresponding atomic numbers (1..118)
+        atnos : [int] or numpy.ndarray
+            The corresponding atomic numbers (1..118), as an array of integers
+            if the symbols are an array.
         """
+        if isinstance(symbols, numpy.ndarray):
+            symbols = numpy.asarray(symbols, dtype=str)
+            atnos = atno_by_key[symbol_keys(symbols)]
+            bad = atnos == 0
+            if symbols.dtype.itemsize > 8:
+                # Longer strings would be truncated to two characters.
+                bad |= numpy.char.str_len(symbols).reshape(-1) > 2
+            if numpy.any(bad):
+                unknown = numpy.unique(symbols.reshape(-1)[bad])
+                raise KeyError(f'Unknown element symbols {unknown}')
+            return atnos.reshape(symbols.shape)
         return [self._symbol_to_atno[x] for x in symbols]
 
     def to_symbols(self, atnos):
@@ -782,14 +1246,17 @@ class _System(
 
         Parameters
         ----------
-        atnos : [int]
+        atnos : [int] or numpy.ndarray
             The atomic numbers (1..118)
 
         Returns
         -------
-        symbols : [str]
-            The corresponding atomic symbols
+        symbols : [str] or numpy.ndarray
+            The corresponding atomic symbols, as an array of strings if the
+            atomic numbers are an array.
         """
+        if isinstance(atnos, numpy.ndarray):
+            return atomic_symbols[self._check_atnos(atnos)]
         return [self._atno_to_symbol[x] for x in atnos]
 
     def default_masses(self, symbols=None, atnos=None):
@@ -797,23 +1264,47 @@ class _System(
 
         Parameters
         ----------
-        symbols : [str] = None
+        symbols : [str] or numpy.ndarray = None
             The atomic symbols
-        atnos : [int] = None
+        atnos : [int] or numpy.ndarray = None
             The atomic numbers (1..118)
 
         Returns
         -------
-        masses : [float]
-            The default atomic masses
+        masses : [float] or numpy.ndarray
+            The default atomic masses, as an array if the symbols or atomic
+            numbers are an array.
         """
         if symbols is not None:
+            if isinstance(symbols, numpy.ndarray):
+                return atomic_masses[self.to_atnos(symbols)]
             return [self._symbol_to_mass[x] for x in symbols]
         if atnos is not None:
+            if isinstance(atnos, numpy.ndarray):
+                return atomic_masses[self._check_atnos(atnos)]
             return [self._atno_to_mass[x] for x in atnos]
         else:
             # return all the masses, in order
-            return [self._atno_to_mass[x] for x in range(1, 118)]
+            return atomic_masses[1:].tolist()
+
+    def _check_atnos(self, atnos):
+        """Check that an array of atomic numbers are all valid.
+
+        Parameters
+        ----------
+        atnos : numpy.ndarray
+            The atomic numbers.
+
+        Returns
+        -------
+        numpy.ndarray
+            The atomic numbers.
+        """
+        bad = (atnos < 1) | (atnos >= len(atomic_symbols))
+        if numpy.any(bad):
+            unknown = numpy.unique(atnos[bad])
+            raise KeyError(f'Unknown atomic numbers {unknown}')
+        return atnos
 
     def mass(self, subset=None, configuration=None):
         """Return the total atomic masses for the subset or configuration
@@ -832,10 +1323,15 @@ class _System(
         float
             The summed atomic masses.
         """
-        masses = self.atoms.atomic_masses(
+        if 'mass' in self.atoms:
+            masses = self.atoms.atomic_masses(
+                subset=subset, configuration=configuration
+            )
+            return sum(masses)
+        composition = self._composition(
             subset=subset, configuration=configuration
         )
-        return sum(masses)
+        return float(composition[1:] @ atomic_masses[1:])
 
     def volume(self, configuration=None):
         """Return the volume of a configuration
@@ -856,6 +1352,50 @@ class _System(
 
         return self.cell.cell(configuration=configuration).volume
 
+    def _composition(self, subset=None, configuration=None):
+        """The number of atoms of each element in a subset or configuration.
+
+        The counts are cached until the atoms change.
+
+        Parameters
+        ----------
+        subset : int = None
+            Get the atoms for the subset. Defaults to the 'all/all' subset
+            for the configuration given.
+        configuration : int = None
+            The configuration of interest. Defaults to the current
+            configuration. Not used if the subset is given.
+
+        Returns
+        -------
+        numpy.ndarray
+            The number of atoms of each element, indexed by atomic number.
+            This is the cached array, so it should not be changed.
+        """
+        if subset is None:
+            subset = self.all_subset(configuration)
+
+        count = self.change_count('atom', 'subset_atom')
+        if subset in self._compositions:
+            composition, last_count = self._compositions[subset]
+            if last_count == count:
+                return composition
+
+        cursor = self.db.cursor()
+        cursor.row_factory = None
+        cursor.execute(
+            "SELECT at.atno FROM subset_atom AS sa CROSS JOIN atom AS at"
+            " WHERE sa.subset = ? AND at.id = sa.atom", (subset,)
+        )
+        atnos = numpy.fromiter(
+            itertools.chain.from_iterable(cursor), dtype=numpy.int64
+        )
+        composition = numpy.bincount(
+            self._check_atnos(atnos), minlength=len(atomic_symbols)
+        )
+        self._compositions[subset] = (composition, count)
+        return composition
+
     def density(self, configuration=None):
         """Return the density of the system.
 
@@ -880,6 +1420,191 @@ class _System(
         # converting from g/mol / Å^3 to g/cm^3
         return (mass / volume) * (1.0e+24 / 6.02214076E+23)
 
+    def _connect(self, path):
+        """Open the connection to the database.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The filename or URI of the database.
+
+        Returns
+        -------
+        None
+        """
+        self._db = sqlite3.connect(
+            path,
+            cached_statements=self._cached_statements,
+            factory=_Connection,
+            uri=True
+        )
+        self._data_version_checked = None
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA foreign_keys = ON')
+        if isinstance(self._profile, str):
+            pragmas = profiles[self._profile]
+        else:
+            pragmas = self._profile
+        for pragma, value in pragmas.items():
+            self._db.execute(f'PRAGMA {pragma} = {value}')
+        self._cursor = self._db.cursor()
+
+    def _copy_from(self, db, pages=None, progress=None):
+        """Replace the database with a copy of another, and reload.
+
+        Parameters
+        ----------
+        db : sqlite3.Connection
+            The connection to the database to copy.
+        pages : int = None
+            The number of pages to copy at a time, or -1 for all at once.
+            Defaults to molsystem.system.backup_pages.
+        progress : function = None
+            Called after each step as progress(status, remaining, total).
+
+        Returns
+        -------
+        None
+        """
+        if pages is None:
+            pages = backup_pages
+
+        db.commit()
+        self.db.commit()
+        db.backup(self.db, pages=pages, progress=progress)
+
+        # Everything may have changed, so start afresh.
+        self._items = {}
+        self._configurations = {}
+        self.mark_schema_changed()
+        self.mark_changed()
+        self._initialize()
+
+    def _foreign_key_dependents(self):
+        """The tables that refer to each table through foreign keys."""
+        if self._fk_dependents is None:
+            self._fk_dependents = {}
+            for table in self.list():
+                for row in self.db.execute(
+                    f"PRAGMA foreign_key_list('{table}')"
+                ):
+                    if row['table'] not in self._fk_dependents:
+                        self._fk_dependents[row['table']] = set()
+                    self._fk_dependents[row['table']].add(table)
+        return self._fk_dependents
+
+    def _get_scalar(self, column):
+        """A value from the system table, cached until it may have changed.
+
+        The cache is reloaded if the system table has been changed through
+        this object, or if another connection has changed the database,
+        which SQLite signals by changing PRAGMA data_version.
+
+        Parameters
+        ----------
+        column : str
+            The column, 'name', 'periodicity', 'coordinatesystem' or
+            'version'
+
+        Returns
+        -------
+        Any
+            The value.
+        """
+        if not self._scalars_valid():
+            sql = 'PRAGMA data_version'
+            self._data_version = self.db.execute(sql).fetchone()[0]
+            row = self.db.execute(
+                "SELECT name, periodicity, coordinatesystem, version"
+                "  FROM system WHERE id = ?", (self._id,)
+            ).fetchone()
+            if row is None:
+                self._scalars = dict.fromkeys(
+                    ('name', 'periodicity', 'coordinatesystem', 'version')
+                )
+            else:
+                self._scalars = dict(zip(row.keys(), row))
+            self._scalars_count = self.change_count('system')
+        return self._scalars[column]
+
+    def _new_system(self, title, n):
+        """Create a system for a structure in a file, with a unique name.
+
+        Parameters
+        ----------
+        title : str
+            The title or name of the structure, used as the name if it is
+            free.
+        n : int
+            The number of the structure in the file, to make names unique.
+
+        Returns
+        -------
+        _System
+            The new, empty system.
+        """
+        systems = self.parent
+        name = title
+        if name == '' or name in systems:
+            name = f'{title if title else "molecule"} {n}'
+            count = 1
+            while name in systems:
+                count += 1
+                name = f'{title if title else "molecule"} {n}.{count}'
+        temporary = systems._systems[self.nickname]['temporary']
+        system = systems.create_system(name, temporary=temporary)
+        system.name = title
+        return system
+
+    def _scalars_valid(self):
+        """Whether the cached values from the system table are current."""
+        if (
+            self._scalars is None or
+            self._scalars_count != self.change_count('system')
+        ):
+            return False
+
+        # While this connection has a write transaction open no other
+        # connection can commit changes, so checking once in a transaction
+        # is enough. The connection counts the transactions it ends, which
+        # identifies the current one. Outside of a transaction SQLite has to
+        # lock and check the file for any query, so there is nothing to save.
+        if self.db.in_transaction:
+            if self._data_version_checked == self.db.transactions:
+                return True
+            self._data_version_checked = self.db.transactions
+        else:
+            self._data_version_checked = None
+        data_version = self.db.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            return False
+        return True
+
+    def _set_scalar(self, column, value):
+        """Set a value in the system table, updating the cache.
+
+        Parameters
+        ----------
+        column : str
+            The column, 'name', 'periodicity', 'coordinatesystem' or
+            'version'
+        value : Any
+            The new value.
+
+        Returns
+        -------
+        None
+        """
+        valid = self._scalars_valid()
+        self.db.execute(
+            f"UPDATE system SET {column} = ? WHERE id = ?", (value, self._id)
+        )
+        self.mark_changed('system')
+        if valid:
+            self._scalars[column] = value
+            self._scalars_count = self.change_count('system')
+
     def _initialize(self):
         """Initialize the SQLite database."""
         if 'element' not in self:
@@ -899,12 +1624,15 @@ class _System(
         if 'configuration' not in self:
             self._initialize_configurations()
         else:
-            # Get all the configurations from the database
+            # Get all the configurations from the database. Older versions
+            # also linked the 'all' subsets of new configurations to the
+            # current one, so the first link of each configuration is used.
             for row in self.db.execute(
                 "SELECT configuration, subset, template FROM "
                 "       configuration_subset, subset, template"
-                " WHERE template.name = 'all' AND template.type = 'all'"
+                " WHERE template.type = 'all' AND configuration IS NOT NULL"
                 "   AND template.id = template AND subset.id = subset"
+                " ORDER BY configuration_subset.rowid DESC"
             ):
                 config = row['configuration']
                 self._configurations[config] = (row['subset'], row['template'])
@@ -914,9 +1642,25 @@ class _System(
         if 'subset' not in self:
             self._initialize_subsets()
 
+        if 'templategraph' not in self:
+            self._initialize_template_graphs()
+
+        self._create_indexes()
+
         # If needed, set up the first configuration, and the 'all' subset
         if self.n_configurations == 0:
             self.current_configuration = self.add_configuration()
+        elif self._current_configuration not in self._configurations:
+            self._current_configuration = min(self._configurations)
+
+    def _create_indexes(self):
+        """Create any missing indexes, including in files made without them.
+        """
+        for name, table, columns in _indexes:
+            self.db.execute(
+                f'CREATE INDEX IF NOT EXISTS "{name}" ON {table} ({columns})'
+            )
+        self.db.commit()
 
     def _initialize_system(self):
         """Set up the table for the system."""
@@ -978,16 +1722,11 @@ class _System(
         table.add_attribute('symbol', coltype='str', index='unique')
         table.add_attribute('mass', coltype='float')
 
-        for symbol, data in element_data.items():
-            table.append(
-                symbol=symbol,
-                atno=data['atomic number'],
-                mass=data['atomic weight']
-            )
-            self._symbol_to_atno[symbol] = data['atomic number']
-            self._atno_to_symbol[data['atomic number']] = symbol
-            self._symbol_to_mass[symbol] = data['atomic weight']
-            self._atno_to_mass[data['atomic number']] = data['atomic weight']
+        table.append(
+            atno=[*range(1, len(atomic_symbols))],
+            symbol=atomic_symbols[1:].tolist(),
+            mass=atomic_masses[1:].tolist()
+        )
         self.db.commit()
 
     def _initialize_configurations(self):
@@ -1055,6 +1794,14 @@ class _System(
             'templateatom', coltype='int', references='templateatom'
         )
 
+    def _initialize_template_graphs(self):
+        """Set up the cache of molecule templates by the hash of their graph.
+        """
+        table = self['templategraph']
+        table.add_attribute('hash', coltype='str', pk=True)
+        table.add_attribute('smiles', coltype='str')
+        table.add_attribute('template', coltype='int', references='template')
+
     def _initialize_symmetry(self):
         """Set up the tables for symmetry."""
         table = self['symmetry']
@@ -9,6 +9,7 @@ from pathlib import Path
 import shutil
 import sqlite3
 import tempfile
+import uuid
 
 import pathvalidate
 
@@ -17,6 +18,11 @@ from molsystem.system import _System
 logger = logging.getLogger(__name__)
 
 
+def _memory_uri():
+    """A URI for a new database in memory, shared by connections to it."""
+    return f'file:molsystem-{uuid.uuid4().hex}?mode=memory&cache=shared'
+
+
 class Systems(collections.abc.MutableMapping):
 
     def __init__(self):
@@ -76,45 +82,109 @@ class Systems(collections.abc.MutableMapping):
         """Return a list of the systems."""
         return [*self._systems]
 
-    def create_system(self, name, filename=None, temporary=False, force=False):
-        """Create a system with a given name, and optionally a filename."""
+    def create_system(
+        self,
+        name,
+        filename=None,
+        temporary=False,
+        force=False,
+        cached_statements=None,
+        profile=None,
+        memory=False
+    ):
+        """Create a system with a given name, and optionally a filename.
+
+        Parameters
+        ----------
+        name : str
+            The name of the system.
+        filename : str = None
+            The filename for the database. Defaults to the name.
+        temporary : bool = False
+            Whether to put the database in a temporary directory.
+        force : bool = False
+            Whether to overwrite an existing file.
+        cached_statements : int = None
+            The number of prepared SQL statements to cache. Defaults to
+            molsystem.system.default_cached_statements.
+        profile : str or dict = None
+            The name of the profile of SQLite pragmas in
+            molsystem.system.profiles, e.g. 'fast', or a dict of pragmas.
+            Defaults to molsystem.system.default_profile.
+        memory : bool = False
+            Whether to keep the database in memory, so that it never touches
+            the disk unless saved with save(). The filename and temporary
+            are not used.
+
+        Returns
+        -------
+        _System
+            The new system.
+        """
         if name in self:
             raise KeyError(f"System '{name}' already exists.")
 
-        self._systems[name] = data = {}
-        data['temporary'] = temporary
+        data = {}
+        data['temporary'] = temporary and not memory
 
-        if temporary:
-            tmp = pathvalidate.sanitize_filename(name + '.db', platform='auto')
-            data['tempdir'] = Path(tempfile.mkdtemp())
-            path = data['tempdir'] / tmp
-        elif filename is None:
-            tmp = pathvalidate.sanitize_filename(name + '.db', platform='auto')
-            path = Path(tmp)
+        if memory:
+            path = None
+            filename = _memory_uri()
         else:
-            tmp = pathvalidate.sanitize_filename(filename, platform='auto')
-            path = Path(tmp)
-
-        path = path.expanduser().resolve()
-        if path.exists():
-            if force:
-                path.unlink()
+            if temporary:
+                tmp = pathvalidate.sanitize_filename(
+                    name + '.db', platform='auto'
+                )
+                data['tempdir'] = Path(tempfile.mkdtemp())
+                path = data['tempdir'] / tmp
+            elif filename is None:
+                tmp = pathvalidate.sanitize_filename(
+                    name + '.db', platform='auto'
+                )
+                path = Path(tmp)
             else:
-                raise RuntimeError(f"File '{path}' exists!")
+                tmp = pathvalidate.sanitize_filename(filename, platform='auto')
+                path = Path(tmp)
 
-        filename = str(path)
-        system = _System(self, nickname=name, filename=filename)
+            path = path.expanduser().resolve()
+            if path.exists():
+                if force:
+                    path.unlink()
+                else:
+                    raise RuntimeError(f"File '{path}' exists!")
+
+            filename = str(path)
+        system = _System(
+            self,
+            nickname=name,
+            filename=filename,
+            cached_statements=cached_statements,
+            profile=profile
+        )
 
         data['system'] = system
         data['path'] = path
+        self._systems[name] = data
 
         return system
 
     def copy_system(
-        self, other, name=None, filename=None, temporary=False, force=False
+        self,
+        other,
+        name=None,
+        filename=None,
+        temporary=False,
+        force=False,
+        cached_statements=None,
+        profile=None,
+        memory=False
     ):
         """Create a copy of a system, optionally with a given name and
-        filename."""
+        filename.
+
+        The arguments are as for create_system(). With memory=True the copy
+        is made in memory.
+        """
 
         if name is None:
             tmp_name = other.name
@@ -126,8 +196,24 @@ class Systems(collections.abc.MutableMapping):
         elif name in self:
             raise KeyError(f"System '{name}' already exists.")
 
-        self._systems[name] = data = {}
-        data['temporary'] = temporary
+        data = {}
+        data['temporary'] = temporary and not memory
+
+        if memory:
+            system = _System(
+                self,
+                nickname=name,
+                filename=_memory_uri(),
+                cached_statements=cached_statements,
+                profile=profile
+            )
+            system._copy_from(other.db)
+
+            data['system'] = system
+            data['path'] = None
+            self._systems[name] = data
+
+            return system
 
         if temporary:
             tmp = pathvalidate.sanitize_filename(name + '.db', platform='auto')
@@ -155,15 +241,51 @@ class Systems(collections.abc.MutableMapping):
         db.close()
 
         # and open it
-        system = _System(self, nickname=name, filename=filename)
+        system = _System(
+            self,
+            nickname=name,
+            filename=filename,
+            cached_statements=cached_statements,
+            profile=profile
+        )
 
         data['system'] = system
         data['path'] = path
+        self._systems[name] = data
 
         return system
 
-    def open_system(self, filename, name=None, temporary=False):
-        """Open an existing system with a given name."""
+    def open_system(
+        self,
+        filename,
+        name=None,
+        temporary=False,
+        cached_statements=None,
+        profile=None
+    ):
+        """Open an existing system with a given name.
+
+        Parameters
+        ----------
+        filename : str
+            The filename of the database.
+        name : str = None
+            The name of the system. Defaults to the stem of the filename.
+        temporary : bool = False
+            Whether the system is temporary.
+        cached_statements : int = None
+            The number of prepared SQL statements to cache. Defaults to
+            molsystem.system.default_cached_statements.
+        profile : str or dict = None
+            The name of the profile of SQLite pragmas in
+            molsystem.system.profiles, e.g. 'fast', or a dict of pragmas.
+            Defaults to molsystem.system.default_profile.
+
+        Returns
+        -------
+        _System
+            The system.
+        """
         path = Path(filename)
         if name is None:
             name = path.with_suffix('').name
@@ -175,30 +297,39 @@ class Systems(collections.abc.MutableMapping):
         if not path.exists():
             raise RuntimeError(f"File '{path}' does not exist!")
 
-        self._systems[name] = data = {}
+        data = {}
         data['temporary'] = temporary
 
         filename = str(path)
 
         # and open it
-        system = _System(self, nickname=name, filename=filename)
+        system = _System(
+            self,
+            nickname=name,
+            filename=filename,
+            cached_statements=cached_statements,
+            profile=profile
+        )
 
         data['system'] = system
         data['path'] = path
+        self._systems[name] = data
 
         return system
 
     def overwrite(self, system, other):
         """Overwrite a system with the contents of another."""
+        if system.in_memory:
+            system._copy_from(other.db)
+            return
 
         system.db.commit()
         system.cursor.close()
         system.db.close()
         path = self._systems[system.nickname]['path']
         path.unlink()
-        system._db = sqlite3.connect(path)
-        system._db.row_factory = sqlite3.Row
-        system._db.execute('PRAGMA foreign_keys = ON')
-        system._cursor = system._db.cursor()
+        system._connect(path)
         other.db.commit()
         other.db.backup(system._db)
+        system.mark_schema_changed()
+        system.mark_changed()
@@ -3,7 +3,6 @@
 import collections.abc
 from itertools import zip_longest
 import logging
-import pandas
 from typing import Any, Dict
 
 from molsystem.column import _Column as Column
@@ -89,6 +88,8 @@ class _Table(collections.abc.MutableMapping):
         with self.db:
             self.db.executescript(sql)
         self.db.commit()
+        self.system.mark_schema_changed()
+        self.system.mark_changed(self._table, cascade=True)
 
     def __iter__(self) -> iter:
         """Allow iteration over the object"""
@@ -207,6 +208,11 @@ class _Table(collections.abc.MutableMapping):
     @property
     def attributes(self) -> Dict[str, Any]:
         """The definitions of the attributes."""
+        # The definitions are cached by the system until the schema changes
+        cache = self.system._table_attributes
+        if self._table in cache:
+            return {k: {**v} for k, v in cache[self._table].items()}
+
         result = {}
         for row in self.db.execute(
             "   SELECT *"
@@ -225,7 +231,8 @@ class _Table(collections.abc.MutableMapping):
             else:
                 result[row['from']]['fk'] = f"{row['table']}.{row['to']}"
 
-        return result
+        cache[self._table] = result
+        return {k: {**v} for k, v in result.items()}
 
     @property
     def version(self):
@@ -352,6 +359,8 @@ class _Table(collections.abc.MutableMapping):
                 f"CREATE INDEX idx_{name} ON {self.table} ('{name}')"
             )
 
+        self.system.mark_schema_changed()
+
         if values is not None:
             self[name] = values
 
@@ -421,12 +430,7 @@ class _Table(collections.abc.MutableMapping):
             else:
                 values[key] = value
 
-        parameters = []
-        for row in range(n_rows):
-            line = []
-            for key, value in values.items():
-                line.append(value[row])
-            parameters.append(line)
+        parameters = zip(*values.values())
 
         columns = '"' + '", "'.join(kwargs.keys()) + '"'
         places = ', '.join(['?'] * len(values.keys()))
@@ -436,13 +440,15 @@ class _Table(collections.abc.MutableMapping):
             parameters
         )
 
-        self.db.commit()
+        self.system.commit()
+        self.system.mark_changed(self._table)
 
         if 'id' in kwargs:
             return kwargs['id']
 
     def remove(self, *args):
         """Remove rows matching the selection."""
+        self.system.mark_changed(self._table, cascade=True)
         if len(args) == 0:
             return self.db.execute(f'DELETE FROM {self.table}')
 
@@ -527,6 +533,8 @@ class _Table(collections.abc.MutableMapping):
             f'CREATE TABLE {table} AS SELECT * FROM {other_table}'
         )
         self.db.commit()
+        self.system.mark_schema_changed()
+        self.system.mark_changed(self._table)
 
         # Detach the other database if needed
         if detach:
@@ -556,6 +564,8 @@ class _Table(collections.abc.MutableMapping):
 
     def to_dataframe(self):
         """Return the contents of the table as a Pandas Dataframe."""
+        import pandas
+
         data = {}
         for line in self.cursor.execute(f'SELECT rowid, * FROM {self.table}'):
             data[line[0]] = line[1:]
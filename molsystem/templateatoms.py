@@ -7,6 +7,8 @@ from itertools import zip_longest
 import logging
 from typing import Any, Dict, TypeVar
 
+import numpy
+
 from molsystem.atoms import _Atoms as Atoms
 from molsystem.column import _Column as Column
 from molsystem.table import _Table as Table
@@ -50,16 +52,25 @@ class _Templateatoms(Atoms):
     def __getitem__(self, key) -> Any:
         """Allow [] to access the data!"""
         if key in self._atom_table.attributes:
-            sql = f'WHERE template = {self.current_template}'
-            return Column(self._atom_table, key, where=sql)
+            return Column(
+                self._atom_table,
+                key,
+                where='WHERE template = ?',
+                parameters=(self.current_template,)
+            )
         elif key in self._coordinates_table.attributes:
             where = (
                 "WHERE templateatom in ("
                 f"     SELECT id FROM {self._atom_tablename}"
-                f"      WHERE template = {self.current_template}"
+                "      WHERE template = ?"
                 ")"
             )
-            return Column(self._coordinates_table, key, where=where)
+            return Column(
+                self._coordinates_table,
+                key,
+                where=where,
+                parameters=(self.current_template,)
+            )
         else:
             raise KeyError(f"'{key}' not in template atoms")
 
@@ -120,7 +131,10 @@ class _Templateatoms(Atoms):
 
         if 'symbol' in kwargs:
             symbols = kwargs.pop('symbol')
-            kwargs['atno'] = self.to_atnos(symbols)
+            atnos = self.to_atnos(symbols)
+            if isinstance(atnos, numpy.ndarray):
+                atnos = atnos.tolist()
+            kwargs['atno'] = atnos
 
         # How many new rows there are
         n_rows, lengths = self._get_n_rows(**kwargs)
@@ -274,3 +288,4 @@ class _Templateatoms(Atoms):
 
         self.db.execute(sql, parameters)
         self.db.commit()
+        self.system.mark_changed(self._atom_tablename, cascade=True)
@@ -3,6 +3,8 @@
 import logging
 from typing import Any, Dict, TypeVar
 
+import numpy
+
 from molsystem.table import _Table as Table
 """A dictionary-like object for holding bonds
 
@@ -91,27 +93,32 @@ class _Templatebonds(Table):
             j = [j[0]] * n_rows
 
         # The list of atom ids in this template, so that we can check the atoms
-        ids = self._templateatoms.atom_ids(template=template)
-
-        i2 = []
-        j2 = []
-        for i_, j_ in zip(i, j):
-            if not isinstance(i_, int) or not isinstance(j_, int):
-                raise TypeError(
-                    f"'i={i_}' and 'j={j_}', the atom indices, must be "
-                    "integers"
-                )
-            if i_ not in ids:
-                raise ValueError(f'Atom i ({i_}) is not in the template.')
-            if j_ not in ids:
-                raise ValueError(f'Atom j ({j_}) is not in the template.')
-            # Ensure that i < j
-            if i_ < j_:
-                i2.append(i_)
-                j2.append(j_)
-            else:
-                i2.append(j_)
-                j2.append(i_)
+        ids = numpy.array(
+            self._templateatoms.atom_ids(template=template), dtype=numpy.int64
+        )
+
+        i = numpy.asarray(i)
+        j = numpy.asarray(j)
+        if not (
+            numpy.issubdtype(i.dtype, numpy.integer) and
+            numpy.issubdtype(j.dtype, numpy.integer)
+        ):
+            for i_, j_ in zip(i.tolist(), j.tolist()):
+                if not isinstance(i_, int) or not isinstance(j_, int):
+                    raise TypeError(
+                        f"'i={i_}' and 'j={j_}', the atom indices, must be "
+                        "integers"
+                    )
+        bad = ~numpy.isin(i, ids)
+        if numpy.any(bad):
+            raise ValueError(f'Atom i ({i[bad][0]}) is not in the template.')
+        bad = ~numpy.isin(j, ids)
+        if numpy.any(bad):
+            raise ValueError(f'Atom j ({j[bad][0]}) is not in the template.')
+
+        # Ensure that i < j
+        i2 = numpy.minimum(i, j).tolist()
+        j2 = numpy.maximum(i, j).tolist()
 
         super().append(i=i2, j=j2, **kwargs)
 
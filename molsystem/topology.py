@@ -2,13 +2,59 @@
 
 """Topological methods for the system"""
 
+import hashlib
 import logging
 
-from openbabel import openbabel
+from molsystem.smiles import _conversion, _graph
 
 logger = logging.getLogger(__name__)
 
 
+def _graph_hash(atnos, bonds):
+    """A hash of a molecular graph that does not depend on the atom order.
+
+    The hash combines the elements, the multiset of bonds by element and
+    bond order, and the labels from refining the atoms by their neighbors
+    until the number of distinct labels stops growing.
+
+    Parameters
+    ----------
+    atnos : [int]
+        The atomic numbers of the atoms.
+    bonds : [(int, int, int)]
+        The bonds as (i, j, order) with 0-based indices i and j.
+
+    Returns
+    -------
+    str
+        The hexadecimal hash.
+    """
+    neighbors = [[] for i in atnos]
+    bond_multiset = []
+    for i, j, order in bonds:
+        neighbors[i].append((j, order))
+        neighbors[j].append((i, order))
+        bond_multiset.append((*sorted((atnos[i], atnos[j])), order))
+
+    labels = [str(atno) for atno in atnos]
+    n_labels = len(set(labels))
+    for iteration in range(len(atnos)):
+        new_labels = []
+        for label, partners in zip(labels, neighbors):
+            text = label + ':' + ','.join(
+                sorted(f'{order}{labels[j]}' for j, order in partners)
+            )
+            new_labels.append(hashlib.sha1(text.encode()).hexdigest()[:16])
+        labels = new_labels
+        n = len(set(labels))
+        if n == n_labels:
+            break
+        n_labels = n
+
+    text = f'{sorted(atnos)}|{sorted(bond_multiset)}|{sorted(labels)}'
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
 class TopologyMixin:
     """A mixin for handling topology."""
 
@@ -43,10 +89,11 @@ class TopologyMixin:
         to_index = {j: i for i, j in enumerate(atom_ids)}
         neighbors = self.bonded_neighbors(configuration)
         visited = [False] * n_atoms
+        index = 0
         while True:
             # Find first atom not yet visited
             try:
-                index = visited.index(False)
+                index = visited.index(False, index)
             except ValueError:
                 break
             visited[index] = True
@@ -208,76 +255,184 @@ class TopologyMixin:
             molecule = atom_to_molecule[i]
             bonds_per_molecule[molecule].append((i, j, order))
 
-        # Get the canonical smiles for each molecule
-        to_can = openbabel.OBConversion()
-        to_can.SetOutFormat('can')
-        to_smi = openbabel.OBConversion()
-        to_smi.SetOutFormat('smi')
-        ob_mol = openbabel.OBMol()
-        ob_template = openbabel.OBMol()
-        atnos = self.atoms.atomic_numbers(configuration)
-        start = 0
+        # The atomic numbers by atom id
+        atnos = dict(
+            self.db.execute(
+                "SELECT at.id, at.atno FROM atom AS at, subset_atom AS sa"
+                " WHERE at.id = sa.atom AND sa.subset = ?",
+                (self.all_subset(configuration),)
+            )
+        )
+
+        # The known molecule templates and the cache of their graph hashes
+        sql = "SELECT id, name FROM template WHERE type = 'molecule'"
+        names = dict(self.db.execute(sql))
+        known = {}
+        for hash_, smiles, tid in self.db.execute(
+            "SELECT hash, smiles, template FROM templategraph"
+        ):
+            # Ignore entries for templates that have since been removed.
+            if names.get(tid) == smiles:
+                known[hash_] = tid
+
+        graphs = {}  # The template and atom order for each molecular graph
+        template_graphs = {}  # The ordered graph of each template
         sids = {}
         tids = []
         for molecule, atoms in enumerate(molecules):
             to_index = {j: i for i, j in enumerate(atoms)}
-            n_atoms = len(atoms)
-            molecule_atnos = atnos[start:start + n_atoms]
-            start += n_atoms
-
-            ob_mol.Clear()
-            for atom, atno in zip(atoms, molecule_atnos):
-                ob_atom = ob_mol.NewAtom()
-                ob_atom.SetAtomicNum(atno)
-            bonds = []
-            for i, j, order in bonds_per_molecule[molecule]:
-                bonds.append((to_index[i], to_index[j], order))
-                # 1-based indices in ob.
-                ob_mol.AddBond(to_index[i] + 1, to_index[j] + 1, order)
-
-            smiles = to_smi.WriteString(ob_mol).strip()
-            canonical = to_can.WriteString(ob_mol).strip()
-
-            # See if a molecule template with the canonical smiles exists
-            if self.templates.exists(canonical, 'molecule'):
-                tid = self.templates.find(canonical, 'molecule')
+            molecule_atnos = [atnos[i] for i in atoms]
+            bonds = [
+                (to_index[i], to_index[j], order)
+                for i, j, order in bonds_per_molecule[molecule]
+            ]
+            graph = (tuple(molecule_atnos), tuple(sorted(bonds)))
+
+            if graph in graphs:
+                tid, order = graphs[graph]
             else:
-                tid = self.templates.create(
-                    canonical, 'molecule', atnos=molecule_atnos, bonds=bonds
-                )
+                # Different graphs can have the same hash, so the template
+                # is only used if the molecule can be mapped onto it.
+                hash_ = _graph_hash(molecule_atnos, bonds)
+                order = None
+                if hash_ in known:
+                    tid = known[hash_]
+                    order = self._template_order(tid, graph, template_graphs)
+                if order is None:
+                    # A new graph, so get its canonical smiles
+                    ob_mol = _graph(molecule_atnos, bonds)
+                    to_can = _conversion('smi', 'can')
+                    canonical = to_can.WriteString(ob_mol).strip()
+
+                    # See if a molecule template with the smiles exists
+                    if self.templates.exists(canonical, 'molecule'):
+                        tid = self.templates.find(canonical, 'molecule')
+                    else:
+                        tid = self.templates.create(
+                            canonical,
+                            'molecule',
+                            atnos=molecule_atnos,
+                            bonds=bonds
+                        )
+                    order = self._template_order(tid, graph, template_graphs)
+                    if order is None:
+                        raise RuntimeError(
+                            f'Molecule {molecule} cannot be mapped onto the '
+                            f"template '{canonical}' with the same SMILES."
+                        )
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO templategraph"
+                        "       (hash, smiles, template) VALUES (?, ?, ?)",
+                        (hash_, canonical, tid)
+                    )
+                    self.mark_changed('templategraph')
+                    known[hash_] = tid
+                graphs[graph] = (tid, order)
             tids.append(tid)
+
             if create_subsets:
+                # The atoms in the order of the template atoms
                 tatom_ids = self.templateatoms.atom_ids(tid)
-                if smiles != canonical:
-                    # Need to reorder the atoms to match the template atoms
-
-                    # Prepare the OB molecule for the template
-                    ob_template.Clear()
-                    for atno in self.templateatoms.atomic_numbers(tid):
-                        ob_atom = ob_template.NewAtom()
-                        ob_atom.SetAtomicNum(atno)
-
-                    tatom_ids = self.templateatoms.atom_ids(tid)
-                    to_index = {j: i for i, j in enumerate(tatom_ids)}
-                    for row in self.templatebonds.bonds(tid):
-                        i = to_index[row['i']]
-                        j = to_index[row['j']]
-                        order = row['bondorder']
-                        ob_template.AddBond(i + 1, j + 1, order)
-
-                    # Get the mapping from template to molecule
-                    query = openbabel.CompileMoleculeQuery(ob_template)
-                    mapper = openbabel.OBIsomorphismMapper.GetInstance(query)
-                    mapping = openbabel.vpairUIntUInt()
-                    mapper.MapFirst(ob_mol, mapping)
-                    tmp = [atoms[j] for i, j in mapping]
-                    atoms = tmp
+                atoms = [atoms[i] for i in order]
                 sid = self.subsets.create(tid, configuration, atoms, tatom_ids)
                 if tid not in sids:
                     sids[tid] = []
                 sids[tid].append(sid)
+        self.commit()
 
         if create_subsets:
             return tids, sids
         else:
             return tids
+
+    def _ordered_template_graph(self, tid):
+        """The atomic numbers and bonds of a template, in template order.
+
+        Parameters
+        ----------
+        tid : int
+            The id of the template.
+
+        Returns
+        -------
+        ((int), ((int, int, int)))
+            The atomic numbers, and the bonds as sorted (i, j, order).
+        """
+        tatom_ids = self.templateatoms.atom_ids(tid)
+        to_index = {j: i for i, j in enumerate(tatom_ids)}
+        bonds = [
+            (to_index[row['i']], to_index[row['j']], row['bondorder'])
+            for row in self.templatebonds.bonds(tid)
+        ]
+        atnos = self.templateatoms.atomic_numbers(tid)
+        return (tuple(atnos), tuple(sorted(bonds)))
+
+    def _template_order(self, tid, graph, template_graphs):
+        """The order of the atoms of a molecule that matches a template.
+
+        Parameters
+        ----------
+        tid : int
+            The id of the template.
+        graph : ((int), ((int, int, int)))
+            The atomic numbers and sorted bonds of the molecule.
+        template_graphs : {int: ((int), ((int, int, int)))}
+            The ordered graphs of the templates, which is added to.
+
+        Returns
+        -------
+        [int] or None
+            The indices of the atoms of the molecule in the order of the
+            template atoms, or None if the molecule is not the same graph as
+            the template.
+        """
+        if tid not in template_graphs:
+            template_graphs[tid] = self._ordered_template_graph(tid)
+        template_atnos, template_bonds = template_graphs[tid]
+        atnos, bonds = graph
+        if graph == template_graphs[tid]:
+            return [*range(len(atnos))]
+        if (
+            sorted(atnos) != sorted(template_atnos) or
+            len(bonds) != len(template_bonds)
+        ):
+            return None
+
+        from openbabel import openbabel
+
+        # Get the mapping from template to molecule. With the same number of
+        # atoms and bonds, a complete mapping means the graphs are the same.
+        query = openbabel.CompileMoleculeQuery(self._template_graph(tid))
+        mapper = openbabel.OBIsomorphismMapper.GetInstance(query)
+        mapping = openbabel.vpairUIntUInt()
+        mapper.MapFirst(_graph(atnos, bonds), mapping)
+        if len(mapping) != len(atnos):
+            return None
+        return [j for i, j in sorted(mapping)]
+
+    def _template_graph(self, tid):
+        """The OpenBabel molecule for a template, with only atoms and bonds.
+
+        The molecule is cached until the templates change.
+
+        Parameters
+        ----------
+        tid : int
+            The id of the template.
+
+        Returns
+        -------
+        openbabel.OBMol
+            The molecule.
+        """
+        count = self.change_count('templateatom', 'templatebond')
+        key = ('template', tid)
+        if key in self._obmols:
+            mol, last_count = self._obmols[key]
+            if last_count == count:
+                return mol
+
+        atnos, bonds = self._ordered_template_graph(tid)
+        mol = _graph(atnos, bonds)
+        self._obmols[key] = (mol, count)
+        return mol
@@ -444,3 +444,31 @@ def test_remove_atoms(copper):
     xyz = system.atoms.coordinates()
 
     assert xyz == [[0.5, 0.5, 0.0], [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]]
+
+
+def test_subset_configuration(atoms):
+    """Test that the coordinates of a subset are from its configuration."""
+    system = atoms.system
+    first = system.current_configuration
+    atoms.append(x=x, y=y, z=z, atno=atno)
+
+    second = system.add_configuration(changed_atoms=True)
+    atoms.append(configuration=second, x=[-1.0], y=[-2.0], z=[-3.0], atno=[6])
+    subset = system.all_subset(second)
+    assert system.current_configuration == first
+    links = system.db.execute(
+        "SELECT configuration, subset FROM configuration_subset"
+    ).fetchall()
+    assert [tuple(row) for row in links] == [
+        (first, system.all_subset(first)), (second, subset)
+    ]
+
+    assert atoms.coordinates(subset=subset) == [[-1.0, -2.0, -3.0]]
+    assert [row['atno'] for row in atoms.atoms(subset=subset)] == [6]
+    assert [*atoms.get_column('x', subset=subset)] == [-1.0]
+
+    atoms.set_coordinates([[1.0, 1.0, 1.0]], subset=subset)
+    assert atoms.coordinates(configuration=second) == [[1.0, 1.0, 1.0]]
+    assert atoms.coordinates() == [
+        [1.0, 4.0, 7.0], [2.0, 5.0, 8.0], [3.0, 6.0, 9.0]
+    ]
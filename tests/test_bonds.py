@@ -166,3 +166,50 @@ def test_set_column(AceticAcid):
     if str(bonds) != answer2:
         print(str(bonds))
     assert str(bonds) == answer2
+
+
+def test_atom_columns(AceticAcid):
+    """Test getting the atoms of the bonds as columns."""
+    system = AceticAcid
+    bonds = system['bond']
+    assert bonds.get_column('i') == [1, 1, 1, 1, 5, 5, 7]
+    assert bonds.get_column('j') == [2, 3, 4, 5, 6, 7, 8]
+
+
+def test_contains_bond(AceticAcid):
+    """Test checking for bonds."""
+    system = AceticAcid
+    bonds = system['bond']
+    assert bonds.contains_bond((5, 7))
+    assert bonds.contains_bond((7, 5))
+    assert not bonds.contains_bond((5, 8))
+
+
+def test_changed_bonds(AceticAcid, tmp_path):
+    """Test a configuration with its own bonds, also after reopening."""
+    system = AceticAcid
+    first = system.current_configuration
+    second = system.add_configuration(
+        name='second', changed_atoms=True, changed_bonds=True
+    )
+    ids = system.atoms.append(
+        configuration=second, x=[0.0, 1.0], y=0.0, z=0.0, atno=[1, 1]
+    )
+    system.bonds.append(configuration=second, i=ids[0], j=ids[1])
+    assert system.n_bonds(configuration=first) == 7
+    assert system.n_bonds(configuration=second) == 1
+
+    # The same atoms, but different bonds
+    third = system.add_configuration(name='third', changed_bonds=True)
+    assert system.atoms.atom_ids(configuration=third) == ids
+    assert system.n_bonds(configuration=third) == 0
+
+    # The configurations are found again when the file is opened
+    path = tmp_path / 'changed.db'
+    system.db.execute(f"VACUUM INTO '{path}'")
+    other = system.parent.open_system(path, name='other')
+    try:
+        assert other.n_configurations == 3
+        assert other.n_bonds(configuration=second) == 1
+    finally:
+        del system.parent['other']
@@ -3,8 +3,11 @@
 
 """Tests for `cell` in the `molsystem` package."""
 
+import numpy
 import pytest  # noqa: F401
 
+from molsystem import Cell, CellArray
+
 
 def test_construction(system):
     """Simplest test that we can make a CellParameters object"""
@@ -38,3 +41,230 @@ def test_cell_object(vanadium):
     cell = vanadium.cell.cell()
     assert str(type(cell)) == "<class 'molsystem.cell.Cell'>"
     assert cell == [3.03, 3.03, 3.03, 90.0, 90.0, 90.0]
+
+
+def test_transforms():
+    """Test the transformation matrices of a triclinic cell."""
+    cell = Cell(8.0, 9.0, 10.0, 70, 100, 115)
+    T = cell.to_cartesians_transform(as_array=True)
+    Tinv = cell.to_fractionals_transform(as_array=True)
+    assert numpy.allclose(T @ Tinv, numpy.identity(3))
+    assert numpy.allclose(cell.lattice_vectors, T)
+    assert numpy.allclose(
+        numpy.linalg.norm(cell.lattice_vectors, axis=1), [8.0, 9.0, 10.0]
+    )
+
+    # Changing the parameters must update the matrices
+    cell.a = 4.0
+    assert numpy.allclose(cell.lattice_vectors[0], [4.0, 0.0, 0.0])
+    cell[1] = 3.0
+    assert numpy.linalg.norm(cell.lattice_vectors[1]) == pytest.approx(3.0)
+
+    # The matrices handed out are copies
+    T = cell.to_cartesians_transform(as_array=True)
+    T[0, 0] = 100.0
+    assert cell.lattice_vectors[0, 0] == 4.0
+
+
+def test_copy():
+    """Test that a copy is independent of the original."""
+    cell = Cell(8.0, 9.0, 10.0, 70, 100, 115)
+    xyz = cell.to_cartesians([[0.5, 0.5, 0.5]])
+    other = cell.copy()
+    other.gamma = 90.0
+    assert other != cell
+    assert cell.to_cartesians([[0.5, 0.5, 0.5]]) == xyz
+
+
+def test_cached_cell(vanadium):
+    """Test that the cell is cached until it changes."""
+    cells = vanadium['cell']
+    cell = cells.cell()
+    cell.a = 5.0
+    assert cells.cell() == [3.03, 3.03, 3.03, 90.0, 90.0, 90.0]
+
+    cells.set_cell(4.0, 4.0, 4.0, 90, 90, 90)
+    assert cells.cell() == [4.0, 4.0, 4.0, 90.0, 90.0, 90.0]
+    assert numpy.allclose(
+        cells.cell().to_cartesians([[0.5, 0.5, 0.5]]), [[2.0, 2.0, 2.0]]
+    )
+
+    # Changing the table directly also invalidates the cache.
+    cells['a'][0] = 6.0
+    assert cells.cell().a == 6.0
+
+
+def test_cell_per_configuration(vanadium):
+    """Test cells in different configurations."""
+    system = vanadium
+    cells = system['cell']
+    first = system.current_configuration
+    second = system.add_configuration(name='second')
+    assert cells.cell(second) is None
+    cells.set_cell(5.0, 5.0, 5.0, 90, 90, 90, configuration=second)
+    assert cells.cell(second).a == 5.0
+    assert cells.cell(first).a == 3.03
+
+
+def test_volume():
+    """Test the volume of a triclinic cell."""
+    cell = Cell(8.0, 9.0, 10.0, 70, 100, 115)
+    T = cell.to_cartesians_transform(as_array=True)
+    assert cell.volume == pytest.approx(abs(numpy.linalg.det(T)))
+    assert Cell(2.0, 3.0, 4.0, 90, 90, 90).volume == pytest.approx(24.0)
+
+
+def test_cell_array():
+    """Test that a CellArray agrees with the individual cells."""
+    rng = numpy.random.default_rng(2024)
+    n_frames = 5
+    parameters = numpy.column_stack(
+        (
+            rng.uniform(5, 10, size=(n_frames, 3)),
+            rng.uniform(70, 110, size=(n_frames, 3))
+        )
+    )
+    cells = CellArray(parameters)
+    assert len(cells) == n_frames
+    assert cells.configurations is None
+
+    uvw = rng.uniform(size=(n_frames, 20, 3))
+    xyz = cells.to_cartesians(uvw)
+    assert xyz.shape == uvw.shape
+    assert numpy.allclose(cells.to_fractionals(xyz), uvw)
+
+    volumes = cells.volumes
+    T = cells.to_cartesians_transform()
+    for i, cell in enumerate(cells):
+        assert cell == parameters[i].tolist()
+        assert numpy.allclose(
+            xyz[i], cell.to_cartesians(uvw[i], as_array=True)
+        )
+        assert numpy.allclose(
+            T[i], cell.to_cartesians_transform(as_array=True)
+        )
+        assert volumes[i] == pytest.approx(cell.volume)
+
+    assert cells[1:3].n_frames == 2
+    assert cells[3] == parameters[3].tolist()
+
+
+def test_cell_array_minimum_image():
+    """Test wrapping displacements to the nearest image."""
+    cells = CellArray(
+        [[4.0, 5.0, 6.0, 90, 90, 90], [8.0, 8.0, 8.0, 90, 90, 90]]
+    )
+    delta = numpy.array([[[3.0, -3.0, 1.0]], [[3.0, -3.0, 1.0]]])
+    result = cells.minimum_image(delta)
+    assert numpy.allclose(result[0], [[-1.0, 2.0, 1.0]])
+    assert numpy.allclose(result[1], [[3.0, -3.0, 1.0]])
+
+
+def test_cell_array_minimum_image_triclinic():
+    """Test that skewed frames agree with the individual cells."""
+    cells = CellArray(
+        [[8.0, 9.0, 10.0, 70, 100, 115], [6.0, 6.0, 9.0, 75, 80, 125]]
+    )
+    rng = numpy.random.default_rng(7)
+    delta = rng.uniform(-20, 20, size=(2, 1000, 3))
+    result = cells.minimum_image(delta)
+    assert result.shape == delta.shape
+    for i, cell in enumerate(cells):
+        correct = nearest_images(cell, delta[i])
+        assert numpy.allclose(
+            numpy.linalg.norm(result[i], axis=1),
+            numpy.linalg.norm(correct, axis=1)
+        )
+        assert numpy.allclose(result[i], cell.minimum_image(delta[i]))
+    assert numpy.allclose(cells.widths[0], cells[0].widths)
+
+
+def test_cells(vanadium):
+    """Test getting the cells of several configurations with one query."""
+    system = vanadium
+    cells = system['cell']
+    first = system.current_configuration
+    second = system.add_configuration(name='second')
+    third = system.add_configuration(name='third')
+    cells.set_cell(5.0, 5.0, 5.0, 90, 90, 90, configuration=third)
+
+    result = cells.cells()
+    assert result.configurations.tolist() == [first, third]
+    assert result.parameters[:, 0].tolist() == [3.03, 5.0]
+
+    result = cells.cells([third, first])
+    assert result.configurations.tolist() == [third, first]
+    assert result.parameters[:, 0].tolist() == [5.0, 3.03]
+    assert result.volumes[0] == pytest.approx(125.0)
+
+    with pytest.raises(KeyError):
+        cells.cells([first, second])
+
+
+def nearest_images(cell, delta):
+    """The minimum-image displacements, checking 5x5x5 images."""
+    T = cell.to_cartesians_transform(as_array=True)
+    duvw = cell.to_fractionals(delta, as_array=True)
+    delta = (duvw - numpy.rint(duvw)) @ T
+    offsets = (numpy.indices((5, 5, 5)).reshape(3, -1).T - 2.0) @ T
+    trial = delta[:, numpy.newaxis, :] + offsets
+    r2 = (trial**2).sum(axis=2)
+    return trial[numpy.arange(delta.shape[0]), numpy.argmin(r2, axis=1)]
+
+
+@pytest.mark.parametrize(
+    'parameters',
+    [(4.0, 5.0, 6.0, 90, 90, 90), (8.0, 9.0, 10.0, 70, 100, 115)]
+)
+def test_minimum_image(parameters):
+    """Test the minimum image displacements against a brute-force search."""
+    cell = Cell(*parameters)
+    rng = numpy.random.default_rng(99)
+    delta = rng.uniform(-20, 20, size=(2000, 3))
+    result = cell.minimum_image(delta)
+    correct = nearest_images(cell, delta)
+    assert numpy.allclose(
+        numpy.linalg.norm(result, axis=1), numpy.linalg.norm(correct, axis=1)
+    )
+    # The result must be an image of the original displacement
+    duvw = cell.to_fractionals(result - delta, as_array=True)
+    assert numpy.allclose(duvw, numpy.rint(duvw))
+
+    assert cell.minimum_image(delta[0]).shape == (3,)
+
+
+def test_distances():
+    """Test the distances between pairs of points."""
+    cell = Cell(4.0, 4.0, 4.0, 90, 90, 90)
+    assert cell.is_orthorhombic
+    assert cell.distances([0.5, 0, 0], [3.5, 0, 0]) == pytest.approx(1.0)
+    r = cell.distances([[0.5, 0, 0], [0, 0, 0]], [3.5, 0, 0])
+    assert r.tolist() == pytest.approx([1.0, 0.5])
+    delta = cell.displacements([0.5, 0, 0], [3.5, 0, 0])
+    assert delta == pytest.approx([-1.0, 0.0, 0.0])
+
+
+@pytest.mark.parametrize('cutoff', [2.0, 4.0, 7.0])
+def test_pairs(cutoff):
+    """Test finding the pairs within a cutoff in a triclinic cell."""
+    cell = Cell(8.0, 9.0, 10.0, 70, 100, 115)
+    rng = numpy.random.default_rng(7)
+    xyz = cell.to_cartesians(rng.uniform(size=(150, 3)), as_array=True)
+
+    distances = cell.pairwise_distances(xyz, block_size=17)
+    delta = xyz[numpy.newaxis, :, :] - xyz[:, numpy.newaxis, :]
+    delta = delta.reshape(-1, 3)
+    correct = numpy.linalg.norm(nearest_images(cell, delta), axis=1)
+    assert numpy.allclose(distances.ravel(), correct)
+
+    i, j, r = cell.pairs(xyz, cutoff, block_size=13)
+    assert numpy.all(i < j)
+    mask = numpy.triu(distances <= cutoff, k=1)
+    expected = zip(*[x.tolist() for x in numpy.nonzero(mask)])
+    assert sorted(zip(i.tolist(), j.tolist())) == sorted(expected)
+    assert numpy.allclose(r, distances[i, j])
+
+    # Two different sets of points
+    i, j, r = cell.pairs(xyz[:40], cutoff, xyz2=xyz[40:])
+    assert numpy.count_nonzero(distances[:40, 40:] <= cutoff) == i.size
+    assert numpy.allclose(r, distances[i, j + 40])
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import numpy
 import pytest  # noqa: F401
+
+from molsystem.cif import _expand_sites, _parse_symops
 """Tests for handling Molfiles."""
 
 cif_cu = """\
@@ -354,3 +357,202 @@ def test_from_cif_text(system):
     system.from_cif_text(cif_cu)
 
     assert system.n_atoms() == 4
+
+
+cif_rutile = """\
+data_rutile
+_cell_length_a 4.5937(3)
+_cell_length_b 4.5937(3)
+_cell_length_c 2.9587(2)
+_cell_angle_alpha 90
+_cell_angle_beta 90
+_cell_angle_gamma 90
+loop_
+_symmetry_equiv_pos_as_xyz
+'x,y,z'
+'-x,-y,z'
+'-y+1/2,x+1/2,z+1/2'
+'y+1/2,-x+1/2,z+1/2'
+'-x+1/2,y+1/2,-z+1/2'
+'x+1/2,-y+1/2,-z+1/2'
+'y,x,-z'
+'-y,-x,-z'
+'-x,-y,-z'
+'x,y,-z'
+'y+1/2,-x+1/2,-z+1/2'
+'-y+1/2,x+1/2,-z+1/2'
+'x+1/2,-y+1/2,z+1/2'
+'-x+1/2,y+1/2,z+1/2'
+'-y,-x,z'
+'y,x,z'
+loop_
+_atom_site_label
+_atom_site_type_symbol
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+Ti1 Ti 0 0 0
+O1 O 0.30478(6) 0.30478(6) 0
+"""
+
+
+def test_parse_symops():
+    """Test parsing symmetry operations into matrices."""
+    R, t = _parse_symops(('x,y,z', '-x+1/2, y-x, 0.25-z', "'1/2+x,2*y,z+.5'"))
+    assert R.shape == (3, 3, 3)
+    assert R[1].tolist() == [[-1, 0, 0], [-1, 1, 0], [0, 0, -1]]
+    assert t[1].tolist() == [0.5, 0.0, 0.25]
+    assert R[2].tolist() == [[1, 0, 0], [0, 2, 0], [0, 0, 1]]
+    assert t[2].tolist() == [0.5, 0.0, 0.5]
+    for bad in ('x,y', 'x,q,z', 'x,y,z+'):
+        with pytest.raises(ValueError):
+            _parse_symops((bad,))
+
+
+def test_expand_special_positions():
+    """Test that nearly identical positions are merged."""
+    # The 3-fold axis in a hexagonal cell, with the site given to 4 places
+    R, t = _parse_symops(('x,y,z', '-y,x-y,z', '-x+y,-x,z'))
+    uvw = numpy.array([[0.3333, 0.6667, 0.25], [0.1, 0.2, 0.0]])
+    sites, positions = _expand_sites(uvw, R, t)
+    assert sites.tolist() == [0, 1, 1, 1]
+    # Positions near 1 are wrapped to 0
+    sites, positions = _expand_sites(numpy.array([[0.99999, 0.5, 0.0]]), R, t)
+    assert positions[0].tolist() == [0.0, 0.5, 0.0]
+
+
+def test_expand_sites_tolerance():
+    """Test merging positions in neighboring grid cells only if within
+    the tolerance."""
+    R = numpy.array([numpy.identity(3)] * 2)
+    # 0.5 delta apart, across the edge of a grid cell
+    t = numpy.array([[0.0, 0.0, 0.0], [0.5e-04, 0.0, 0.0]])
+    sites, positions = _expand_sites(numpy.array([[0.10009, 0.5, 0.5]]), R, t)
+    assert sites.tolist() == [0]
+    # 1.5 delta apart, in neighboring grid cells
+    t = numpy.array([[0.0, 0.0, 0.0], [1.5e-04, 0.0, 0.0]])
+    sites, positions = _expand_sites(numpy.array([[0.10001, 0.5, 0.5]]), R, t)
+    assert sites.tolist() == [0, 0]
+
+
+def test_expand_sites_grid_cell():
+    """Test comparing with every position in a neighboring grid cell."""
+    R = numpy.array([numpy.identity(3)] * 3)
+    # The first two are in the same grid cell. The third is in the next
+    # cell and only within the tolerance of the second.
+    t = numpy.array([[0.0, 0.0, 0.0], [0.09, 0.0, 0.0], [0.15, 0.0, 0.0]])
+    uvw = numpy.array([[0.0, 0.5, 0.5]])
+    sites, positions = _expand_sites(uvw, R, t, delta=0.1)
+    assert sites.tolist() == [0]
+    assert positions.tolist() == [[0.0, 0.5, 0.5]]
+
+
+def test_from_cif_rutile(system):
+    """Test a CIF with uncertainties and the older symmetry tags."""
+    system.from_cif_text(cif_rutile)
+    assert system.n_atoms() == 6
+    assert system.atoms.symbols() == ['Ti', 'Ti', 'O', 'O', 'O', 'O']
+    assert system.cell.cell().equal([4.5937, 4.5937, 2.9587, 90, 90, 90])
+    uvw = numpy.array(system.atoms.coordinates())
+    assert numpy.allclose(
+        uvw[2:], [
+            [0.30478, 0.30478, 0.0], [0.69522, 0.69522, 0.0],
+            [0.19522, 0.80478, 0.5], [0.80478, 0.19522, 0.5]
+        ]
+    )
+
+
+def test_from_cif_blocks(system):
+    """Test that each data block becomes a configuration."""
+    configurations = system.from_cif_text(cif_cu + '\n' + cif_rutile)
+    assert len(configurations) == 2
+    first, second = configurations
+    assert first == system.current_configuration
+    assert system.n_atoms(configuration=first) == 4
+    assert system.n_atoms(configuration=second) == 6
+    assert system.atoms.symbols(configuration=second)[:2] == ['Ti', 'Ti']
+    assert system.cell.cell(second).equal([4.5937, 4.5937, 2.9587, 90, 90, 90])
+    assert system['configuration']['name'][1] == 'rutile'
+
+
+def test_from_cif_file_systems(system, tmp_path):
+    """Test reading a file with the blocks as systems."""
+    path = tmp_path / 'test.cif'
+    path.write_text(cif_cu + '\n' + cif_rutile)
+    systems = system.from_cif_file(path, as_systems=True)
+    try:
+        assert systems[0] is system
+        assert systems[1].nickname == 'rutile'
+        assert system.n_atoms() == 4
+        assert systems[1].n_atoms() == 6
+        assert systems[1].periodicity == 3
+    finally:
+        del system.parent['rutile']
+
+
+def test_from_cif_systems_names(system):
+    """Test that blocks with the same name become systems with unique
+    names."""
+    text = '\n'.join((cif_cu, cif_rutile, cif_rutile))
+    systems = system.from_cif_text(text, as_systems=True)
+    try:
+        names = [other.nickname for other in systems[1:]]
+        assert names == ['rutile', 'rutile 3']
+        assert systems[2].n_atoms() == 6
+    finally:
+        del system.parent['rutile']
+        del system.parent['rutile 3']
+
+
+mmcif_nmr = """\
+data_2NMR
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_seq_id
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.auth_seq_id
+_atom_site.auth_comp_id
+_atom_site.auth_asym_id
+_atom_site.auth_atom_id
+_atom_site.pdbx_PDB_model_num
+ATOM   1 N N   GLY A 1 1.0 2.0 3.0 10 GLY A N   1
+ATOM   2 C CA  GLY A 1 1.5 2.0 3.0 10 GLY A CA  1
+HETATM 3 O O   HOH B . 5.0 5.0 5.0 101 HOH B O   1
+HETATM 4 ZN ZN ZN C . 8.0 8.0 8.0 102 ZN C ZN 1
+ATOM   1 N N   GLY A 1 1.1 2.1 3.1 10 GLY A N   2
+ATOM   2 C CA  GLY A 1 1.6 2.1 3.1 10 GLY A CA  2
+HETATM 3 O O   HOH B . 5.1 5.1 5.1 101 HOH B O   2
+HETATM 4 ZN ZN ZN C . 8.1 8.1 8.1 102 ZN C ZN 2
+"""
+
+
+def test_from_mmcif_text(system):
+    """Test reading an mmCIF file with two models."""
+    first, second = system.from_mmcif_text(mmcif_nmr)
+    assert first == system.current_configuration
+    atoms = system.atoms
+    assert system.n_atoms(configuration=second) == 4
+    assert atoms.symbols() == ['N', 'C', 'O', 'Zn']
+    assert [*atoms['name']] == ['N', 'CA', 'O', 'ZN']
+    assert [*atoms['resname']] == ['GLY', 'GLY', 'HOH', 'ZN']
+    assert [*atoms['chainid']] == ['A', 'A', 'B', 'C']
+    assert [*atoms['resseq']] == [10, 10, 101, 102]
+    # The second model shares the atoms, with its own coordinates
+    assert atoms.atom_ids(configuration=second) == atoms.atom_ids()
+    xyz = numpy.array(atoms.coordinates(configuration=second))
+    assert numpy.allclose(xyz - atoms.coordinates(), 0.1)
+
+
+def test_from_mmcif_errors(system):
+    """Test mmCIF files without atoms."""
+    with pytest.raises(RuntimeError):
+        system.from_mmcif_text('')
+    with pytest.raises(RuntimeError):
+        system.from_mmcif_text('data_x\n_entry.id x\n')
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the streaming CIF reader."""
+
+import io
+
+import numpy
+import pytest  # noqa: F401
+
+import molsystem.cif_reader
+from molsystem.cif_reader import read_cif
+
+mmcif = """\
+data_1ABC
+#
+_entry.id   1ABC
+_struct.title
+;Two lines
+ of title
+;
+_cell.length_a 10.0
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.label_atom_id
+_atom_site.label_comp_id
+_atom_site.Cartn_x
+_atom_site.B_iso_or_equiv
+ATOM 1 N   ALA 1.000 10.5(3)
+ATOM 2 CA  ALA 2.000 ?
+ATOM 3 "C'" ALA 3.000 .
+HETATM 4 'O 1' HOH
+4.000 8.0
+#
+loop_
+_struct_conn.id
+_struct_conn.ptnr1_label_atom_id
+_struct_conn.ptnr2_label_atom_id
+disulf1 SG SG
+data_2XYZ
+_entry.id 2XYZ
+loop_
+_atom_site.id
+_atom_site.Cartn_x
+5 5.5
+"""
+
+
+def test_blocks():
+    """Test reading several blocks, with quotes and text fields."""
+    blocks = [*read_cif(mmcif)]
+    assert [name for name, block in blocks] == ['1ABC', '2XYZ']
+
+    block = blocks[0][1]
+    assert block['_entry.id'] == '1ABC'
+    assert block['_struct.title'] == 'Two lines\n of title'
+    assert block['_atom_site.label_atom_id'] == ['N', 'CA', "C'", 'O 1']
+    assert block['_atom_site.cartn_x'] == ['1.000', '2.000', '3.000', '4.000']
+    assert block['_struct_conn.ptnr1_label_atom_id'] == ['SG']
+
+    block = blocks[1][1]
+    assert block['_atom_site.id'] == ['5']
+
+
+def test_save_frames():
+    """Test skipping save frames, but not what follows them."""
+    text = 'data_x\nsave_f\n_a.b 1\nsave_\n_cell_length_a 5.0\n'
+    name, block = next(read_cif(text))
+    assert block == {'_cell_length_a': '5.0'}
+
+
+def test_tags_and_dtypes():
+    """Test keeping only some tags, and converting columns."""
+    dtypes = {'_atom_site.Cartn_x': float, '_atom_site.B_iso_or_equiv': float}
+    name, block = next(
+        read_cif(io.StringIO(mmcif), tags='_atom_site.', dtypes=dtypes)
+    )
+    assert '_entry.id' not in block
+    assert '_struct_conn.id' not in block
+    assert block['_atom_site.cartn_x'].tolist() == [1.0, 2.0, 3.0, 4.0]
+    b = block['_atom_site.b_iso_or_equiv']
+    assert b[0] == 10.5 and b[3] == 8.0
+    assert numpy.isnan(b[1]) and numpy.isnan(b[2])
+
+
+def test_chunks(monkeypatch):
+    """Test that long loops are gathered in chunks."""
+    monkeypatch.setattr(molsystem.cif_reader, 'chunk_rows', 3)
+    lines = ['data_x', 'loop_', '_a.i', '_a.x']
+    lines.extend(f'{i} {i/2}' for i in range(10))
+    name, block = next(read_cif(lines, dtypes={'_a.i': int}))
+    assert block['_a.i'].tolist() == [*range(10)]
+    assert block['_a.x'] == [str(i / 2) for i in range(10)]
+
+
+def test_errors():
+    """Test that malformed files raise errors."""
+    for text in (
+        'data_x\nloop_\n_a.i\n_a.j\n1 2 3\n',
+        'data_x\n_a.i\n_a.j 1\n',
+        'data_x\n;unterminated\n',
+        '_a.i 1\n',
+        'data_x\n1 2\n',
+    ):
+        with pytest.raises(ValueError):
+            [*read_cif(text)]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for reading and writing files."""
+
+import gzip
+import io
+
+import numpy
+
+import pytest  # noqa: F401
+
+from molsystem.file_io import guess_format, open_file
+from tests.test_cif import cif_rutile
+from tests.test_pdb import heme, nmr
+
+
+def test_guess_format():
+    """Test finding the format from the filename."""
+    assert guess_format('x.pdb') == 'pdb'
+    assert guess_format('dir.v2/x.PDB.gz') == 'pdb'
+    assert guess_format('x.sdf.xz') == 'molfile'
+    assert guess_format('x.mmcif') == 'mmcif'
+    for name in ('x', 'x.gz', 'x.txt'):
+        with pytest.raises(ValueError):
+            guess_format(name)
+    with pytest.raises(ValueError):
+        guess_format(io.StringIO())
+
+
+@pytest.mark.parametrize('suffix', ['', '.gz', '.xz'])
+def test_compression(tmp_path, suffix):
+    """Test writing and reading compressed files."""
+    path = tmp_path / ('test.txt' + suffix)
+    with open_file(path, 'w') as fd:
+        fd.write('line 1\nline 2\n')
+    if suffix == '.gz':
+        assert gzip.open(path, 'rt').read() == 'line 1\nline 2\n'
+    # Recognized from the contents, not the name
+    other = tmp_path / 'other'
+    path.rename(other)
+    with open_file(other) as fd:
+        assert [*fd] == ['line 1\n', 'line 2\n']
+    with open(other, 'rb') as binary:
+        with open_file(binary) as fd:
+            assert fd.read() == 'line 1\nline 2\n'
+        assert not binary.closed
+
+
+def test_compressed_bytes(system):
+    """Test reading compressed data from a stream that cannot peek."""
+    data = gzip.compress(heme.encode())
+    with open_file(io.BytesIO(data)) as fd:
+        assert fd.read() == heme
+    system.read(io.BytesIO(data), format='pdb')
+    assert system.n_atoms() == 75
+    # and uncompressed data
+    with open_file(io.BytesIO(heme.encode())) as fd:
+        assert fd.read() == heme
+
+
+def test_read_write_pdb(system, tmp_path):
+    """Test a round trip through a compressed PDB file."""
+    system.read(io.StringIO(heme), format='pdb')
+    path = tmp_path / 'heme.pdb.gz'
+    system.write(path)
+    other = system.parent.create_system('other', temporary=True)
+    try:
+        other.read(path)
+        assert other.n_atoms() == 75
+        assert other.n_bonds() == system.n_bonds()
+        assert other.to_pdb_text()[40:] == system.to_pdb_text()[40:]
+    finally:
+        del system.parent['other']
+
+
+def test_read_write_models(system, tmp_path):
+    """Test writing several configurations to an xz-compressed file."""
+    configurations = system.read(io.StringIO(nmr), format='pdb')
+    path = tmp_path / 'nmr.pdb.xz'
+    system.write(path, configuration=configurations)
+    text = path.read_bytes()
+    assert text.startswith(b'\xfd7zXZ\x00')
+    other = system.parent.create_system('other', temporary=True)
+    try:
+        assert len(other.read(path)) == 2
+    finally:
+        del system.parent['other']
+
+
+def test_read_write_cif(system, tmp_path):
+    """Test reading and writing CIF files."""
+    path = tmp_path / 'rutile.cif'
+    path.write_text(cif_rutile)
+    system.read(path)
+    assert system.n_atoms() == 6
+    system.write(tmp_path / 'out.cif')
+    assert (tmp_path / 'out.cif').read_text() == system.to_cif_text() + '\n'
+
+
+def test_read_write_molfile(AceticAcid, tmp_path):
+    """Test reading and writing molfiles."""
+    path = tmp_path / 'acetic.mol'
+    AceticAcid.write(path, title='acetic acid')
+    other = AceticAcid.parent.create_system('other', temporary=True)
+    try:
+        other.read(path)
+        assert other.name == 'acetic acid'
+        assert other.n_atoms() == 8
+        assert other.n_bonds() == 7
+    finally:
+        del AceticAcid.parent['other']
+
+
+def test_read_write_mmcif(AceticAcid, tmp_path):
+    """Test reading back the mmCIF file that write writes."""
+    path = tmp_path / 'acetic.mmcif'
+    AceticAcid.write(path)
+    other = AceticAcid.parent.create_system('other', temporary=True)
+    try:
+        other.read(path)
+        assert other.n_atoms() == 8
+        assert other.n_bonds() == 7
+        assert other.atoms.symbols() == AceticAcid.atoms.symbols()
+        xyz = numpy.array(other.atoms.coordinates())
+        expected = numpy.array(AceticAcid.atoms.coordinates())
+        assert numpy.allclose(xyz, expected, atol=1.0e-3)
+        orders = sorted(other.bonds.get_column('bondorder'))
+        assert orders == sorted(AceticAcid.bonds.get_column('bondorder'))
+    finally:
+        del AceticAcid.parent['other']
+
+
+def test_unknown_format(system):
+    """Test asking for a format that is not supported."""
+    with pytest.raises(ValueError):
+        system.read(io.StringIO(''), format='xyz')
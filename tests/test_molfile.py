@@ -1,9 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import pytest  # noqa: F401
 """Tests for handling Molfiles."""
 
+import io
+
+import pytest  # noqa: F401
+
+from molsystem.molfile import read_sdf
+
 text1 = """\
 L-Alanine
 GSMACCS-II07189510252D 1 0.00366 0.00000 0
@@ -58,9 +63,9 @@ M  V30 BEGIN ATOM
 M  V30 1 C -0.6622 0.5342 0.0 0
 M  V30 2 C 0.6622 -0.3 0.0 0
 M  V30 3 C -0.7207 2.0817 0.0 0
-M  V30 4 N -1.8622 -0.3695 0.0 0
+M  V30 4 N -1.8622 -0.3695 0.0 0 CHG=1
 M  V30 5 O 0.622 -1.8037 0.0 0
-M  V30 6 O 1.9464 0.4244 0.0 0
+M  V30 6 O 1.9464 0.4244 0.0 0 CHG=-1
 M  V30 END ATOM
 M  V30 BEGIN BOND
 M  V30 1 1 1 2
@@ -148,3 +153,124 @@ def test_to_text2(AceticAcid):
     if text != tmp:
         print(text_sv)
     assert text == tmp
+
+
+# Methane as a V2000 molfile, with a charge in the atom block and data items
+v2000 = """\
+methyl cation
+  test
+
+  4  3  0  0  0  0  0  0  0  0999 V2000
+    0.0000    0.0000    0.0000 C   0  3  0  0  0  0  0  0  0  0  0  0
+    1.0900    0.0000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.5450    0.9440    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+   -0.5450   -0.9440    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+  1  2  1  0
+  1  3  1  0
+  1  4  1  0
+M  END
+> <ID>
+CH3+
+
+> <note>
+two
+lines
+
+$$$$
+"""
+
+# The same in V3000, with a continued line and atoms not numbered 1..n
+v3000 = """\
+methyl cation
+  test
+
+  0  0  0     0  0            999 V3000
+M  V30 BEGIN CTAB
+M  V30 COUNTS 4 3 0 0 0
+M  V30 BEGIN ATOM
+M  V30 10 C 0.0 0.0 0.0 0 -
+M  V30 CHG=1
+M  V30 11 H 1.09 0.0 0.0 0
+M  V30 12 H -0.545 0.944 0.0 0
+M  V30 13 H -0.545 -0.944 0.0 0
+M  V30 END ATOM
+M  V30 BEGIN BOND
+M  V30 1 1 10 11
+M  V30 2 1 10 12
+M  V30 3 1 10 13
+M  V30 END BOND
+M  V30 END CTAB
+M  END
+$$$$
+"""
+
+
+def test_read_sdf():
+    """Test reading V2000 and V3000 records from an SD file."""
+    records = [*read_sdf(v2000 + v3000)]
+    assert len(records) == 2
+    for record in records:
+        assert record['title'] == 'methyl cation'
+        assert record['symbols'] == ['C', 'H', 'H', 'H']
+        assert record['charges'] == [1, 0, 0, 0]
+        assert record['i'] == [0, 0, 0]
+        assert record['j'] == [1, 2, 3]
+        assert record['bondorders'] == [1, 1, 1]
+        assert record['y'][2] == pytest.approx(0.944)
+    assert records[0]['data'] == {'ID': 'CH3+', 'note': 'two\nlines'}
+    assert records[1]['data'] == {}
+
+
+def test_read_sdf_errors():
+    """Test that malformed files raise errors."""
+    for text in (
+        'title\n',
+        text1.replace('COUNTS 6 5', 'COUNTS 6 4'),
+        text1.replace('M  V30 5 1 2 6', 'M  V30 5 1 2 7'),
+        text1.replace('M  END', ''),
+        v2000.replace('  1  4  1  0\n', ''),
+    ):
+        with pytest.raises(ValueError):
+            [*read_sdf(text)]
+
+
+def test_from_sdf(system):
+    """Test reading each molecule of an SD file into a configuration."""
+    configurations = system.from_molfile_text(
+        io.StringIO(text1 + '$$$$\n' + v2000 + v3000)
+    )
+    assert len(configurations) == 3
+    assert system.name == 'L-Alanine'
+    assert str(system.atoms) == atoms1
+    assert system.n_bonds(configuration=configurations[0]) == 5
+    for configuration in configurations[1:]:
+        assert system.n_atoms(configuration=configuration) == 4
+        assert system.n_bonds(configuration=configuration) == 3
+        charges = system.atoms.get_column(
+            'formal_charge', configuration=configuration
+        )
+        assert [*charges] == [1, 0, 0, 0]
+
+    # And write them back out again
+    text = system.to_molfile_text(configuration=configurations)
+    assert text.count('$$$$') == 3
+    records = [*read_sdf(text)]
+    titles = [record['title'] for record in records]
+    assert titles == ['L-Alanine', 'methyl cation', 'methyl cation']
+    assert records[2]['charges'] == [1, 0, 0, 0]
+    assert records[2]['j'] == [1, 2, 3]
+
+
+def test_from_sdf_systems(system):
+    """Test reading each molecule of an SD file into a system."""
+    systems = system.from_molfile_text(v2000 + v3000, as_systems=True)
+    try:
+        assert len(systems) == 2
+        assert systems[0] is system
+        assert systems[1].name == 'methyl cation'
+        assert systems[1].nickname != system.nickname
+        assert systems[1].n_atoms() == 4
+        assert systems[1].n_bonds() == 3
+    finally:
+        for other in systems[1:]:
+            del system.parent[other.nickname]
@@ -236,3 +236,95 @@ def test_from_to(system):
                 print(f'{i:3} {old}\n    {new}')
 
     assert tmp_text == heme
+
+
+def test_from_pdb_columns(system):
+    """Test the columns and bonds read from a PDB file."""
+    system.from_pdb_text(heme)
+    atoms = system.atoms
+    assert [*atoms['name']][:3] == ['CHA', 'CHB', 'CHC']
+    assert atoms.symbols()[42] == 'Fe'
+    assert set(atoms['resname']) == {'HEM'}
+    assert set(atoms['tempfactor']) == {10.0}
+    # All default values, so no columns are created
+    assert 'chainid' not in atoms
+    assert 'resseq' not in atoms
+    assert 'occupancy' not in atoms
+    assert atoms.coordinates(fractionals=False)[1] == [1.458, -3.419, 0.306]
+    assert system.n_bonds() == 82
+
+
+nmr = """\
+MODEL        1
+ATOM      1  O   HOH A   1       0.000   0.000   0.000  1.00  0.00           O
+ATOM      2  H1  HOH A   1       0.957   0.000   0.000  1.00  0.00           H
+ATOM      3  H2  HOH A   1      -0.240   0.927   0.000  1.00  0.00           H
+ENDMDL
+MODEL        2
+ATOM      1  O   HOH A   1       0.000   0.000   1.000  1.00  0.00           O
+ATOM      2  H1  HOH A   1       0.957   0.000   1.000  1.00  0.00           H
+ATOM      3  H2  HOH A   1      -0.240   0.927   1.000  1.00  0.00           H
+ENDMDL
+CONECT    1    2    3
+CONECT    2    1
+CONECT    3    1
+END"""  # noqa: E501
+
+
+def test_from_pdb_models(system, tmp_path):
+    """Test that each MODEL becomes a configuration."""
+    path = tmp_path / 'nmr.pdb'
+    path.write_text(nmr)
+    first, second = system.from_pdb_file(path)
+    assert first == system.current_configuration
+    atoms = system.atoms
+    assert atoms.atom_ids(configuration=second) == atoms.atom_ids()
+    assert system.n_bonds(configuration=second) == 2
+    xyz = atoms.coordinates(configuration=second, fractionals=False)
+    assert [z for x, y, z in xyz] == [1.0, 1.0, 1.0]
+    xyz = atoms.coordinates(fractionals=False)
+    assert [z for x, y, z in xyz] == [0.0, 0.0, 0.0]
+
+
+def test_from_pdb_models_sizes(system):
+    """Test that CONECT records apply to the first of different models."""
+    lines = nmr.splitlines()
+    # Model 1 is a water, model 2 the water and an extra oxygen.
+    text = '\n'.join(
+        lines[0:5] + lines[5:9] + [lines[3][:-1] + 'O'] + lines[9:]
+    )
+    first, second = system.from_pdb_text(text)
+    atoms = system.atoms
+    assert system.n_atoms(configuration=first) == 3
+    assert system.n_atoms(configuration=second) == 4
+    assert system.n_bonds(configuration=first) == 2
+    assert system.n_bonds(configuration=second) == 0
+    ids = atoms.atom_ids(configuration=first)
+    bonds = [(bond['i'], bond['j']) for bond in system.bonds.bonds()]
+    assert bonds == [(ids[0], ids[1]), (ids[0], ids[2])]
+    assert 'CONECT    1    2    3' in system.to_pdb_text()
+
+
+def test_write_pdb_models(system, tmp_path):
+    """Test writing several configurations as models, and reading them."""
+    configurations = system.from_pdb_text(nmr)
+    path = tmp_path / 'models.pdb'
+    with open(path, 'w') as fd:
+        system.write_pdb(fd, configurations=configurations)
+    lines = path.read_text().splitlines()
+    assert lines[2] == 'MODEL        1'
+    assert lines[7] == 'MODEL        2'
+    assert lines[8][30:54] == '   0.000   0.000   1.000'
+    assert lines[12:15] == [
+        'CONECT    1    2    3', 'CONECT    2    1', 'CONECT    3    1'
+    ]
+    assert lines[-1] == 'END'
+
+    other = system.parent.create_system('other', temporary=True)
+    try:
+        first, second = other.from_pdb_file(path)
+        xyz = other.atoms.coordinates(configuration=second)
+        assert [z for x, y, z in xyz] == [1.0, 1.0, 1.0]
+        assert other.n_bonds() == 2
+    finally:
+        del system.parent['other']
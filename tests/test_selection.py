@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the selection language."""
+
+import numpy
+import pytest  # noqa: F401
+
+from molsystem.cell import Cell
+from molsystem.selection import _Selection as Selection, _within
+
+
+def test_parse():
+    """Test parsing a selection into a tree."""
+    selection = Selection('within 5 of resname LIG and not hydrogen')
+    assert selection.tree == (
+        'and', ('within', 5.0, ('values', 'resname', ('LIG',), (), ())),
+        ('not', ('values', 'atno', (1,), (), ()))
+    )
+    assert not selection.is_sql
+
+
+def test_parse_values():
+    """Test lists of values, ranges and wildcards."""
+    selection = Selection("name CA 'C B' N* and resseq 1 to 5 9")
+    assert selection.tree == (
+        'and', ('values', 'name', ('CA', 'C B'), (), ('N*',)),
+        ('values', 'resseq', (9,), ((1, 5),), ())
+    )
+    assert selection.is_sql
+
+
+def test_syntax_errors():
+    """Test that bad selections raise errors."""
+    for text in ('', 'atno', 'atno == ', '(atno 6', 'atno 6)', 'within of x'):
+        with pytest.raises(ValueError):
+            Selection(text)
+
+
+def test_elements(CH3COOH_3H2O):
+    """Test selecting by element."""
+    atoms = CH3COOH_3H2O.atoms
+    assert atoms.select('element O').tolist() == [6, 7, 9, 12, 15]
+    assert atoms.select('symbol C O').tolist() == [1, 5, 6, 7, 9, 12, 15]
+    assert atoms.select('hydrogen').size == 10
+    assert atoms.select('not hydrogen').tolist() == [1, 5, 6, 7, 9, 12, 15]
+    with pytest.raises(ValueError):
+        atoms.select('element Xx')
+
+
+def test_attributes(CH3COOH_3H2O):
+    """Test selecting with attributes and comparisons."""
+    atoms = CH3COOH_3H2O.atoms
+    assert atoms.select('id 2 to 4 or id 10').tolist() == [2, 3, 4, 10]
+    assert atoms.select('y > 4 and atno == 8').tolist() == [9, 12, 15]
+    indices = atoms.select('y > 4 and atno 8', as_indices=True)
+    assert indices.tolist() == [8, 11, 14]
+    assert atoms.select('none').size == 0
+    assert atoms.select('all').size == 17
+    with pytest.raises(ValueError):
+        atoms.select('resname LIG')
+
+
+def test_strings(CH3COOH_3H2O):
+    """Test selecting with string attributes, including missing values."""
+    atoms = CH3COOH_3H2O.atoms
+    atoms.add_attribute('name', coltype='str')
+    atoms['name'][0:8] = ['C1', 'H1', 'H2', 'H3', 'C2', 'O1', 'O2', 'HO']
+    assert atoms.select('name C*').tolist() == [1, 5]
+    assert atoms.select('name H? and not name HO').tolist() == [2, 3, 4]
+    # The waters have no names, and so are not named 'HO'
+    assert atoms.select('not name HO').size == 16
+
+
+def test_subset(CH3COOH_3H2O):
+    """Test selecting by subset."""
+    system = CH3COOH_3H2O
+    sids = system.create_molecule_subsets()
+    atoms = system.atoms
+    assert atoms.select(f'subset {sids[1]} {sids[3]}').tolist() == [
+        9, 10, 11, 15, 16, 17
+    ]
+    assert atoms.select(f'hydrogen and subset {sids[2]}').tolist() == [13, 14]
+
+
+def test_within(CH3COOH_3H2O):
+    """Test selecting atoms near others."""
+    atoms = CH3COOH_3H2O.atoms
+    assert atoms.select('within 1.0 of id 9').tolist() == [9, 10, 11]
+    assert atoms.select('within 1.0 of id 9 and hydrogen').tolist() == [10, 11]
+    # A methyl hydrogen and an oxygen of acetic acid are near the first water
+    assert atoms.select('within 3.3 of id 9 and not id 9').tolist() == [
+        2, 7, 10, 11
+    ]
+    assert atoms.select('within 0 of element O').tolist() == [6, 7, 9, 12, 15]
+    assert atoms.select('within 5 of none').size == 0
+
+
+def test_atoms_selection(CH3COOH_3H2O):
+    """Test the selection argument to atoms()."""
+    atoms = CH3COOH_3H2O.atoms
+    ids = [row['id'] for row in atoms.atoms(selection='element O')]
+    assert ids == [6, 7, 9, 12, 15]
+    rows = atoms.atoms('atno', '==', 1, selection='within 1 of element O')
+    ids = [row['id'] for row in rows]
+    assert ids == [2, 10, 11, 13, 14, 16, 17]
+
+
+def test_make_subset(CH3COOH_3H2O):
+    """Test making a subset from a selection."""
+    system = CH3COOH_3H2O
+    tid = system.templates.create('oxygens', 'group')
+    sid = system.atoms.select('element O', template=tid)
+    assert system.atoms.atom_ids(subset=sid) == [6, 7, 9, 12, 15]
+
+    # Indices are relative to a subset, so cannot be used to make one
+    with pytest.raises(ValueError):
+        system.atoms.select('element O', template=tid, as_indices=True)
+
+
+def brute_force(points, sources, cutoff, transform=None):
+    """Check all pairs, and images for periodic systems."""
+    result = numpy.zeros(points.shape[0], dtype=bool)
+    images = [numpy.zeros(3)]
+    if transform is not None:
+        images = [
+            numpy.array([i, j, k])
+            for i in range(-2, 3)
+            for j in range(-2, 3)
+            for k in range(-2, 3)
+        ]
+    for q in points[sources]:
+        for image in images:
+            delta = points - q + image
+            if transform is not None:
+                delta = delta @ transform
+            result |= numpy.linalg.norm(delta, axis=1) <= cutoff
+    return result
+
+
+def test_within_random():
+    """Compare the cell-list search with checking all pairs."""
+    rng = numpy.random.default_rng(12345)
+    points = rng.uniform(-10, 10, size=(500, 3))
+    sources = rng.uniform(size=500) < 0.05
+    candidates = rng.uniform(size=500) < 0.7
+    for cutoff in (0.5, 2.0, 7.0, 50.0):
+        result = _within(points, sources, cutoff, candidates)
+        correct = brute_force(points, sources, cutoff) & candidates
+        assert numpy.array_equal(result, correct)
+
+
+def test_within_periodic():
+    """Compare with all pairs in a triclinic cell."""
+    rng = numpy.random.default_rng(54321)
+    cell = Cell(8.0, 9.0, 10.0, 70, 100, 115)
+    transform = cell.to_cartesians_transform(as_array=True)
+    points = rng.uniform(-0.5, 1.5, size=(300, 3))
+    sources = rng.uniform(size=300) < 0.05
+    candidates = numpy.ones(300, dtype=bool)
+    for cutoff in (1.0, 3.0, 4.5, 8.0):
+        result = _within(points, sources, cutoff, candidates, transform)
+        correct = brute_force(points, sources, cutoff, transform)
+        assert numpy.array_equal(result, correct)
+
+
+def test_within_crystal(copper):
+    """Test the periodic search using a crystal."""
+    atoms = copper.atoms
+    # The nearest neighbors in FCC are at a/sqrt(2) = 2.556
+    assert atoms.select('within 2.5 of id 1').tolist() == [1]
+    assert atoms.select('within 2.6 of id 1').tolist() == [1, 2, 3, 4]
@@ -4,6 +4,8 @@
 import pytest  # noqa: F401
 """Tests for handling SMILES."""
 
+from openbabel import openbabel
+
 
 def test_to_smiles(AceticAcid):
     """Create a SMILES string from a system"""
@@ -69,3 +71,102 @@ def test_from_smiles(system):
         print(result)
 
     assert result == correct
+
+
+def test_from_smiles_many(system):
+    """Create a configuration for each of several SMILES"""
+    configurations = system.from_smiles_many(
+        ['OC(=O)C', 'O', 'c1ccccc1'],
+        names=['acetic acid', 'water', 'benzene']
+    )
+    assert len(configurations) == 3
+    assert configurations[0] == system.current_configuration
+    assert system.n_atoms(configuration=configurations[1]) == 3
+    assert system.n_bonds(configuration=configurations[2]) == 12
+    assert system.name == 'acetic acid'
+
+    smiles = system.to_smiles_many(configurations, canonical=True, name=True)
+    assert smiles == [
+        ['CC(=O)O', 'acetic acid'], ['O', 'water'], ['c1ccccc1', 'benzene']
+    ]
+
+
+def test_from_smiles_many_systems(system):
+    """Create a system for each SMILES, in several processes"""
+    systems = system.from_smiles_many(
+        ['OC(=O)C', '[O-]C(=O)C'], as_systems=True, processes=2
+    )
+    try:
+        assert systems[0] is system
+        assert systems[1].to_smiles(canonical=True) == '[O-]C(=O)C'
+    finally:
+        del system.parent[systems[1].nickname]
+
+
+def test_from_smiles_error(system):
+    """Invalid SMILES"""
+    with pytest.raises(ValueError):
+        system.from_smiles('C1CC(')
+
+
+def test_to_smiles_many(CH3COOH_3H2O):
+    """The SMILES for several configurations, in several processes"""
+    system = CH3COOH_3H2O
+    first = system.current_configuration
+    system.add_configuration()
+    assert system.to_smiles_many(processes=2) == ['CC(=O)O.O.O.O', '']
+    assert system.to_smiles_many([first]) == ['CC(=O)O.O.O.O']
+
+
+def test_to_OBMol(AceticAcid):
+    """The OpenBabel molecule is cached until the atoms change"""
+    system = AceticAcid
+    mol = system.to_OBMol()
+    assert mol.NumAtoms() == 8
+    assert mol.NumBonds() == 7
+    assert system.to_OBMol() is mol
+
+    system.atoms.append(x=5.0, y=5.0, z=5.0, atno=8)
+    other = system.to_OBMol()
+    assert other is not mol
+    assert other.NumAtoms() == 9
+    assert system.to_smiles() == 'CC(=O)O.O'
+
+
+def test_to_smiles_cached_title(CH3COOH_3H2O):
+    """Writing SMILES with names does not change the cached molecules"""
+    system = CH3COOH_3H2O
+    first = system.current_configuration
+    system.name = 'renamed'
+    mol = system.to_OBMol()
+    title = mol.GetTitle()
+    assert title != 'renamed'
+    assert system.to_smiles(name=True) == ['CC(=O)O.O.O.O', 'renamed']
+    assert system.to_smiles_many(name=True) == [['CC(=O)O.O.O.O', 'renamed']]
+    assert system.to_OBMol(configuration=first) is mol
+    assert mol.GetTitle() == title
+
+
+def test_to_OBMol_subset(CH3COOH_3H2O):
+    """The OpenBabel molecule for a subset"""
+    system = CH3COOH_3H2O
+    tid = system.templates.create('oxygens', 'group')
+    sid = system.atoms.select('element O', template=tid)
+    mol = system.to_OBMol(subset=sid)
+    assert mol.NumAtoms() == 5
+    atoms = openbabel.OBMolAtomIter(mol)
+    assert [atom.GetAtomicNum() for atom in atoms] == [8] * 5
+
+
+def test_from_OBMol(AceticAcid):
+    """Copy a molecule from one system to another"""
+    other = AceticAcid.parent.create_system('other', temporary=True)
+    try:
+        configuration = other.from_OBMol(AceticAcid.to_OBMol())
+        assert configuration == other.current_configuration
+        assert other.n_atoms() == 8
+        assert other.n_bonds() == 7
+        assert other.atoms.symbols() == AceticAcid.atoms.symbols()
+        assert other.to_smiles(canonical=True) == 'CC(=O)O'
+    finally:
+        del AceticAcid.parent['other']
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the index of atoms in subsets."""
+
+import numpy
+import pytest  # noqa: F401
+
+
+def test_construction(CH3COOH_3H2O):
+    """Simplest test that we can make an index"""
+    index = CH3COOH_3H2O.subsets.index()
+    assert str(type(index)) == "<class 'molsystem.subset_index._SubsetIndex'>"
+    assert index.n_atoms == 17
+    assert index.atom_ids.tolist() == [*range(1, 18)]
+
+
+def test_atoms(CH3COOH_3H2O):
+    """Test getting the atoms in a subset."""
+    system = CH3COOH_3H2O
+    sids = system.create_molecule_subsets()
+    index = system.subsets.index()
+    assert index.atoms(sids[1]).tolist() == [9, 10, 11]
+    assert index.atoms(sids[1], as_indices=True).tolist() == [8, 9, 10]
+
+
+def test_atoms_in(CH3COOH_3H2O):
+    """Test getting the atoms in several subsets."""
+    system = CH3COOH_3H2O
+    sids = system.create_molecule_subsets()
+    index = system.subsets.index()
+    atoms = index.atoms_in([sids[3], sids[1]])
+    assert atoms.tolist() == [9, 10, 11, 15, 16, 17]
+
+
+def test_labels(CH3COOH_3H2O):
+    """Test labeling atoms by molecule."""
+    system = CH3COOH_3H2O
+    sids = system.create_molecule_subsets()
+    tid = system.templates.find('all', 'molecule')
+    index = system.subsets.index()
+    labels = index.labels(template=tid)
+    correct = [sids[0]] * 8 + [sids[1]] * 3 + [sids[2]] * 3 + [sids[3]] * 3
+    assert labels.tolist() == correct
+
+    labels = index.labels([sids[2]])
+    assert numpy.count_nonzero(labels == -1) == 14
+
+
+def test_subsets(CH3COOH_3H2O):
+    """Test the subsets that an atom is in."""
+    system = CH3COOH_3H2O
+    sids = system.create_molecule_subsets()
+    index = system.subsets.index()
+    all_subset = system.all_subset()
+    assert index.subsets(12).tolist() == [all_subset, sids[2]]
+
+
+def test_missing_subset(CH3COOH_3H2O):
+    """Test asking for a subset that does not exist."""
+    index = CH3COOH_3H2O.subsets.index()
+    with pytest.raises(KeyError):
+        index.atoms(1000)
+
+
+def test_invalidation(CH3COOH_3H2O):
+    """Test that the index is rebuilt when the subsets change."""
+    system = CH3COOH_3H2O
+    index = system.subsets.index()
+    assert system.subsets.index() is index
+    assert index.n_subsets == 1
+
+    system.create_molecule_subsets()
+    index2 = system.subsets.index()
+    assert index2 is not index
+    assert index2.n_subsets == 5
+
+    system.atoms.remove(atoms=[15, 16, 17])
+    index3 = system.subsets.index()
+    assert index3 is not index2
+    assert index3.n_atoms == 14
+    assert index3.atom_ids.tolist() == [*range(1, 15)]
+
+
+def test_unchanged_by_coordinates(CH3COOH_3H2O):
+    """Changing the coordinates does not invalidate the index."""
+    system = CH3COOH_3H2O
+    index = system.subsets.index()
+    xyz = system.atoms.coordinates()
+    system.atoms.set_coordinates(xyz)
+    assert system.subsets.index() is index
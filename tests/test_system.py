@@ -3,10 +3,19 @@
 
 """Tests for the system class."""
 
+import os
 import pprint
+import sqlite3
+import subprocess
+import sys
+
+import numpy
 
 import pytest  # noqa: F401
 
+import molsystem
+from molsystem.elemental_data import element_data
+
 
 def test_construction(system):
     """Simplest test that we can make a System object"""
@@ -14,6 +23,24 @@ def test_construction(system):
     del system
 
 
+def test_lazy_imports():
+    """Test that importing molsystem does not import OpenBabel or Pandas."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(molsystem.__file__))
+    code = (
+        'import sys, molsystem\n'
+        "print(*[m for m in ('openbabel', 'pandas') if m in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    assert result.stdout.strip() == ''
+
+
 def test_version_empty(system):
     """Simplest test that we can make a System object"""
     assert system.version == 0
@@ -72,6 +99,32 @@ def test_formula_periodic(vanadium):
     assert Z == 2
 
 
+def test_formula_changes(AceticAcid):
+    """Test that the formula follows changes to the atoms."""
+    system = AceticAcid
+    assert ''.join(system.formula()[0]) == 'C2H4O2'
+    assert system.formula() == system.formula()
+
+    system.atoms.append(x=3.0, y=0.0, z=0.0, symbol=['Cl'])
+    assert ''.join(system.formula()[0]) == 'C2H4ClO2'
+
+
+def test_mass(CH3COOH_3H2O):
+    """Test the mass of a configuration and of a subset."""
+    system = CH3COOH_3H2O
+    masses = system.atoms.atomic_masses()
+    assert system.mass() == pytest.approx(sum(masses))
+
+    sids = system.create_molecule_subsets()
+    water = system.mass(subset=sids[1])
+    assert water == pytest.approx(sum(system.default_masses(['O', 'H', 'H'])))
+
+    system.atoms.append(x=3.0, y=0.0, z=0.0, symbol=['Cl'])
+    chlorine = system.default_masses(['Cl'])[0]
+    assert system.mass() == pytest.approx(sum(masses) + chlorine)
+    assert system.mass(subset=sids[1]) == water
+
+
 def test_clear(CH3COOH_3H2O):
     """Test making subsets for the molecules."""
     result = [2, 3, 4, 5]
@@ -91,3 +144,384 @@ def test_density(vanadium):
     """Test the density, and implicitly the mass and volume."""
 
     assert abs(vanadium.density() - 6.0817308915133) < 1.0e-06
+
+
+def test_cached_statements(system):
+    """Test the size of the cache of prepared statements."""
+    assert system.cached_statements == 256
+
+    systems = system.parent
+    other = systems.create_system(
+        'cached', temporary=True, cached_statements=16
+    )
+    assert other.cached_statements == 16
+    del systems['cached']
+
+
+def test_profiles(system, tmp_path):
+    """Test the profiles of pragmas for the database."""
+    assert system.profile == 'default'
+
+    def pragma(system, name):
+        return system.db.execute(f'PRAGMA {name}').fetchone()[0]
+
+    systems = system.parent
+    path = tmp_path / 'fast.db'
+    fast = systems.create_system('fast', temporary=True, profile='fast')
+    try:
+        assert fast.profile == 'fast'
+        assert pragma(fast, 'journal_mode') == 'wal'
+        assert pragma(fast, 'synchronous') == 1
+        assert pragma(fast, 'cache_size') == -64000
+        assert pragma(fast, 'mmap_size') == 256 * 1024**2
+        assert pragma(fast, 'temp_store') == 2
+        assert pragma(fast, 'page_size') == 4096
+        fast.atoms.append(x=0.0, y=0.0, z=0.0, atno=6)
+        fast.db.commit()
+        fast.db.execute(f"VACUUM INTO '{path}'")
+    finally:
+        del systems['fast']
+
+    # The page size of an existing file does not change.
+    other = systems.open_system(path, name='other', profile='bulk')
+    try:
+        assert pragma(other, 'journal_mode') == 'wal'
+        assert pragma(other, 'synchronous') == 0
+        assert pragma(other, 'page_size') == 4096
+        assert other.atoms.n_atoms() == 1
+    finally:
+        del systems['other']
+
+    other = systems.create_system(
+        'other', temporary=True, profile={'synchronous': 'OFF'}
+    )
+    try:
+        assert pragma(other, 'journal_mode') == 'delete'
+        assert pragma(other, 'synchronous') == 0
+    finally:
+        del systems['other']
+
+    with pytest.raises(ValueError, match='unknown'):
+        systems.create_system('unknown', temporary=True, profile='unknown')
+    assert 'unknown' not in systems
+
+
+def test_memory(AceticAcid, tmp_path):
+    """Test a system in memory, and saving and loading it."""
+    systems = AceticAcid.parent
+    memory = systems.create_system('memory', memory=True)
+    try:
+        assert memory.in_memory
+        assert not AceticAcid.in_memory
+        assert memory.filename.startswith('file:')
+
+        memory.from_smiles('CC(=O)O')
+        path = tmp_path / 'saved.db'
+        steps = []
+        memory.save(path, pages=1, progress=lambda *args: steps.append(args))
+        assert len(steps) > 1
+        assert steps[-1][1] == 0  # Nothing remaining
+    finally:
+        del systems['memory']
+
+    other = systems.create_system('other', memory=True)
+    try:
+        other.load(path)
+        assert other.formula() == AceticAcid.formula()
+        assert other.to_smiles(canonical=True) == 'CC(=O)O'
+        assert other.current_configuration in other.configurations
+    finally:
+        del systems['other']
+
+
+def test_memory_copy(AceticAcid):
+    """Test copying a system into memory, and checkpoints in memory."""
+    systems = AceticAcid.parent
+    copy = systems.copy_system(AceticAcid, name='copy', memory=True)
+    try:
+        assert copy.in_memory
+        assert copy.formula() == AceticAcid.formula()
+
+        # A failure restores the checkpoint
+        with pytest.raises(ZeroDivisionError):
+            with copy as tmp:
+                tmp.atoms.append(x=0.0, y=0.0, z=0.0, symbol=['Cl'])
+                1 / 0
+        assert copy.formula() == AceticAcid.formula()
+        assert copy._attached == []
+
+        with copy as tmp:
+            tmp.atoms.append(x=0.0, y=0.0, z=0.0, symbol=['Cl'])
+        assert ''.join(copy.formula()[0]) == 'C2H4ClO2'
+        assert copy.version == 1
+        assert copy._attached == []
+        assert [*systems] == ['seamm', 'copy']
+    finally:
+        del systems['copy']
+
+
+def test_attributes_cache(system):
+    """The cached attributes must follow changes to the table."""
+    table = system.create_table('table1')
+    assert table.attributes == {}
+    table.add_attribute('data', coltype='int')
+    assert [*table.attributes] == ['data']
+    table.add_attribute('more', coltype='float')
+    assert [*table.attributes] == ['data', 'more']
+    del table['data']
+    assert [*table.attributes] == ['more']
+    del system['table1']
+    assert system['table1'].attributes == {}
+
+
+def test_cached_scalars(system):
+    """Test that the cached values in the system table are written through."""
+    assert system.periodicity == 0
+    system.periodicity = 3
+    system.coordinate_system = 'frac'
+    system.name = 'crystal'
+    assert system.periodicity == 3
+    assert system.coordinate_system == 'fractional'
+    assert system.name == 'crystal'
+    row = system.db.execute(
+        "SELECT name, periodicity, coordinatesystem FROM system"
+    ).fetchone()
+    assert tuple(row) == ('crystal', 3, 'fractional')
+
+
+def test_scalars_other_connection(system):
+    """Changes by another connection to the database are seen."""
+    assert system.name == 'seamm'
+    system.db.commit()
+
+    db = sqlite3.connect(system.filename)
+    db.execute("UPDATE system SET name = 'changed', periodicity = 3")
+    db.commit()
+    db.close()
+
+    assert system.name == 'changed'
+    assert system.periodicity == 3
+
+
+def test_scalars_new_transaction(system):
+    """Test the cached name after other connections change it between
+    transactions."""
+    # Read the name twice inside a transaction, then end it
+    system.db.execute('UPDATE atom SET atno = atno')
+    assert system.name == 'seamm'
+    assert system.name == 'seamm'
+    system.db.commit()
+
+    db = sqlite3.connect(system.filename)
+    db.execute("UPDATE system SET name = 'changed'")
+    db.commit()
+    db.close()
+
+    # Changes that commit, then start a new transaction
+    system.atoms.append(x=0.0, y=0.0, z=0.0, atno=6)
+    system.db.execute('UPDATE atom SET atno = atno')
+    assert system.name == 'changed'
+    system.db.commit()
+
+
+def test_indexes(system, tmp_path):
+    """Test that the indexes exist, and are added to older files."""
+    sql = "SELECT name FROM sqlite_master WHERE type = 'index'"
+    names = {row[0] for row in system.db.execute(sql)}
+    assert 'idx_subset_atom_subset_templateatom' in names
+
+    path = tmp_path / 'old.db'
+    system.db.execute(f"VACUUM INTO '{path}'")
+    db = sqlite3.connect(path)
+    db.execute('DROP INDEX idx_subset_atom_subset_templateatom')
+    db.commit()
+    db.close()
+    other = system.parent.open_system(path, name='old')
+    try:
+        assert names <= {row[0] for row in other.db.execute(sql)}
+    finally:
+        del system.parent['old']
+
+
+def test_element_data(system):
+    """Test the data in the table of elements."""
+    rows = system.db.execute('SELECT atno, symbol, mass FROM element')
+    rows = rows.fetchall()
+    assert len(rows) == 118
+    for atno, symbol, mass in rows:
+        assert element_data[symbol]['atomic number'] == atno
+        assert element_data[symbol]['atomic weight'] == mass
+
+
+def test_elements_reopened(AceticAcid, tmp_path):
+    """Test the element data in a system read from a file."""
+    path = tmp_path / 'reopened.db'
+    AceticAcid.db.execute(f"VACUUM INTO '{path}'")
+    other = AceticAcid.parent.open_system(path, name='reopened')
+    try:
+        assert other.to_atnos(['C', 'O']) == [6, 8]
+        assert other.to_symbols([1, 6]) == ['H', 'C']
+        mass = element_data['O']['atomic weight']
+        assert other.default_masses(atnos=[8]) == [mass]
+
+        configuration = AceticAcid.current_configuration
+        text = other.to_molfile_text(configuration=configuration)
+        assert text == AceticAcid.to_molfile_text()
+    finally:
+        del AceticAcid.parent['reopened']
+
+
+def test_to_atnos_array(system):
+    """Test converting an array of symbols to atomic numbers."""
+    symbols = numpy.array(['C', 'H', 'Og', 'Zr', 'Ac', 'H'])
+    atnos = system.to_atnos(symbols)
+    assert isinstance(atnos, numpy.ndarray)
+    assert atnos.tolist() == system.to_atnos(symbols.tolist())
+
+    with pytest.raises(KeyError, match='Zz'):
+        system.to_atnos(numpy.array(['C', 'Zz']))
+
+
+def test_to_symbols_array(system):
+    """Test converting an array of atomic numbers to symbols."""
+    atnos = numpy.array([[1, 6], [118, 8]])
+    symbols = system.to_symbols(atnos)
+    assert symbols.tolist() == [['H', 'C'], ['Og', 'O']]
+
+    with pytest.raises(KeyError):
+        system.to_symbols(numpy.array([0, 1]))
+
+
+def test_default_masses_array(system):
+    """Test getting the masses for arrays of symbols or atomic numbers."""
+    masses = system.default_masses(atnos=[1, 6, 8])
+    atnos = numpy.array([1, 6, 8])
+    assert system.default_masses(atnos=atnos).tolist() == masses
+    symbols = numpy.array(['H', 'C', 'O'])
+    assert system.default_masses(symbols=symbols).tolist() == masses
+    assert len(system.default_masses()) == 118
+
+
+def test_append_symbol_array(system):
+    """Test adding atoms given an array of symbols."""
+    symbols = numpy.array(['C', 'O', 'O'])
+    system.atoms.append(x=0.0, y=0.0, z=[0.0, 1.2, -1.2], symbol=symbols)
+    assert system.atoms.symbols() == ['C', 'O', 'O']
+
+
+def test_batch(system):
+    """Test committing many changes at once."""
+    other = sqlite3.connect(system.filename)
+    n = other.execute('SELECT COUNT(*) FROM atom').fetchone()[0]
+    with system.batch():
+        with system.batch():
+            system.atoms.append(x=0.0, y=0.0, z=0.0, atno=6)
+        system.atoms.append(x=1.0, y=0.0, z=0.0, atno=8)
+        # Not yet committed, so not seen by other connections
+        assert other.execute('SELECT COUNT(*) FROM atom').fetchone()[0] == n
+    assert other.execute('SELECT COUNT(*) FROM atom').fetchone()[0] == n + 2
+
+    # The changes are committed even if there is an error
+    with pytest.raises(ZeroDivisionError):
+        with system.batch():
+            system.atoms.append(x=2.0, y=0.0, z=0.0, atno=1)
+            1 / 0
+    assert other.execute('SELECT COUNT(*) FROM atom').fetchone()[0] == n + 3
+    other.close()
+
+
+def test_supercell(copper):
+    """Test making a supercell of a crystal."""
+    system = copper
+    density = system.density()
+    system.make_supercell(2, 3, 2)
+    assert system.n_atoms() == 48
+    assert system.cell.cell().equal([7.22982, 10.84473, 7.22982, 90, 90, 90])
+    assert system.density() == pytest.approx(density)
+    assert system.atoms.symbols() == ['Cu'] * 48
+
+    uvw = numpy.array(system.atoms.coordinates())
+    assert numpy.all((uvw >= 0.0) & (uvw < 1.0))
+    # Each atom has 12 nearest neighbors in FCC
+    cell = system.cell.cell()
+    xyz = cell.to_cartesians(uvw, as_array=True)
+    i, j, r = cell.pairs(xyz, 2.6)
+    assert numpy.bincount(numpy.concatenate((i, j))).tolist() == [12] * 48
+
+
+def test_supercell_shared(copper):
+    """Test supercells of configurations sharing atoms or the cell."""
+    system = copper
+    first = system.current_configuration
+    cell = system.cell.cell()
+    uvw = system.atoms.coordinates()
+    symbols = system.atoms.symbols()
+
+    shared = system.add_configuration()
+    with pytest.raises(RuntimeError):
+        system.make_supercell(2, 1, 1, configuration=shared)
+    assert system.n_atoms() == 4
+
+    # A configuration with its own atoms, but sharing the cell
+    second = system.add_configuration(changed_atoms=True, changed_bonds=True)
+    system.atoms.append(
+        configuration=second,
+        x=[x for x, y, z in uvw],
+        y=[y for x, y, z in uvw],
+        z=[z for x, y, z in uvw],
+        symbol=symbols
+    )
+    cell_id, _ = system.cell.cell_id(first)
+    system.db.execute(
+        "UPDATE configuration SET cell = ? WHERE id = ?", (cell_id, second)
+    )
+    system.mark_changed('configuration')
+
+    system.make_supercell(2, 1, 1, configuration=second)
+    assert system.n_atoms(configuration=second) == 8
+    assert system.cell.cell(second).equal(
+        [7.22982, 3.61491, 3.61491, 90, 90, 90]
+    )
+    assert system.cell.cell(first) == cell
+    assert system.atoms.coordinates(configuration=first) == uvw
+
+
+def test_supercell_bonds(system):
+    """Test replicating bonds, including those crossing the cell."""
+    system.periodicity = 3
+    system.coordinate_system = 'Cartesian'
+    system.cell.set_cell(3.0, 10.0, 10.0, 90, 90, 90)
+    ids = system.atoms.append(
+        x=[0.5, 1.5, 2.5], y=[1.0, 1.0, 1.0], z=[1.0, 1.0, 1.0], symbol='C'
+    )
+    system.bonds.append(i=ids, j=[ids[1], ids[2], ids[0]], bondorder=2)
+    tid = system.templates.create('group', 'group')
+    system.subsets.create(tid, atoms=ids[0:2])
+
+    system.make_supercell(3, 1, 1)
+    assert system.n_atoms() == 9
+    assert system.n_bonds() == 9
+
+    xyz = numpy.array(system.atoms.coordinates(fractionals=False))
+    assert xyz[:, 0].tolist() == pytest.approx(
+        [0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5, 8.5]
+    )
+
+    # Every bond is 1 Å and every atom has two
+    cell = system.cell.cell()
+    atom_ids = system.atoms.atom_ids()
+    index = {atom_id: n for n, atom_id in enumerate(atom_ids)}
+    i = []
+    j = []
+    for row in system.bonds.bonds():
+        i.append(index[row['i']])
+        j.append(index[row['j']])
+        assert row['bondorder'] == 2
+    assert cell.distances(xyz[i], xyz[j]).tolist() == pytest.approx([1.0] * 9)
+    assert numpy.bincount(i + j).tolist() == [2] * 9
+
+    # and the subsets
+    sids = system.subsets.find(tid)
+    assert len(sids) == 3
+    members = [system.atoms.atom_ids(subset=sid) for sid in sids]
+    assert members == [atom_ids[0:2], atom_ids[3:5], atom_ids[6:8]]
@@ -3,17 +3,24 @@
 
 import numpy
 import pytest  # noqa: F401
+import io
 import os
 import os.path
 import shutil
+import subprocess
+import sys
 import tempfile
 import time
 
-from molsystem import Systems  # noqa: F401
+import molsystem
+from molsystem import Cell, Systems  # noqa: F401
 """Tests for the System classes."""
 
 natoms = 1000000
 
+# The most time that importing molsystem should take, in seconds
+import_budget = 0.5
+
 
 @pytest.fixture(scope="module")
 def msystem():
@@ -84,3 +91,580 @@ def test_selection(matoms):
     print(f'\nFound {n} carbon atoms in {natoms} atoms')
     print(f'There should be about {int(natoms / 100)}')
     assert atom['atno'] == 6
+
+
+@pytest.mark.timing
+def test_select(matoms):
+    """Time selecting atoms with the selection language."""
+    t0 = time.perf_counter()
+    ids = matoms.select('element C and x < 50')
+    t1 = time.perf_counter()
+    print(f'\nSelecting {ids.size} carbon atoms took {t1-t0:.3} s')
+
+    n = 0
+    for atom in matoms.atoms('atno', '==', 6, 'x', '<', 50):
+        n += 1
+    assert ids.size == n
+
+
+@pytest.mark.timing
+def test_select_within(matoms):
+    """Time selecting atoms near others in a million atoms."""
+    t0 = time.perf_counter()
+    ids = matoms.select('within 3.0 of element C and not hydrogen')
+    t1 = time.perf_counter()
+    print(
+        f'\nSelecting {ids.size} atoms within 3 Å of carbon took '
+        f'{t1-t0:.3} s'
+    )
+    assert ids.size > 0
+
+
+@pytest.mark.timing
+def test_accessor_overhead(AceticAcid):
+    """Time the per-call overhead of common accessors on a small system."""
+    system = AceticAcid
+    atoms = system.atoms
+    bonds = system.bonds
+    n = 2000
+    print(f'\nPer-call overhead, averaged over {n} calls:')
+    for label, function in (
+        ('atoms.atoms()', lambda: atoms.atoms().fetchall()),
+        ("atoms.get_column('x')", lambda: atoms.get_column('x')),
+        ("atoms['atno']", lambda: atoms['atno']),
+        ('atoms.attributes', lambda: atoms.attributes),
+        ('atoms.n_atoms()', lambda: atoms.n_atoms()),
+        ('bonds.bonds()', lambda: bonds.bonds().fetchall()),
+        ("bonds.get_column('i')", lambda: bonds.get_column('i')),
+        ('bonds.contains_bond((1, 2))', lambda: bonds.contains_bond((1, 2))),
+        ('cell.cell_id()', lambda: system.cell.cell_id()),
+    ):
+        t0 = time.perf_counter()
+        for i in range(n):
+            function()
+        t1 = time.perf_counter()
+        print(f'    {label:30s} {(t1 - t0) / n * 1.0e6:8.1f} μs')
+
+
+@pytest.mark.timing
+def test_minimum_image_distances():
+    """Compare the minimum-image kernels with a naive implementation."""
+    rng = numpy.random.default_rng(5)
+    n = 3000
+    for parameters in (
+        (30.0, 30.0, 30.0, 90, 90, 90), (30.0, 32.0, 34.0, 80, 95, 105)
+    ):
+        cell = Cell(*parameters)
+        xyz = cell.to_cartesians(rng.uniform(size=(n, 3)), as_array=True)
+
+        # Naive: every pair against all 27 neighboring images
+        T = cell.to_cartesians_transform(as_array=True)
+        images = (numpy.indices((3, 3, 3)).reshape(3, -1).T - 1.0) @ T
+        t0 = time.perf_counter()
+        naive = numpy.empty((n, n))
+        for i in range(n):
+            delta = xyz - xyz[i]
+            trial = delta[:, numpy.newaxis, :] + images
+            naive[i] = numpy.sqrt((trial**2).sum(axis=2).min(axis=1))
+        t1 = time.perf_counter()
+        distances = cell.pairwise_distances(xyz)
+        t2 = time.perf_counter()
+        i, j, r = cell.pairs(xyz, 10.0)
+        t3 = time.perf_counter()
+
+        assert numpy.allclose(distances, naive)
+        assert i.size == numpy.count_nonzero(numpy.triu(naive <= 10.0, k=1))
+
+        pairs = n * n / 1.0e6
+        print(
+            f'\nCell {parameters}, {n} points:'
+            f'\n    naive              {pairs / (t1 - t0):8.1f} M pairs/s'
+            f'\n    pairwise_distances {pairs / (t2 - t1):8.1f} M pairs/s'
+            f'\n    pairs within 10 Å  {pairs / 2 / (t3 - t2):8.1f} M pairs/s'
+        )
+
+
+@pytest.mark.timing
+def test_supercell(copper):
+    """Time building a supercell of a million atoms."""
+    system = copper
+    ids = system.atoms.atom_ids()
+    system.bonds.append(i=ids[0], j=ids[1:])
+    t0 = time.perf_counter()
+    system.make_supercell(63, 63, 63)
+    t1 = time.perf_counter()
+    print(
+        f'\nMaking a supercell with {system.n_atoms()} atoms and '
+        f'{system.n_bonds()} bonds took {t1 - t0:.3} s'
+    )
+    assert system.n_atoms() == 4 * 63**3
+
+
+@pytest.mark.timing
+def test_cif_symmetry(system):
+    """Time reading a CIF file with many sites and high symmetry."""
+    from tests.test_cif import cif_cu
+
+    rng = numpy.random.default_rng(3)
+    n = 1000
+    lines = cif_cu.split('\n')
+    last = max(i for i, line in enumerate(lines) if 'Cu1 Cu' in line)
+    lines = lines[:last]
+    for i, (x, y, z) in enumerate(rng.uniform(size=(n, 3)).tolist()):
+        lines.append(f'Cu{i+1} Cu 192 l {x:.5f} {y:.5f} {z:.5f} 1.00000')
+    text = '\n'.join(lines)
+
+    t0 = time.perf_counter()
+    system.from_cif_text(text)
+    t1 = time.perf_counter()
+    print(
+        f'\nReading a CIF file with {n} sites and {system.n_atoms()} atoms '
+        f'took {t1 - t0:.3} s'
+    )
+    assert system.n_atoms() > 190 * n
+
+
+def mmcif_text(n_atoms, n_models=1):
+    """The text of an mmCIF file with n_atoms atoms in each model."""
+    rng = numpy.random.default_rng(7)
+    names = ('N', 'CA', 'C', 'O', 'CB')
+    lines = [
+        'data_TEST', '#', '_entry.id TEST', '#', 'loop_',
+        '_atom_site.group_PDB', '_atom_site.id', '_atom_site.type_symbol',
+        '_atom_site.label_atom_id', '_atom_site.label_alt_id',
+        '_atom_site.label_comp_id', '_atom_site.label_asym_id',
+        '_atom_site.label_entity_id', '_atom_site.label_seq_id',
+        '_atom_site.pdbx_PDB_ins_code', '_atom_site.Cartn_x',
+        '_atom_site.Cartn_y', '_atom_site.Cartn_z', '_atom_site.occupancy',
+        '_atom_site.B_iso_or_equiv', '_atom_site.pdbx_formal_charge',
+        '_atom_site.auth_seq_id', '_atom_site.auth_comp_id',
+        '_atom_site.auth_asym_id', '_atom_site.auth_atom_id',
+        '_atom_site.pdbx_PDB_model_num'
+    ]
+    xyz = rng.uniform(-50, 50, size=(n_atoms, 3)).tolist()
+    for model in range(1, n_models + 1):
+        for i, (x, y, z) in enumerate(xyz):
+            name = names[i % 5]
+            seq = i // 5 + 1
+            lines.append(
+                f'ATOM {i + 1} {name[0]} {name} . ALA A 1 {seq} ? {x:.3f} '
+                f'{y:.3f} {z:.3f} 1.00 20.00 ? {seq} ALA A {name} {model}'
+            )
+    lines.append('#')
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.mark.timing
+def test_read_mmcif():
+    """Time reading a multi-megabyte mmCIF file."""
+    from molsystem.cif_reader import read_cif
+
+    n = 200000
+    text = mmcif_text(n)
+    dtypes = {f'_atom_site.cartn_{x}': float for x in 'xyz'}
+
+    t0 = time.perf_counter()
+    blocks = [*read_cif(io.StringIO(text), dtypes=dtypes)]
+    t1 = time.perf_counter()
+    print(
+        f'\nReading {len(text) / 1.0e6:.1f} MB of mmCIF with {n} atoms took '
+        f'{t1 - t0:.3} s'
+    )
+    assert blocks[0][1]['_atom_site.cartn_x'].size == n
+
+    CifFile = pytest.importorskip('CifFile')
+    n = 20000
+    text = mmcif_text(n)
+    t0 = time.perf_counter()
+    [*read_cif(io.StringIO(text), dtypes=dtypes)]
+    t1 = time.perf_counter()
+    cif = CifFile.ReadCif(io.StringIO(text))
+    assert len(cif['TEST']['_atom_site.Cartn_x']) == n
+    t2 = time.perf_counter()
+    print(
+        f'For {n} atoms the reader took {t1 - t0:.3} s and PyCifRW took '
+        f'{t2 - t1:.3} s'
+    )
+
+
+@pytest.mark.timing
+def test_mmcif_file(tmp_path):
+    """Time reading a 1M atom mmCIF file, and the memory needed."""
+    import tracemalloc
+
+    n = 1000000
+    path = tmp_path / 'big.cif'
+    path.write_text(mmcif_text(n))
+    size = path.stat().st_size / 1.0e6
+
+    systems = Systems()
+    system = systems.create_system('timing', temporary=True)
+    t0 = time.perf_counter()
+    system.from_mmcif_file(path)
+    t1 = time.perf_counter()
+    print(
+        f'\nReading {size:.0f} MB of mmCIF with {n} atoms took {t1 - t0:.3} s'
+    )
+    assert system.n_atoms() == n
+    del systems['timing']
+
+    system = systems.create_system('memory', temporary=True)
+    tracemalloc.start()
+    system.from_mmcif_file(path)
+    peak = tracemalloc.get_traced_memory()[1] / 1.0e6
+    tracemalloc.stop()
+    print(f'The peak memory used was {peak:.0f} MB')
+    del systems['memory']
+    assert peak < 500
+
+
+def pdb_text(n_atoms, n_models=1):
+    """The text of a PDB file with n_atoms atoms in each model."""
+    rng = numpy.random.default_rng(11)
+    names = (' N  ', ' CA ', ' C  ', ' O  ', ' CB ')
+    xyz = rng.uniform(-500, 500, size=(n_atoms, 3)).tolist()
+    lines = ['HEADER    TEST', 'REMARK   1 RANDOM ATOMS']
+    for model in range(1, n_models + 1):
+        if n_models > 1:
+            lines.append(f'MODEL     {model:4d}')
+        for i, (x, y, z) in enumerate(xyz):
+            name = names[i % 5]
+            resseq = (i // 5 + 1) % 10000
+            lines.append(
+                f'ATOM  {(i + 1) % 100000:5d} {name} ALA A{resseq:4d}    '
+                f'{x:8.3f}{y:8.3f}{z:8.3f}  1.00 20.00          '
+                f'{name.strip()[0]:>2s}'
+            )
+        if n_models > 1:
+            lines.append('ENDMDL')
+    lines.append('END')
+    return '\n'.join(lines)
+
+
+@pytest.mark.timing
+def test_from_pdb_text(system):
+    """Time reading a PDB file with 100k atoms."""
+    n = 100000
+    text = pdb_text(n)
+    t0 = time.perf_counter()
+    system.from_pdb_text(text)
+    t1 = time.perf_counter()
+    print(f'\nReading a PDB file with {n} atoms took {t1 - t0:.3} s')
+    assert system.n_atoms() == n
+
+
+@pytest.mark.timing
+def test_pdb_models(system, tmp_path):
+    """Time reading a PDB trajectory with 100 models of 10k atoms."""
+    n = 10000
+    n_models = 100
+    path = tmp_path / 'trajectory.pdb'
+    path.write_text(pdb_text(n, n_models))
+    t0 = time.perf_counter()
+    configurations = system.from_pdb_file(path)
+    t1 = time.perf_counter()
+    print(
+        f'\nReading {n_models} models of {n} atoms took {t1 - t0:.3} s, '
+        f'{(t1 - t0) / n_models * 1000:.3} ms per model'
+    )
+    assert len(configurations) == n_models
+    assert system.n_atoms(configuration=configurations[-1]) == n
+
+
+@pytest.mark.timing
+def test_to_pdb_text(system):
+    """Time writing a PDB file with nearly 100k atoms and bonds."""
+    n = 99999
+    system.from_pdb_text(pdb_text(n))
+    ids = system.atoms.atom_ids()
+    system.bonds.append(i=ids[:-1], j=ids[1:])
+    t0 = time.perf_counter()
+    text = system.to_pdb_text()
+    t1 = time.perf_counter()
+    print(f'\nWriting a PDB file with {n} atoms took {t1 - t0:.3} s')
+    assert text.count('\nATOM  ') == n
+    assert text.count('\nCONECT') == n
+
+
+@pytest.mark.timing
+def test_compressed_pdb_file(system, tmp_path):
+    """Time writing and reading a gzipped PDB file with 100k atoms."""
+    n = 100000
+    system.from_pdb_text(pdb_text(n))
+    path = tmp_path / 'big.pdb.gz'
+    t0 = time.perf_counter()
+    system.write(path)
+    t1 = time.perf_counter()
+    other = system.parent.create_system('other', temporary=True)
+    other.read(path)
+    t2 = time.perf_counter()
+    print(
+        f'\nWriting a gzipped PDB file with {n} atoms took {t1 - t0:.3} s '
+        f'and reading it {t2 - t1:.3} s'
+    )
+    assert other.n_atoms() == n
+    del system.parent['other']
+
+
+def sdf_text(n_molecules, n_atoms=20):
+    """An SD file of chains of carbon atoms, in V3000 format."""
+    atoms = '\n'.join(
+        f'M  V30 {i + 1} C {1.5 * i:.4f} 0.0 0.0 0' for i in range(n_atoms)
+    )
+    bonds = '\n'.join(
+        f'M  V30 {i + 1} 1 {i + 1} {i + 2}' for i in range(n_atoms - 1)
+    )
+    records = []
+    for n in range(n_molecules):
+        records.append(
+            f'molecule {n}\n  timing\n\n'
+            '  0  0  0     0  0            999 V3000\n'
+            'M  V30 BEGIN CTAB\n'
+            f'M  V30 COUNTS {n_atoms} {n_atoms - 1} 0 0 0\n'
+            f'M  V30 BEGIN ATOM\n{atoms}\nM  V30 END ATOM\n'
+            f'M  V30 BEGIN BOND\n{bonds}\nM  V30 END BOND\n'
+            'M  V30 END CTAB\nM  END\n'
+            f'> <ID>\n{n}\n\n$$$$\n'
+        )
+    return ''.join(records)
+
+
+@pytest.mark.timing
+def test_sdf(system):
+    """Time parsing, reading and writing an SD file of 10k molecules."""
+    from molsystem.molfile import read_sdf
+
+    n = 10000
+    text = sdf_text(n)
+    t0 = time.perf_counter()
+    records = [*read_sdf(io.StringIO(text))]
+    t1 = time.perf_counter()
+    configurations = system.from_molfile_text(io.StringIO(text))
+    t2 = time.perf_counter()
+    out = system.to_molfile_text(configuration=configurations)
+    t3 = time.perf_counter()
+    print(
+        f'\nFor {n} molecules of 20 atoms:\n'
+        f'   parsing: {n / (t1 - t0):9.0f} molecules/s\n'
+        f'   reading: {n / (t2 - t1):9.0f} molecules/s\n'
+        f'   writing: {n / (t3 - t2):9.0f} molecules/s'
+    )
+    assert len(records) == n
+    assert len(configurations) == n
+    assert system.n_bonds(configuration=configurations[-1]) == 19
+    assert out.count('$$$$') == n
+
+
+@pytest.mark.timing
+def test_smiles_many(system):
+    """Time converting SMILES one at a time and in bulk."""
+    smiles = ['C' * (1 + n % 8) + 'O' for n in range(2000)]
+    n = len(smiles)
+    t0 = time.perf_counter()
+    for text in smiles[:200]:
+        system.from_smiles(text)
+    t1 = time.perf_counter()
+    configurations = system.from_smiles_many(smiles)
+    t2 = time.perf_counter()
+    processes = min(4, os.cpu_count())
+    system.from_smiles_many(smiles, processes=processes)
+    t3 = time.perf_counter()
+    many = system.to_smiles_many(configurations)
+    t4 = time.perf_counter()
+    one = [system.to_smiles(configuration=cid) for cid in configurations[:200]]
+    t5 = time.perf_counter()
+    print(
+        f'\nFor {n} SMILES of 2-9 heavy atoms:\n'
+        f'   from_smiles:      {200 / (t1 - t0):9.0f} molecules/s\n'
+        f'   from_smiles_many: {n / (t2 - t1):9.0f} molecules/s\n'
+        f'      {processes} processes: {n / (t3 - t2):9.0f} molecules/s\n'
+        f'   to_smiles:        {200 / (t5 - t4):9.0f} molecules/s\n'
+        f'   to_smiles_many:   {n / (t4 - t3):9.0f} molecules/s'
+    )
+    assert many == smiles
+    assert one == smiles[:200]
+
+
+@pytest.mark.timing
+def test_molecule_templates(system):
+    """Time templating a box of water molecules, and templating it again."""
+    n = 2000
+    x = [0.0, 0.9572, -0.2400] * n
+    y = [0.0, 0.0, 0.9266] * n
+    z = [float(i) for i in range(n) for atom in range(3)]
+    ids = system.atoms.append(x=x, y=y, z=z, atno=[8, 1, 1] * n)
+    i = [ids[3 * molecule] for molecule in range(n) for bond in range(2)]
+    j = [ids[3 * molecule + bond] for molecule in range(n) for bond in (1, 2)]
+    system.bonds.append(i=i, j=j)
+
+    t0 = time.perf_counter()
+    tids = system.create_molecule_templates(create_subsets=False)
+    t1 = time.perf_counter()
+    again = system.create_molecule_templates(create_subsets=False)
+    t2 = time.perf_counter()
+    print(
+        f'\nTemplating {n} water molecules:\n'
+        f'     first time: {t1 - t0:.3} s\n'
+        f'    second time: {t2 - t1:.3} s'
+    )
+    assert tids == again
+    assert len(set(tids)) == 1
+
+
+@pytest.mark.timing
+def test_import_time():
+    """Time importing molsystem in a new interpreter."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(molsystem.__file__))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import molsystem'],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    # Lines are 'import time: self [us] | cumulative | imported package'
+    times = {}
+    for line in result.stderr.splitlines()[1:]:
+        self_time, cumulative, package = line.split('|')
+        times[package.strip()] = int(cumulative) / 1.0e6
+    print(
+        f'\nImporting molsystem took {times["molsystem"]:.3} s, '
+        f'of which numpy took {times["numpy"]:.3} s'
+    )
+    assert 'openbabel' not in times
+    assert 'pandas' not in times
+    assert times['molsystem'] < import_budget
+
+
+@pytest.mark.timing
+def test_element_lookups(system):
+    """Time converting symbols to atomic numbers, and back, for 1M atoms."""
+    rng = numpy.random.default_rng()
+    atnos = rng.integers(1, 119, size=natoms)
+    symbols = system.to_symbols(atnos)
+    symbol_list = symbols.tolist()
+    atno_list = atnos.tolist()
+
+    t0 = time.perf_counter()
+    system.to_atnos(symbol_list)
+    t1 = time.perf_counter()
+    result = system.to_atnos(symbols)
+    t2 = time.perf_counter()
+    system.to_symbols(atno_list)
+    t3 = time.perf_counter()
+    system.to_symbols(atnos)
+    t4 = time.perf_counter()
+    system.default_masses(atnos=atno_list)
+    t5 = time.perf_counter()
+    system.default_masses(atnos=atnos)
+    t6 = time.perf_counter()
+    print(
+        f'\nFor {natoms} atoms, as lists and as arrays:\n'
+        f'         to_atnos: {t1 - t0:.3} s  {t2 - t1:.3} s\n'
+        f'       to_symbols: {t3 - t2:.3} s  {t4 - t3:.3} s\n'
+        f'   default_masses: {t5 - t4:.3} s  {t6 - t5:.3} s'
+    )
+    assert (result == atnos).all()
+
+
+@pytest.mark.timing
+def test_formula(system):
+    """Time the formula and mass of a million atoms, and again from cache."""
+    rng = numpy.random.default_rng()
+    atno = rng.integers(1, 119, size=natoms)
+    system.atoms.append(atno=atno.tolist(), x=0.0, y=0.0, z=0.0)
+
+    t0 = time.perf_counter()
+    formula = system.formula()
+    t1 = time.perf_counter()
+    mass = system.mass()
+    t2 = time.perf_counter()
+    again = system.formula()
+    t3 = time.perf_counter()
+    print(
+        f'\nFor {natoms} atoms:\n'
+        f'         formula: {t1 - t0:.3} s\n'
+        f'            mass: {t2 - t1:.3} s\n'
+        f'   formula again: {t3 - t2:.3} s'
+    )
+    assert formula == again
+    assert mass == pytest.approx(system.default_masses(atnos=atno).sum())
+
+
+@pytest.mark.timing
+@pytest.mark.parametrize('profile', ['default', 'fast', 'bulk'])
+def test_profiles(system, profile):
+    """Time the database profiles on bulk and small transactions."""
+    systems = system.parent
+    other = systems.create_system('profile', temporary=True, profile=profile)
+    try:
+        n = natoms // 10
+        rng = numpy.random.default_rng()
+        atno = rng.integers(1, 101, size=n).tolist()
+        xyz = rng.uniform(low=0, high=100, size=(n, 3))
+
+        t0 = time.perf_counter()
+        other.atoms.append(
+            atno=atno,
+            x=xyz[:, 0].tolist(),
+            y=xyz[:, 1].tolist(),
+            z=xyz[:, 2].tolist()
+        )
+        other.commit()
+        t1 = time.perf_counter()
+        for i in range(200):
+            other.atoms.append(x=0.0, y=0.0, z=float(i), atno=6)
+            other.commit()
+        t2 = time.perf_counter()
+        xyz = other.atoms.coordinates(as_array=True)
+        t3 = time.perf_counter()
+        symbols = other.atoms.symbols()
+        t4 = time.perf_counter()
+        print(
+            f"\nThe '{profile}' profile:\n"
+            f'   appending {n} atoms: {t1 - t0:.3} s\n'
+            f'   200 transactions: {t2 - t1:.3} s\n'
+            f'   reading coordinates: {t3 - t2:.3} s\n'
+            f'   reading symbols: {t4 - t3:.3} s'
+        )
+        assert xyz.shape == (n + 200, 3)
+        assert len(symbols) == n + 200
+    finally:
+        del systems['profile']
+
+
+@pytest.mark.timing
+def test_memory(system, tmp_path):
+    """Time scratch systems in temporary files and in memory."""
+    systems = system.parent
+    smiles = ['C' * (1 + n % 8) + 'O' for n in range(200)]
+    times = {}
+    for memory in (False, True):
+        t0 = time.perf_counter()
+        for i in range(20):
+            scratch = systems.create_system(
+                'scratch', temporary=True, memory=memory
+            )
+            scratch.from_smiles_many(smiles)
+            with scratch as tmp:
+                tmp.atoms.append(x=0.0, y=0.0, z=0.0, atno=[6])
+            del systems['scratch']
+        times[memory] = (time.perf_counter() - t0) / 20
+
+    scratch = systems.create_system('scratch', memory=True)
+    scratch.from_smiles_many(smiles * 10)
+    path = tmp_path / 'saved.db'
+    t0 = time.perf_counter()
+    scratch.save(path)
+    t1 = time.perf_counter()
+    scratch.load(path)
+    t2 = time.perf_counter()
+    size = os.path.getsize(path) / 1024 / 1024
+    del systems['scratch']
+    print(
+        '\nCreating, filling and checkpointing a scratch system:\n'
+        f'   temporary file: {times[False]:.3} s\n'
+        f'        in memory: {times[True]:.3} s\n'
+        f'Saving {size:.3} MB: {t1 - t0:.3} s, loading it: {t2 - t1:.3} s'
+    )
@@ -106,3 +106,70 @@ def test_molecule_templates(disordered):
         print('coords2')
         pprint.pprint(coords2)
     assert c1 == c2
+
+
+def test_graph_hash():
+    """Test that the graph hash does not depend on the atom order."""
+    from molsystem.topology import _graph_hash
+
+    #        C  H  H  H  C =O  O  H
+    atnos = [6, 1, 1, 1, 6, 8, 8, 1]
+    bonds = [(0, 1, 1), (0, 2, 1), (0, 3, 1), (0, 4, 1), (4, 5, 2), (4, 6, 1),
+             (6, 7, 1)]  # yapf: disable
+    hash_ = _graph_hash(atnos, bonds)
+
+    reversed_atnos = [*reversed(atnos)]
+    reversed_bonds = [(7 - i, 7 - j, order) for i, j, order in bonds]
+    assert _graph_hash(reversed_atnos, reversed_bonds) == hash_
+
+    # Changing a bond order changes the hash
+    bonds[4] = (4, 5, 1)
+    assert _graph_hash(atnos, bonds) != hash_
+
+
+def test_molecule_templates_cached(disordered, monkeypatch):
+    """Test that templating again uses the cache rather than SMILES."""
+    system = disordered
+    tids, sids = system.create_molecule_templates()
+    assert system['templategraph'].n_rows == 1
+
+    def no_smiles(*args):
+        raise AssertionError('The SMILES should not be used.')
+
+    monkeypatch.setattr('molsystem.topology._conversion', no_smiles)
+    tids = system.create_molecule_templates(create_subsets=False)
+    assert tids == [2, 2]
+    assert system['templategraph'].n_rows == 1
+
+
+def test_molecule_templates_same_hash(system):
+    """Test molecules with the same graph hash but different graphs."""
+    from molsystem.topology import _graph_hash
+
+    # Decalin and bicyclopentyl
+    system.from_smiles('C1CCC2CCCCC2C1.C1CCC(C1)C1CCCC1')
+    atnos = system.atoms.atomic_numbers()
+    index = {atom_id: i for i, atom_id in enumerate(system.atoms.atom_ids())}
+    bonds = [
+        (index[row['i']], index[row['j']], row['bondorder'])
+        for row in system.bonds.bonds()
+    ]
+    hashes = []
+    for molecule in system.find_molecules(as_indices=True):
+        to_index = {j: i for i, j in enumerate(molecule)}
+        molecule_bonds = [
+            (to_index[i], to_index[j], order)
+            for i, j, order in bonds
+            if i in to_index
+        ]
+        molecule_atnos = [atnos[i] for i in molecule]
+        hashes.append(_graph_hash(molecule_atnos, molecule_bonds))
+    assert hashes[0] == hashes[1]
+
+    tids, sids = system.create_molecule_templates()
+    assert tids[0] != tids[1]
+    sql = 'SELECT name FROM template WHERE id = ?'
+    name = system.db.execute(sql, (tids[1],)).fetchone()[0]
+    assert name == 'C1CCC(C1)C1CCCC1'
+    # Templating again uses the right templates
+    assert system.create_molecule_templates(create_subsets=False) == tids